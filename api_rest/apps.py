@@ -1,6 +1,32 @@
 from django.apps import AppConfig
+from django.db import connections
 
 
 class ApiRestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_rest'
+
+    def ready(self):
+        # Registra os receivers que mantêm as estatísticas de avaliações dos livros
+        from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from .db import configure_sqlite_connection
+        from .metrics import install_query_wrapper
+        from .search import ensure_sqlite_search_index
+
+        # Alterações de schema no SQLite podem recriar api_rest_book e descartar os triggers da busca
+        post_migrate.connect(
+            lambda using, **kwargs: ensure_sqlite_search_index(connections[using]),
+            sender=self,
+            weak=False,
+            dispatch_uid='api_rest_ensure_search_index',
+        )
+        # Contagem de consultas por requisição do MetricsMiddleware, em todas as conexões e threads
+        connection_created.connect(install_query_wrapper, dispatch_uid='api_rest_install_query_wrapper')
+        # PRAGMAs do perfil do SQLite (settings.SQLITE_PROFILE)
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='api_rest_configure_sqlite_connection')
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+            if connection.connection is not None:
+                configure_sqlite_connection(connection=connection)
@@ -0,0 +1,189 @@
+"""
+Variantes assíncronas (ASGI) das leituras de livros e avaliações e da importação do Google Books, em /api/async/.
+Usam o ORM assíncrono do Django e o cliente HTTP assíncrono (httpx): em um worker ASGI (uvicorn), as requisições
+que esperam o banco ou o Google Books não ocupam uma thread cada e são atendidas ao mesmo tempo pelo mesmo processo.
+As respostas têm o mesmo formato das views do DRF em views.py; como o DRF não executa views assíncronas,
+autenticação, paginação e erros são tratados aqui
+"""
+from functools import wraps
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import CachedJWTAuthentication
+from .conditional import atable_etag, make_etag, not_modified_response, set_conditional_headers
+from .models import BOOKS_TABLE, RATINGS_TABLE, Book, Rating
+from .pagination import StandardPagination
+from .renderers import FastJSONRenderer
+from .response_cache import LIST_SCOPE, book_scope, response_cache
+from .serializers import BookSerializer, ImportJobSerializer, RatingSerializer, values_serializer
+from .services.google_books import asave_books_to_db
+from .services.import_jobs import enqueue_import_job
+from .views import fast_values, fields_version, get_requested_fields, only_fields
+
+_renderer = FastJSONRenderer()
+_authenticator = CachedJWTAuthentication()
+
+class JSONResponse(HttpResponse):
+    """
+    Resposta JSON renderizada pelo FastJSONRenderer; guarda os dados em .data, como o Response do DRF
+    """
+    def __init__(self, data=None, status=status.HTTP_200_OK):
+        self.data = data
+        super().__init__(_renderer.render(data), status=status, content_type='application/json')
+
+def api_view(view):
+    """
+    Converte as exceções do DRF (ValidationError, NotFound, 401) em respostas JSON, como o exception handler do DRF
+    """
+    @require_safe
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(Request(request), *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = JSONResponse(data, status=exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = _authenticator.authenticate_header(request)
+            return response
+    return wrapper
+
+async def cached(request, build, scope=LIST_SCOPE):
+    # Como em cache_book_response: só requisições anônimas (sem Authorization) passam pelo cache de respostas
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return await build()
+    return await response_cache.aget_or_build(request._request, build, JSONResponse, scope)
+
+async def authenticate(request):
+    """
+    Autentica pelo token JWT com o mesmo cache de tokens das views síncronas; sem token, levanta NotAuthenticated
+    """
+    result = await _authenticator.aauthenticate(request._request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+async def paginate(request, rows, serializer):
+    """
+    Paginação por número de página com os mesmos parâmetros (page, page_size) e formato de StandardPagination.
+    Como no paginador do DRF, o COUNT só roda quando a página é montada (depois da checagem do ETag)
+    """
+    if request.query_params.get('pagination') == 'cursor':
+        raise ValidationError({'pagination': ["As rotas assíncronas aceitam apenas a paginação por número de página."]})
+    paginator = StandardPagination()
+    page_size = paginator.get_page_size(request)
+    count = await rows.acount()
+    num_pages = max(1, ceil(count / page_size))
+
+    page_number = request.query_params.get(paginator.page_query_param) or 1
+    if page_number in paginator.last_page_strings:
+        page_number = num_pages
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        raise NotFound(paginator.invalid_page_message)
+    if not 1 <= page_number <= num_pages:
+        raise NotFound(paginator.invalid_page_message)
+
+    offset = (page_number - 1) * page_size
+    page = [row async for row in rows[offset:offset + page_size]]
+    url = request.build_absolute_uri()
+    if page_number < num_pages:
+        next_link = replace_query_param(url, paginator.page_query_param, page_number + 1)
+    else:
+        next_link = None
+    if page_number == 1:
+        previous_link = None
+    elif page_number == 2:
+        previous_link = remove_query_param(url, paginator.page_query_param)
+    else:
+        previous_link = replace_query_param(url, paginator.page_query_param, page_number - 1)
+    return {'count': count, 'next': next_link, 'previous': previous_link, 'results': serializer.serialize(page)}
+
+# Mesmo resultado de GET /api/books/ (BookViewSet.list)
+@api_view
+async def async_book_list(request):
+    async def build():
+        fields = get_requested_fields(request, BookSerializer)
+        books = Book.objects.all()
+        etag, last_modified = await atable_etag(request, BOOKS_TABLE)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = values_serializer(BookSerializer, fields)
+        data = await paginate(request, fast_values(books, serializer, 'id'), serializer)
+        return set_conditional_headers(JSONResponse(data), etag, last_modified)
+    return await cached(request, build)
+
+# Mesmo resultado de GET /api/books/{id}/ (BookViewSet.retrieve)
+@api_view
+async def async_book_detail(request, pk):
+    async def build():
+        fields = get_requested_fields(request, BookSerializer)
+        try:
+            book = await only_fields(Book.objects, BookSerializer.columns(fields), 'id', 'updated_at').aget(pk=pk)
+        except Book.DoesNotExist:
+            return JSONResponse(status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag('book', book.pk, book.updated_at, fields_version(fields))
+        not_modified = not_modified_response(request, etag, book.updated_at)
+        if not_modified is not None:
+            return not_modified
+        response = JSONResponse(BookSerializer(book, fields=fields).data)
+        return set_conditional_headers(response, etag, book.updated_at)
+    return await cached(request, build, book_scope(pk))
+
+# Mesmo resultado de GET /api/ratings/ (RatingViewSet.list), com os filtros book_title e book_authors
+@api_view
+async def async_rating_list(request):
+    book_title = request.query_params.get('book_title')
+    book_authors = request.query_params.get('book_authors')
+    ratings = Rating.objects.all()
+    if book_title and book_authors:
+        ratings = ratings.filter(book__book_title=book_title, book__book_authors=book_authors)
+
+    etag, last_modified = await atable_etag(request, RATINGS_TABLE)
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    async def ensure_book_exists():
+        # Só roda quando a página vem vazia ou é inválida, como RatingViewSet.ensure_book_exists
+        if book_title and book_authors:
+            if not await Book.objects.filter(book_title=book_title, book_authors=book_authors).aexists():
+                raise ValidationError({"error": "Nenhum livro encontrado com o título e autor fornecidos."})
+
+    serializer = values_serializer(RatingSerializer)
+    try:
+        data = await paginate(request, fast_values(ratings, serializer, 'created_at', 'id'), serializer)
+    except NotFound:
+        await ensure_book_exists()
+        raise
+    if not data['results']:
+        await ensure_book_exists()
+    return set_conditional_headers(JSONResponse(data), etag, last_modified)
+
+# Mesmo resultado de GET /api/books/fetch_and_save_books/ (requer autenticação)
+@api_view
+async def async_fetch_and_save_books(request):
+    await authenticate(request)
+    query = request.query_params.get('q')
+    if not query:
+        return JSONResponse({'error': 'O parâmetro "q" é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.query_params.get('async') in ('true', '1'):
+        job, _ = await sync_to_async(enqueue_import_job)(query)
+        return JSONResponse(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        created_books = await asave_books_to_db(query)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return JSONResponse(BookSerializer(created_books, many=True).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,190 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+CACHE_MAX_ENTRIES = 1024  # tokens verificados mantidos em memória por processo
+CACHE_TTL = 300  # segundos; limita o tempo em que alterações do usuário feitas por outro processo passam despercebidas
+ACTIVE_FLAG_KEY = 'auth:active:{}'  # is_active de cada usuário no cache do Django (CachedJWTTokenUserAuthentication)
+
+class VerifiedTokenCache:
+    """
+    Cache em memória (LRU limitado) de tokens já verificados: token bruto -> (token validado, usuário).
+    A chave é o token inteiro, com a assinatura, então um token alterado nunca encontra uma entrada.
+    Cada entrada vale até o exp do token ou CACHE_TTL, o que vier primeiro, e as entradas de um usuário
+    são descartadas quando ele é alterado ou excluído (signals.py)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (tipo, token bruto) -> (expira_em, token validado, usuário)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'JWT_AUTH_CACHE_MAX_ENTRIES', CACHE_MAX_ENTRIES)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'JWT_AUTH_CACHE_TTL', CACHE_TTL)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, validated_token, user):
+        expires_at = min(validated_token.get('exp', 0), time.time() + self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, validated_token, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[2].pk == user_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+token_cache = VerifiedTokenCache()
+
+def user_is_active(user_id):
+    """
+    is_active do usuário guardado no cache padrão do Django por JWT_AUTH_CACHE_TTL segundos (compartilhado entre
+    processos quando o backend é compartilhado); sem a entrada, lê apenas a coluna is_active. Usuário excluído: False
+    """
+    key = ACTIVE_FLAG_KEY.format(user_id)
+    active = cache.get(key)
+    if active is None:
+        User = get_user_model()
+        active = bool(User.objects.filter(pk=user_id).values_list('is_active', flat=True).first())
+        cache.set(key, active, token_cache.ttl)
+    return active
+
+def forget_user(user_id):
+    """
+    Descarta os tokens em cache do usuário neste processo e o is_active guardado no cache do Django, agora e após
+    o commit (uma leitura feita por outra requisição durante a transação ainda veria o valor antigo)
+    """
+    key = ACTIVE_FLAG_KEY.format(user_id)
+    token_cache.invalidate_user(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication com cache dos tokens verificados: requisições repetidas com o mesmo token não
+    verificam a assinatura de novo nem consultam a tabela de usuários
+    """
+    cache_kind = 'user'
+
+    def authenticate(self, request):
+        key = self.get_cache_key(request)
+        if key is None:
+            return None
+        return self.get_cached(key) or self.verify(key)
+
+    async def aauthenticate(self, request):
+        """
+        Versão para as views assíncronas: tokens em cache são resolvidos no event loop; a verificação
+        de um token novo consulta o banco e roda em sync_to_async
+        """
+        key = self.get_cache_key(request)
+        if key is None:
+            return None
+        return self.get_cached(key) or await sync_to_async(self.verify)(key)
+
+    def get_cache_key(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return (self.cache_kind, raw_token)
+
+    def get_cached(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            return None
+        validated_token, user = cached
+        return self.copy_user(user), validated_token
+
+    def verify(self, key):
+        validated_token = self.get_validated_token(key[1])
+        user = self.get_user(validated_token)
+        token_cache.set(key, validated_token, self.copy_user(user))
+        return user, validated_token
+
+    def copy_user(self, user):
+        # Cópia por requisição: caches do usuário (ex.: permissões) não passam de uma requisição para outra
+        return copy.copy(user)
+
+class CachedJWTTokenUserAuthentication(CachedJWTAuthentication):
+    """
+    Variante sem carregar o usuário: ele é montado só com as claims do token (TokenUser do simplejwt).
+    Para endpoints que precisam apenas saber que o cliente está autenticado, como o envio de avaliações em massa.
+    A cada requisição confere o is_active em cache (user_is_active), sem consultar o banco na maioria das vezes
+    """
+    cache_kind = 'token_user'
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            self.check_active(result[0])
+        return result
+
+    async def aauthenticate(self, request):
+        result = await super().aauthenticate(request)
+        if result is not None:
+            await sync_to_async(self.check_active)(result[0])
+        return result
+
+    def check_active(self, user):
+        if not user_is_active(user.pk):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)  # levanta InvalidToken
+        return jwt_settings.TOKEN_USER_CLASS(validated_token)
+
+    def copy_user(self, user):
+        # TokenUser só lê as claims do token, não há estado a isolar
+        return user
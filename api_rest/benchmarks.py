@@ -0,0 +1,241 @@
+"""
+Utilitários dos comandos de benchmark: geração rápida de dados e medição de latência.
+Os dados gerados usam títulos com o prefixo BENCH_PREFIX; execute os benchmarks em um banco descartável.
+"""
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    BOOKS_TABLE, RATING_SCORES, RATINGS_TABLE, Book, Rating, RatingDay, RatingHistogram, TableVersion,
+    default_bayesian_rating,
+)
+
+BENCH_PREFIX = 'bench-'
+SEED_BATCH_SIZE = 10000
+
+def _insert_rows(model, columns, rows, batch_size=SEED_BATCH_SIZE):
+    """
+    INSERT em massa com executemany, sem instanciar modelos (muito mais rápido que bulk_create para milhões de linhas)
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(column) for column in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql = f'INSERT INTO {table} ({names}) VALUES ({placeholders})'
+
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with transaction.atomic():
+                    cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                cursor.executemany(sql, batch)
+
+def seed_books(count, batch_size=SEED_BATCH_SIZE):
+    """
+    Gera count livros e retorna a lista de ids criados
+    """
+    start = (Book.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+    updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    bayesian_rating = default_bayesian_rating()
+    rows = (
+        (
+            f'{BENCH_PREFIX}{i}',
+            f'Autor {i % 1000}',
+            f'Descrição do livro de benchmark {i}',
+            f'http://bench.local/{i}',
+            0.0, 0, 0, bayesian_rating,
+            updated_at,
+        )
+        for i in range(start, start + count)
+    )
+    _insert_rows(
+        Book,
+        [
+            'book_title', 'book_authors', 'book_description', 'book_selfLink',
+            'average_rating', 'rating_count', 'rating_sum', 'bayesian_rating', 'updated_at',
+        ],
+        rows,
+        batch_size,
+    )
+    book_ids = list(Book.objects.filter(book_title__startswith=BENCH_PREFIX, id__gte=start).values_list('id', flat=True))
+    _insert_rows(
+        RatingHistogram,
+        ['book_id', *(f'score_{score}' for score in RATING_SCORES), 'rating_sum'],
+        ((book_id, *([0] * len(RATING_SCORES)), 0) for book_id in book_ids),
+        batch_size,
+    )
+    TableVersion.objects.bump(BOOKS_TABLE)
+    return book_ids
+
+def seed_ratings(count, book_ids, days=365, batch_size=SEED_BATCH_SIZE, seed=42):
+    """
+    Gera count avaliações distribuídas entre book_ids, com notas e datas aleatórias nos últimos days dias.
+    As estatísticas dos livros devem ser recalculadas depois (Book.objects.rebuild_rating_stats)
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    seconds = days * 24 * 3600
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = (
+        (
+            rng.choice(book_ids),
+            rng.randint(0, 5),
+            'Comentário de benchmark',
+            adapt(now - timedelta(seconds=rng.randrange(seconds))),
+        )
+        for _ in range(count)
+    )
+    _insert_rows(Rating, ['book_id', 'score', 'comment', 'created_at'], rows, batch_size)
+    TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+
+def delete_benchmark_data():
+    """
+    Remove os livros e avaliações gerados, com DELETE direto para não carregar milhões de linhas
+    """
+    books = connection.ops.quote_name(Book._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (Rating, RatingHistogram, RatingDay):
+            table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(
+                f'DELETE FROM {table} WHERE book_id IN (SELECT id FROM {books} WHERE book_title LIKE %s)',
+                [BENCH_PREFIX + '%'],
+            )
+        cursor.execute(f'DELETE FROM {books} WHERE book_title LIKE %s', [BENCH_PREFIX + '%'])
+        TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def measure(func, repeat):
+    """
+    Executa func repeat vezes e retorna as latências em milissegundos (p50, p99, média) e a vazão em operações/s
+    """
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        'repeat': repeat,
+        'p50_ms': percentile(timings, 0.50),
+        'p99_ms': percentile(timings, 0.99),
+        'mean_ms': statistics.fmean(timings),
+        'ops_per_second': repeat / elapsed if elapsed else 0.0,
+    }
+
+class _GoogleBooksStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        if stub.delay:
+            time.sleep(stub.delay)  # latência simulada da API
+        params = parse_qs(urlparse(self.path).query)
+        query = params['q'][0]
+        start = int(params.get('startIndex', ['0'])[0])
+        size = int(params.get('maxResults', ['5'])[0])
+        with stub.lock:
+            stub.requests_seen.append((query, start))
+            should_fail = query in stub.fail_first
+            stub.fail_first.discard(query)
+
+        if should_fail:
+            self.send_response(429)
+            self.end_headers()
+            return
+
+        end = start + size if stub.total_items is None else min(start + size, stub.total_items)
+        items = [
+            {
+                'selfLink': f'http://bench.local/google/{query}/{i}',
+                'volumeInfo': {
+                    'title': f'{BENCH_PREFIX}google {query} {i}',
+                    'authors': ['Autor'],
+                    'description': 'Descrição do livro de benchmark',
+                },
+            }
+            for i in range(start, end)
+        ]
+        body = json.dumps({'items': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class GoogleBooksStub:
+    """
+    Servidor HTTP local que imita a API do Google Books, para medir a importação sem depender da rede.
+    Use com override_settings(GOOGLE_BOOKS_API_URL=stub.url); os livros devolvidos usam o prefixo BENCH_PREFIX.
+    delay é o tempo (segundos) de cada resposta, para simular a latência da API real, e total_items limita
+    os volumes de cada termo (None: sem limite). Nos testes, fail_first lista os termos cuja primeira requisição
+    recebe 429 e requests_seen guarda as requisições recebidas (termo, startIndex)
+    """
+    def __init__(self, delay=0, total_items=None):
+        self.delay = delay
+        self.total_items = total_items
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.fail_first = set()
+        self.requests_seen = []
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _GoogleBooksStubHandler)
+        self.server.stub = self
+        self.url = f'http://127.0.0.1:{self.server.server_port}/books/v1/volumes'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline, current, metrics=('p50_ms', 'p99_ms')):
+    """
+    Variação percentual de cada cenário em relação a um resultado anterior (positivo = mais lento)
+    """
+    changes = {}
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            metric: (result[metric] - previous[metric]) / previous[metric] * 100 if previous[metric] else None
+            for metric in metrics
+        }
+    return changes
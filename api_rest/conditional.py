@@ -0,0 +1,42 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .models import TableVersion
+
+def make_etag(*parts):
+    """
+    ETag a partir das informações que identificam a versão da resposta (ex.: caminho com query string e data da última alteração)
+    """
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return quote_etag(digest)
+
+def table_etag(request, table):
+    """
+    ETag e Last-Modified de uma listagem pela versão da tabela (TableVersion), lida em uma única linha sem percorrer
+    a tabela. O caminho com a query string diferencia páginas, filtros e campos
+    """
+    version, last_modified = TableVersion.objects.current(table)
+    return make_etag(table, request.get_full_path(), version, last_modified), last_modified
+
+async def atable_etag(request, table):
+    version, last_modified = await TableVersion.objects.acurrent(table)
+    return make_etag(table, request.get_full_path(), version, last_modified), last_modified
+
+def set_conditional_headers(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+    Retorna uma resposta 304 quando o If-None-Match/If-Modified-Since do cliente corresponde à versão atual,
+    antes de executar a consulta da página e a serialização. Caso contrário, retorna None
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_conditional_headers(response, etag, last_modified)
+    return response
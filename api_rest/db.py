@@ -0,0 +1,98 @@
+"""
+Conexões com o banco: PRAGMAs do SQLite aplicados pelo signal connection_created (registrado em apps.py)
+e roteamento das leituras para as réplicas (ReplicaRouter, com o ReplicaRoutingMiddleware)
+"""
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z]+)$')
+REPLICA_STICKY_SECONDS = 10  # sobrescrito por settings.REPLICA_STICKY_SECONDS
+
+def configure_sqlite_connection(sender=None, connection=None, **kwargs):
+    """
+    Aplica settings.SQLITE_PRAGMAS (perfil escolhido em SQLITE_PROFILE) a cada conexão SQLite aberta.
+    Com conexões persistentes (CONN_MAX_AGE), o custo é pago uma vez por conexão e não por requisição
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            # PRAGMA não aceita parâmetros: nome e valor são validados antes de entrar no SQL
+            if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f'PRAGMA inválido em SQLITE_PRAGMAS: {name}={value!r}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+class RoutingState:
+    """
+    Banco de leitura de uma requisição: a réplica escolhida pelo middleware ou None para o primário
+    """
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+_routing = ContextVar('db_routing', default=None)
+
+def get_routing_state():
+    return _routing.get()
+
+def set_routing_state(state):
+    _routing.set(state)
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+def sticky_seconds():
+    # Tempo em que as réplicas podem ainda não ter recebido uma escrita
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', REPLICA_STICKY_SECONDS)
+
+@contextmanager
+def use_primary():
+    """
+    Leituras do bloco vão para o primário, sem marcar a requisição como escrita (não prende o cliente ao primário)
+    """
+    state = _routing.get()
+    replica = state.replica if state is not None else None
+    if state is not None:
+        state.replica = None
+    try:
+        yield
+    finally:
+        if state is not None and not state.wrote:
+            state.replica = replica
+
+class ReplicaRouter:
+    """
+    Leituras das requisições marcadas pelo ReplicaRoutingMiddleware (GET, HEAD e OPTIONS de clientes sem escrita
+    recente) vão para uma réplica; escritas, leituras dentro de transações e o código fora de requisições
+    (comandos, jobs) usam o primário. Depois da primeira escrita, a própria requisição passa a ler do primário
+    """
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _routing.get()
+        if state is None or state.replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.replica = None
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O schema das réplicas vem da replicação (ou da cópia do arquivo SQLite)
+        return db not in get_replicas()
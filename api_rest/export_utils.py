@@ -1,49 +1,61 @@
 import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from .models import Book, Rating
 
-def export_books_csv():
+# Quantidade de linhas buscadas do banco por vez durante a exportação
+EXPORT_CHUNK_SIZE = 2000
+
+class Echo:
     """
-    Gera um arquivo CSV contendo dados dos livros
+    Objeto que implementa apenas o método write da interface de arquivo,
+    devolvendo o valor em vez de armazená-lo em um buffer
+    """
+    def write(self, value):
+        return value
+
+def stream_csv(header, rows):
+    """
+    Gera as linhas do CSV uma a uma, sem montar o arquivo inteiro em memória
     """
-    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+def csv_streaming_response(filename, header, rows):
+    response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
     """
     Cabeçalho HTTP chamado Content-Disposition informa ao navegador que o conteúdo deve ser tratado como um arquivo para download
-    filename="books.csv" nome padrão do arquivo para o navegador salvar
+    filename nome padrão do arquivo para o navegador salvar
     """
-    response['Content-Disposition'] = 'attachment; filename="books.csv"'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
-    writer = csv.writer(response)
+def export_books_csv():
+    """
+    Gera um arquivo CSV contendo dados dos livros
+    """
+    # values_list + iterator() percorre a tabela em blocos, sem instanciar modelos nem preencher o cache do queryset
+    books = Book.objects.values_list(
+        'id',
+        'book_title',
+        'book_authors',
+        'book_description',
+        'book_selfLink',
+        'average_rating',
+        'rating_count',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
     # Nome das colunas
-    writer.writerow(['ID', 'Título', 'Autores', 'Descrição', 'Link', 'Nota Média', 'Total de Avaliações'])
-
-    books = Book.objects.all() # Busca todos os registros da tabela 
-    for book in books: # Escreve cada registro como uma linha no arquivo CSV
-        writer.writerow([
-            book.id,
-            book.book_title,
-            book.book_authors,
-            book.book_description,
-            book.book_selfLink,
-            book.average_rating,
-            book.rating_count
-        ])
-    return response # Retorna o arquivo CSV
+    header = ['ID', 'Título', 'Autores', 'Descrição', 'Link', 'Nota Média', 'Total de Avaliações']
+    return csv_streaming_response('books.csv', header, books)
 
 def export_ratings_csv():
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="ratings.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Livro', 'Pontuação', 'Comentário', 'Data de Criação'])
-
-    ratings = Rating.objects.select_related('book').all()
-    for rating in ratings:
-        writer.writerow([
-            rating.id,
-            rating.book.book_title,
-            rating.score,
-            rating.comment,
-            rating.created_at
-        ])
-    return response
+    ratings = Rating.objects.values_list(
+        'id',
+        'book__book_title',
+        'score',
+        'comment',
+        'created_at',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['ID', 'Livro', 'Pontuação', 'Comentário', 'Data de Criação']
+    return csv_streaming_response('ratings.csv', header, ratings)
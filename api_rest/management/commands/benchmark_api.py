@@ -0,0 +1,172 @@
+import json
+import random
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api_rest.benchmarks import (
+    BENCH_PREFIX,
+    GoogleBooksStub,
+    compare_results,
+    delete_benchmark_data,
+    git_commit,
+    measure,
+    seed_books,
+    seed_ratings,
+)
+from api_rest.models import Book, Rating
+from api_rest.services.google_books import query_cache, save_books_to_db
+
+BENCH_USERNAME = f'{BENCH_PREFIX}user'
+SCENARIOS = (
+    'book_list', 'book_list_cached', 'book_retrieve', 'rating_list_filtered', 'rating_create',
+    'export_books', 'export_ratings', 'save_books_to_db',
+)
+EXPORT_SCENARIOS = ('export_books', 'export_ratings')
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p99) e vazão dos principais endpoints de livros e avaliações e grava o resultado em JSON "
+        "para comparar entre commits. Gera os dados no banco configurado: use um banco descartável."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000000, help="Livros gerados")
+        parser.add_argument('--ratings', type=int, default=20000000, help="Avaliações geradas")
+        parser.add_argument('--repeat', type=int, default=200, help="Execuções medidas por cenário")
+        parser.add_argument('--export-repeat', type=int, default=3, help="Execuções medidas das exportações CSV")
+        parser.add_argument('--warmup', type=int, default=5, help="Execuções não medidas antes de cada cenário")
+        parser.add_argument('--page-size', type=int, default=20, help="Itens por página nas listagens")
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help="Cenários executados")
+        parser.add_argument('--output', help="Arquivo JSON de resultado (padrão: benchmark-<commit>.json)")
+        parser.add_argument('--compare', help="Resultado JSON anterior para comparar")
+        parser.add_argument('--seed', type=int, default=0, help="Semente dos dados e das requisições")
+        parser.add_argument('--skip-seed', action='store_true', help="Reaproveita os dados gerados anteriormente")
+        parser.add_argument('--cleanup', action='store_true', help="Remove os dados gerados ao final")
+
+    def handle(self, *args, **options):
+        if options['skip_seed']:
+            book_ids = list(Book.objects.filter(book_title__startswith=BENCH_PREFIX).values_list('id', flat=True))
+        else:
+            self.stdout.write(f"Gerando {options['books']} livros e {options['ratings']} avaliações...")
+            book_ids = seed_books(options['books'])
+            if book_ids:
+                seed_ratings(options['ratings'], book_ids, seed=options['seed'])
+            Book.objects.filter(book_title__startswith=BENCH_PREFIX).rebuild_rating_stats()
+        if not book_ids:
+            raise CommandError("Nenhum livro de benchmark encontrado.")
+
+        self.rng = random.Random(options['seed'])
+        self.book_ids = book_ids
+        self.books = list(
+            Book.objects.filter(id__in=self.rng.sample(book_ids, min(len(book_ids), 1000)))
+            .values_list('book_title', 'book_authors')
+        )
+        self.page_size = options['page_size']
+        self.pages = max(1, min(len(book_ids) // self.page_size, 1000))
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        # Cliente autenticado: não usa o cache de respostas e mede o caminho completo até o banco
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.anonymous = APIClient()
+        self.google_queries = 0
+        volumes = {'books': Book.objects.count(), 'ratings': Rating.objects.count()}
+
+        results = {}
+        try:
+            # As requisições são feitas em processo pelo APIClient, com o host padrão 'testserver'
+            with GoogleBooksStub() as stub, override_settings(GOOGLE_BOOKS_API_URL=stub.url, ALLOWED_HOSTS=['testserver']):
+                for name in options['scenarios']:
+                    repeat = options['export_repeat'] if name in EXPORT_SCENARIOS else options['repeat']
+                    run = getattr(self, f'run_{name}')
+                    for _ in range(min(options['warmup'], repeat)):
+                        run()
+                    results[name] = measure(run, repeat)
+                    self.stdout.write(
+                        f"{name}: p50={results[name]['p50_ms']:.2f}ms p99={results[name]['p99_ms']:.2f}ms "
+                        f"({results[name]['ops_per_second']:.1f} ops/s)"
+                    )
+        finally:
+            if options['cleanup']:
+                delete_benchmark_data()
+                User.objects.filter(username=BENCH_USERNAME).delete()
+
+        commit = git_commit()
+        report = {
+            'commit': commit,
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'volumes': volumes,
+            'options': {
+                key: options[key]
+                for key in ('books', 'ratings', 'repeat', 'export_repeat', 'warmup', 'page_size', 'seed', 'skip_seed')
+            },
+            'results': results,
+        }
+        output = options['output'] or f"benchmark-{commit or 'local'}.json"
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {output}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            self.stdout.write(f"Comparação com {baseline.get('commit') or options['compare']} (positivo = mais lento):")
+            for name, change in compare_results(baseline, report).items():
+                formatted = ' '.join(
+                    f"{metric}={value:+.1f}%" if value is not None else f"{metric}=n/a"
+                    for metric, value in change.items()
+                )
+                self.stdout.write(f"  {name}: {formatted}")
+
+    def get(self, client, url, params=None):
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} respondeu {response.status_code}")
+        return response
+
+    def run_book_list(self):
+        self.get(self.client, reverse('book-list'), {'page': self.rng.randint(1, self.pages), 'page_size': self.page_size})
+
+    def run_book_list_cached(self):
+        # Requisições anônimas às 10 primeiras páginas, atendidas pelo cache de respostas após a primeira
+        self.get(self.anonymous, reverse('book-list'), {'page': self.rng.randint(1, min(10, self.pages)), 'page_size': self.page_size})
+
+    def run_book_retrieve(self):
+        self.get(self.client, reverse('book-detail', kwargs={'pk': self.rng.choice(self.book_ids)}))
+
+    def run_rating_list_filtered(self):
+        title, authors = self.rng.choice(self.books)
+        self.get(self.client, reverse('rating-list'), {
+            'book_title': title, 'book_authors': authors, 'page_size': self.page_size,
+        })
+
+    def run_rating_create(self):
+        title, authors = self.rng.choice(self.books)
+        response = self.client.post(reverse('rating-list'), {
+            'book_title': title, 'book_authors': authors, 'score': self.rng.randint(0, 5), 'comment': 'Benchmark',
+        }, format='json')
+        if response.status_code != 201:
+            raise CommandError(f"POST rating respondeu {response.status_code}")
+
+    def _consume(self, url):
+        response = self.get(self.client, url)
+        for _ in response.streaming_content:
+            pass
+
+    def run_export_books(self):
+        self._consume(reverse('export_books_view'))
+
+    def run_export_ratings(self):
+        self._consume(reverse('export_ratings_view'))
+
+    def run_save_books_to_db(self):
+        # Um termo novo por execução: sem acertos no cache de buscas e com livros novos a inserir
+        self.google_queries += 1
+        query_cache.clear()
+        save_books_to_db(f'q{self.google_queries}-{self.rng.getrandbits(32)}')
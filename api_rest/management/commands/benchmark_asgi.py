@@ -0,0 +1,253 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_rest.benchmarks import (
+    BENCH_PREFIX,
+    GoogleBooksStub,
+    delete_benchmark_data,
+    git_commit,
+    percentile,
+    seed_books,
+    seed_ratings,
+)
+from api_rest.models import Book
+
+BENCH_USERNAME = f'{BENCH_PREFIX}asgi'
+SCENARIOS = ('book_list', 'book_retrieve', 'rating_list', 'fetch_and_save_books')
+# Servidor e rotas de cada alvo: o worker WSGI com as views do DRF, o worker ASGI com as views assíncronas
+# (/api/async/) e, como referência, o worker ASGI com as views síncronas
+TARGETS = {
+    'wsgi': ('gunicorn', '/api/'),
+    'asgi': ('uvicorn', '/api/async/'),
+    'asgi_sync_views': ('uvicorn', '/api/'),
+}
+SERVER_MODULES = {'gunicorn': 'gunicorn', 'uvicorn': 'uvicorn'}
+SERVER_START_TIMEOUT = 30  # segundos
+
+SETTINGS_TEMPLATE = """from {settings_module} import *
+
+GOOGLE_BOOKS_API_URL = {google_url!r}
+ALLOWED_HOSTS = ['127.0.0.1']
+DEBUG = False
+"""
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão com requisições simultâneas de um worker WSGI (gunicorn, views do DRF) e de um worker "
+        "ASGI (uvicorn, views assíncronas de /api/async/), com o Google Books simulado por um servidor local lento. "
+        "Os servidores usam o banco configurado: use um banco descartável em arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help="Livros gerados")
+        parser.add_argument('--ratings', type=int, default=100000, help="Avaliações geradas")
+        parser.add_argument('--requests', type=int, default=500, help="Requisições por cenário")
+        parser.add_argument('--import-requests', type=int, default=100, help="Requisições do cenário fetch_and_save_books")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requisições simultâneas")
+        parser.add_argument('--google-delay', type=float, default=0.2, help="Latência simulada do Google Books (segundos)")
+        parser.add_argument('--wsgi-threads', type=int, default=1, help="Threads do worker gunicorn (1 = worker sync)")
+        parser.add_argument('--page-size', type=int, default=20, help="Itens por página nas listagens")
+        parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS), help="Servidores medidos")
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help="Cenários executados")
+        parser.add_argument('--output', help="Grava o resultado em JSON")
+        parser.add_argument('--seed', type=int, default=0, help="Semente dos dados e das requisições")
+        parser.add_argument('--skip-seed', action='store_true', help="Reaproveita os dados gerados anteriormente")
+        parser.add_argument('--cleanup', action='store_true', help="Remove os dados gerados ao final")
+
+    def handle(self, *args, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("O benchmark precisa do httpx para gerar as requisições simultâneas.")
+        for target in options['targets']:
+            server = TARGETS[target][0]
+            if importlib.util.find_spec(SERVER_MODULES[server]) is None:
+                raise CommandError(f"{server} não está instalado (necessário para o alvo {target}).")
+        if connection.vendor == 'sqlite' and str(connection.settings_dict['NAME']) in ('', ':memory:'):
+            raise CommandError("Os servidores rodam em outros processos: use um banco SQLite em arquivo.")
+
+        if not options['skip_seed']:
+            self.stdout.write(f"Gerando {options['books']} livros e {options['ratings']} avaliações...")
+            book_ids = seed_books(options['books'])
+            if book_ids:
+                seed_ratings(options['ratings'], book_ids, seed=options['seed'])
+            Book.objects.filter(book_title__startswith=BENCH_PREFIX).rebuild_rating_stats()
+        book_ids = list(Book.objects.filter(book_title__startswith=BENCH_PREFIX).values_list('id', flat=True))
+        if not book_ids:
+            raise CommandError("Nenhum livro de benchmark encontrado.")
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.book_ids = book_ids
+        self.books = list(
+            Book.objects.filter(id__in=self.rng.sample(book_ids, min(len(book_ids), 1000)))
+            .values_list('book_title', 'book_authors')
+        )
+        self.pages = max(1, min(len(book_ids) // options['page_size'], 1000))
+        self.google_queries = 0
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        # Requisições autenticadas: não usam o cache de respostas e medem o caminho até o banco
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        results = {}
+        try:
+            with GoogleBooksStub(delay=options['google_delay']) as stub, tempfile.TemporaryDirectory() as settings_dir:
+                with open(os.path.join(settings_dir, 'benchmark_asgi_settings.py'), 'w', encoding='utf-8') as file:
+                    file.write(SETTINGS_TEMPLATE.format(settings_module=settings.SETTINGS_MODULE, google_url=stub.url))
+                for target in options['targets']:
+                    results[target] = self.run_target(target, settings_dir, httpx)
+        finally:
+            if options['cleanup']:
+                delete_benchmark_data()
+                User.objects.filter(username=BENCH_USERNAME).delete()
+
+        for name in options['scenarios']:
+            line = ' '.join(
+                f"{target}={results[target][name]['requests_per_second']:.1f} req/s"
+                for target in options['targets']
+            )
+            self.stdout.write(f"{name}: {line}")
+
+        if options['output']:
+            report = {
+                'commit': git_commit(),
+                'created_at': datetime.now(dt_timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'options': {
+                    key: options[key]
+                    for key in (
+                        'books', 'ratings', 'requests', 'import_requests', 'concurrency', 'google_delay',
+                        'wsgi_threads', 'page_size', 'seed',
+                    )
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['output']}"))
+
+    def server_command(self, server, port):
+        if server == 'gunicorn':
+            return [
+                sys.executable, '-m', 'gunicorn', 'api_root.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                '--workers', '1', '--threads', str(self.options['wsgi_threads']), '--log-level', 'warning',
+            ]
+        return [
+            sys.executable, '-m', 'uvicorn', 'api_root.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', '1', '--log-level', 'warning', '--no-access-log',
+        ]
+
+    def run_target(self, target, settings_dir, httpx):
+        server, prefix = TARGETS[target]
+        port = free_port()
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='benchmark_asgi_settings',
+            PYTHONPATH=os.pathsep.join(filter(None, [settings_dir, str(settings.BASE_DIR), os.environ.get('PYTHONPATH')])),
+        )
+        process = subprocess.Popen(self.server_command(server, port), cwd=settings.BASE_DIR, env=env)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            self.wait_until_ready(base_url, process, httpx)
+            results = {}
+            for name in self.options['scenarios']:
+                total = self.options['import_requests'] if name == 'fetch_and_save_books' else self.options['requests']
+                requests = [getattr(self, f'request_{name}')(prefix) for _ in range(total)]
+                results[name] = asyncio.run(self.load(base_url, requests, httpx))
+                self.stdout.write(
+                    f"{target} {name}: {results[name]['requests_per_second']:.1f} req/s "
+                    f"p50={results[name]['p50_ms']:.1f}ms p99={results[name]['p99_ms']:.1f}ms "
+                    f"({results[name]['errors']} erros)"
+                )
+            return results
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def wait_until_ready(self, base_url, process, httpx):
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"O servidor terminou ao iniciar (código {process.returncode}).")
+            try:
+                if httpx.get(f'{base_url}/api/books/', params={'page_size': 1}, timeout=1).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"O servidor em {base_url} não respondeu em {SERVER_START_TIMEOUT}s.")
+
+    async def load(self, base_url, requests, httpx):
+        """
+        Envia as requisições com no máximo --concurrency simultâneas e mede a latência de cada uma e a vazão total
+        """
+        concurrency = self.options['concurrency']
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        pending = iter(requests)
+        timings = []
+        errors = Counter()  # status HTTP (ou tipo da falha de conexão) -> quantidade
+
+        async def worker(client):
+            for path, params in pending:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params, headers=self.headers)
+                    if response.status_code >= 400:
+                        errors[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] += 1
+                timings.append((time.perf_counter() - started) * 1000)
+
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return {
+            'requests': len(requests),
+            'concurrency': concurrency,
+            'errors': sum(errors.values()),
+            'error_statuses': dict(errors),
+            'p50_ms': percentile(timings, 0.50),
+            'p99_ms': percentile(timings, 0.99),
+            'mean_ms': sum(timings) / len(timings),
+            'requests_per_second': len(requests) / elapsed if elapsed else 0.0,
+        }
+
+    def request_book_list(self, prefix):
+        return f'{prefix}books/', {'page': self.rng.randint(1, self.pages), 'page_size': self.options['page_size']}
+
+    def request_book_retrieve(self, prefix):
+        return f'{prefix}books/{self.rng.choice(self.book_ids)}/', None
+
+    def request_rating_list(self, prefix):
+        title, authors = self.rng.choice(self.books)
+        return f'{prefix}ratings/', {'book_title': title, 'book_authors': authors, 'page_size': self.options['page_size']}
+
+    def request_fetch_and_save_books(self, prefix):
+        # Um termo novo por requisição: sem acertos no cache de buscas, cada uma espera o Google Books simulado
+        self.google_queries += 1
+        return f'{prefix}books/fetch_and_save_books/', {'q': f'q{self.google_queries}-{self.rng.getrandbits(32)}'}
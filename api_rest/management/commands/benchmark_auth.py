@@ -0,0 +1,61 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_rest.authentication import CachedJWTAuthentication, CachedJWTTokenUserAuthentication, token_cache
+from api_rest.benchmarks import BENCH_PREFIX, git_commit, measure
+
+BENCH_USERNAME = f'{BENCH_PREFIX}auth'
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo de autenticação por requisição: JWTAuthentication do simplejwt, CachedJWTAuthentication "
+        "e CachedJWTTokenUserAuthentication (sem banco). Cria um usuário temporário no banco configurado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5000, help="Autenticações medidas por cenário")
+        parser.add_argument('--output', help="Grava o resultado em JSON")
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        try:
+            token = str(AccessToken.for_user(user))
+            factory = APIRequestFactory()
+            authenticators = {
+                'simplejwt': JWTAuthentication(),
+                'cached': CachedJWTAuthentication(),
+                'cached_token_user': CachedJWTTokenUserAuthentication(),
+            }
+            token_cache.clear()
+
+            results = {}
+            for name, authenticator in authenticators.items():
+                def authenticate():
+                    request = Request(factory.get('/api/books/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+                    return authenticator.authenticate(request)
+
+                authenticate()  # primeira requisição: verifica o token e preenche o cache
+                with CaptureQueriesContext(connection) as queries:
+                    authenticate()
+                results[name] = measure(authenticate, options['repeat'])
+                results[name]['queries_per_request'] = len(queries)
+                self.stdout.write(
+                    f"{name}: p50={results[name]['p50_ms'] * 1000:.1f}µs p99={results[name]['p99_ms'] * 1000:.1f}µs "
+                    f"({len(queries)} consultas por requisição)"
+                )
+        finally:
+            User.objects.filter(username=BENCH_USERNAME).delete()
+
+        if options['output']:
+            report = {'commit': git_commit(), 'options': {'repeat': options['repeat']}, 'results': results}
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['output']}"))
@@ -0,0 +1,96 @@
+import io
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api_rest.benchmarks import git_commit, measure
+from api_rest.models import Book, Rating
+from api_rest.parsers import FastJSONParser
+from api_rest.renderers import FastJSONRenderer, orjson
+from api_rest.serializers import BookSerializer, RatingSerializer
+
+class Command(BaseCommand):
+    help = (
+        "Compara o JSONRenderer/JSONParser do DRF com FastJSONRenderer/FastJSONParser (orjson) nas páginas de "
+        "BookViewSet.list e RatingViewSet.list e no corpo de POST /api/ratings/bulk/. Não acessa o banco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help="Itens por página (100 é o page_size máximo)")
+        parser.add_argument('--bulk-rows', type=int, default=10000, help="Avaliações no corpo do envio em massa")
+        parser.add_argument('--repeat', type=int, default=1000, help="Execuções medidas por cenário")
+        parser.add_argument('--output', help="Grava o resultado em JSON")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson não está instalado: FastJSONRenderer usaria o renderer padrão.")
+
+        items = options['items']
+        now = timezone.now()
+        books = [
+            Book(
+                id=i, book_title=f'Livro {i}', book_authors=f'Autor {i % 50}',
+                book_description='Descrição do livro de benchmark. ' * 15, book_selfLink=f'http://bench.local/{i}',
+                average_rating=3.75, rating_count=120, rating_sum=450, bayesian_rating=3.62, updated_at=now,
+            )
+            for i in range(1, items + 1)
+        ]
+        ratings = [
+            Rating(id=i, book_id=i % 50 + 1, score=i % 6, comment='Comentário de benchmark', created_at=now - timedelta(minutes=i))
+            for i in range(1, items + 1)
+        ]
+        # Mesmo formato das respostas paginadas das views, já serializado: mede apenas a renderização
+        payloads = {
+            'book_list': self.page(BookSerializer(books, many=True).data),
+            'rating_list': self.page(RatingSerializer(ratings, many=True).data),
+        }
+        bulk_body = json.dumps([
+            {'book_title': f'Livro {i % 50}', 'book_authors': 'Autor', 'score': i % 6, 'comment': 'Comentário'}
+            for i in range(options['bulk_rows'])
+        ]).encode()
+
+        renderers = {'drf': JSONRenderer(), 'orjson': FastJSONRenderer()}
+        for name, data in payloads.items():
+            if json.loads(renderers['drf'].render(data)) != json.loads(renderers['orjson'].render(data)):
+                raise CommandError(f"Saídas diferentes em {name}")
+
+        results = {}
+        for name, data in payloads.items():
+            for label, renderer in renderers.items():
+                results[f'render_{name}_{label}'] = measure(lambda: renderer.render(data), options['repeat'])
+        parsers = {'drf': JSONParser(), 'orjson': FastJSONParser()}
+        parse_repeat = max(1, options['repeat'] // 20)
+        for label, parser in parsers.items():
+            results[f'parse_rating_bulk_{label}'] = measure(
+                lambda: parser.parse(io.BytesIO(bulk_body), 'application/json', {}), parse_repeat,
+            )
+
+        for name in ('render_book_list', 'render_rating_list', 'parse_rating_bulk'):
+            drf, fast = results[f'{name}_drf'], results[f'{name}_orjson']
+            speedup = drf['mean_ms'] / fast['mean_ms'] if fast['mean_ms'] else float('inf')
+            self.stdout.write(
+                f"{name}: drf p50={drf['p50_ms']:.3f}ms orjson p50={fast['p50_ms']:.3f}ms ({speedup:.1f}x)"
+            )
+
+        if options['output']:
+            report = {
+                'commit': git_commit(),
+                'options': {key: options[key] for key in ('items', 'bulk_rows', 'repeat')},
+                'sizes': {name: len(renderers['orjson'].render(data)) for name, data in payloads.items()},
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['output']}"))
+
+    def page(self, results):
+        return {
+            'count': 100000,
+            'next': 'http://localhost/api/books/?page=3',
+            'previous': 'http://localhost/api/books/?page=1',
+            'results': results,
+        }
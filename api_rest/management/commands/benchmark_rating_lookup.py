@@ -0,0 +1,73 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api_rest.benchmarks import BENCH_PREFIX, delete_benchmark_data, measure, seed_books, seed_ratings
+from api_rest.models import Book, Rating
+
+INDEX_NAME = 'rating_book_created_at_idx'
+
+class Command(BaseCommand):
+    help = (
+        "Mede a listagem de avaliações filtrada por título e autor (JOIN + índice (book, -created_at)) "
+        "com e sem o índice. Gera os dados no banco configurado: use um banco descartável."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000, help="Livros gerados")
+        parser.add_argument('--ratings', type=int, default=10000000, help="Avaliações geradas")
+        parser.add_argument('--repeat', type=int, default=200, help="Execuções medidas com o índice")
+        parser.add_argument('--repeat-without-index', type=int, default=5, help="Execuções medidas sem o índice")
+        parser.add_argument('--page-size', type=int, default=20, help="Avaliações por página")
+        parser.add_argument('--skip-seed', action='store_true', help="Reaproveita os dados gerados anteriormente")
+        parser.add_argument('--cleanup', action='store_true', help="Remove os dados gerados ao final")
+
+    def handle(self, *args, **options):
+        if options['skip_seed']:
+            book_ids = list(Book.objects.filter(book_title__startswith=BENCH_PREFIX).values_list('id', flat=True))
+        else:
+            self.stdout.write(f"Gerando {options['books']} livros e {options['ratings']} avaliações...")
+            book_ids = seed_books(options['books'])
+            seed_ratings(options['ratings'], book_ids)
+            Book.objects.filter(book_title__startswith=BENCH_PREFIX).rebuild_rating_stats()
+        if not book_ids:
+            self.stderr.write("Nenhum livro de benchmark encontrado.")
+            return
+
+        books = list(Book.objects.filter(id__in=book_ids[:1000]).values_list('book_title', 'book_authors'))
+        rng = random.Random(0)
+        page_size = options['page_size']
+
+        def list_page():
+            # Mesmas consultas de RatingViewSet.list com filtro: COUNT da paginação e SELECT da página
+            title, authors = rng.choice(books)
+            queryset = Rating.objects.filter(book__book_title=title, book__book_authors=authors)
+            queryset.count()
+            list(queryset[:page_size])
+
+        title, authors = books[0]
+        plan_queryset = Rating.objects.filter(book__book_title=title, book__book_authors=authors)[:page_size]
+        self.stdout.write(f"Plano de execução com o índice:\n{plan_queryset.explain()}")
+        with_index = measure(list_page, options['repeat'])
+
+        # Remove o índice temporariamente para comparar
+        index = next(index for index in Rating._meta.indexes if index.name == INDEX_NAME)
+        with connection.schema_editor() as schema_editor:
+            schema_editor.remove_index(Rating, index)
+        try:
+            self.stdout.write(f"Plano de execução sem o índice:\n{plan_queryset.explain()}")
+            without_index = measure(list_page, options['repeat_without_index'])
+        finally:
+            with connection.schema_editor() as schema_editor:
+                schema_editor.add_index(Rating, index)
+
+        self.stdout.write(f"Avaliações no banco: {Rating.objects.count()}")
+        for label, result in (('com índice', with_index), ('sem índice', without_index)):
+            self.stdout.write(
+                f"{label}: p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+                f"({result['ops_per_second']:.1f} páginas/s, {result['repeat']} execuções)"
+            )
+
+        if options['cleanup']:
+            delete_benchmark_data()
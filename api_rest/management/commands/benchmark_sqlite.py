@@ -0,0 +1,181 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import Count, Max, Sum
+from django.test import override_settings
+
+from api_rest.benchmarks import BENCH_PREFIX, delete_benchmark_data, git_commit, percentile, seed_books, seed_ratings
+from api_rest.models import Book, Rating
+from api_rest.serializers import RatingSerializer, values_serializer
+
+class Command(BaseCommand):
+    help = (
+        "Leituras e gravações simultâneas de avaliações em threads, com cada perfil de SQLITE_PROFILES: vazão, "
+        "latência e erros 'database is locked'. Altera o journal_mode do banco configurado: use um banco descartável."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=None, help="Perfis medidos (padrão: todos de SQLITE_PROFILES)")
+        parser.add_argument('--readers', type=int, default=8, help="Threads de leitura")
+        parser.add_argument('--writers', type=int, default=4, help="Threads de gravação")
+        parser.add_argument('--duration', type=float, default=10.0, help="Segundos medidos por perfil")
+        parser.add_argument('--books', type=int, default=10000, help="Livros gerados")
+        parser.add_argument('--ratings', type=int, default=100000, help="Avaliações geradas")
+        parser.add_argument('--output', help="Grava o resultado em JSON")
+        parser.add_argument('--seed', type=int, default=0, help="Semente dos dados e das operações")
+        parser.add_argument('--skip-seed', action='store_true', help="Reaproveita os dados gerados anteriormente")
+        parser.add_argument('--cleanup', action='store_true', help="Remove os dados gerados ao final")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or str(connection.settings_dict['NAME']) in ('', ':memory:'):
+            raise CommandError("O benchmark precisa de um banco SQLite em arquivo.")
+        profiles = options['profiles'] or list(settings.SQLITE_PROFILES)
+        unknown = [name for name in profiles if name not in settings.SQLITE_PROFILES]
+        if unknown:
+            raise CommandError(f"Perfis desconhecidos: {', '.join(unknown)}")
+
+        if not options['skip_seed']:
+            self.stdout.write(f"Gerando {options['books']} livros e {options['ratings']} avaliações...")
+            book_ids = seed_books(options['books'])
+            if book_ids:
+                seed_ratings(options['ratings'], book_ids, seed=options['seed'])
+            Book.objects.filter(book_title__startswith=BENCH_PREFIX).rebuild_rating_stats()
+        self.books = list(
+            Book.objects.filter(book_title__startswith=BENCH_PREFIX).values_list('id', 'book_title', 'book_authors')
+        )
+        if not self.books:
+            raise CommandError("Nenhum livro de benchmark encontrado.")
+        self.options = options
+        self.serializer = values_serializer(RatingSerializer)
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            original_journal_mode = cursor.fetchone()[0]
+        results = {}
+        try:
+            for name in profiles:
+                results[name] = self.run_profile(name)
+                result = results[name]
+                self.stdout.write(
+                    f"{name}: leituras={result['reads_per_second']:.1f}/s gravações={result['writes_per_second']:.1f}/s "
+                    f"erros de lock={result['lock_errors']} ({result['lock_error_rate'] * 100:.1f}%) "
+                    f"gravação p99={result['write_p99_ms']:.1f}ms"
+                )
+        finally:
+            self.set_journal_mode(original_journal_mode)
+            if options['cleanup']:
+                delete_benchmark_data()
+
+        if options['output']:
+            report = {
+                'commit': git_commit(),
+                'created_at': datetime.now(dt_timezone.utc).isoformat(),
+                'options': {
+                    key: options[key] for key in ('readers', 'writers', 'duration', 'books', 'ratings', 'seed')
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['output']}"))
+
+    def set_journal_mode(self, mode):
+        # O journal_mode fica gravado no arquivo: só muda sem outras conexões abertas
+        connections.close_all()
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {mode}")
+        connection.close()
+
+    def run_profile(self, name):
+        """
+        Executa as threads de leitura e gravação com as configurações do perfil: as conexões de cada thread são
+        criadas com o DATABASE do perfil e recebem os PRAGMAS pelo signal connection_created
+        """
+        profile = settings.SQLITE_PROFILES[name]
+        database = connections.settings[connection.alias]
+        original = {key: database[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+        self.set_journal_mode(profile['PRAGMAS'].get('journal_mode', 'DELETE'))
+        database.update({'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}, **profile['DATABASE'])
+
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {'read': [], 'write': [], 'read_lock_errors': 0, 'write_lock_errors': 0, 'errors': 0}
+        workers = [
+            threading.Thread(target=self.worker, args=(self.read, self.options['seed'] + i))
+            for i in range(self.options['readers'])
+        ] + [
+            threading.Thread(target=self.worker, args=(self.write, self.options['seed'] + 1000 + i))
+            for i in range(self.options['writers'])
+        ]
+        try:
+            with override_settings(SQLITE_PRAGMAS=profile['PRAGMAS']):
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                time.sleep(self.options['duration'])
+                self.stop.set()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - started
+        finally:
+            database.update(original)
+
+        reads, writes = self.stats['read'], self.stats['write']
+        lock_errors = self.stats['read_lock_errors'] + self.stats['write_lock_errors']
+        attempts = len(reads) + len(writes) + lock_errors + self.stats['errors']
+        return {
+            'reads': len(reads),
+            'writes': len(writes),
+            'reads_per_second': len(reads) / elapsed,
+            'writes_per_second': len(writes) / elapsed,
+            'read_p50_ms': percentile(reads, 0.50) if reads else None,
+            'read_p99_ms': percentile(reads, 0.99) if reads else None,
+            'write_p50_ms': percentile(writes, 0.50) if writes else None,
+            'write_p99_ms': percentile(writes, 0.99) if writes else None,
+            'read_lock_errors': self.stats['read_lock_errors'],
+            'write_lock_errors': self.stats['write_lock_errors'],
+            'lock_errors': lock_errors,
+            'lock_error_rate': lock_errors / attempts if attempts else 0.0,
+            'other_errors': self.stats['errors'],
+        }
+
+    def worker(self, operation, seed):
+        rng = random.Random(seed)
+        kind = operation.__name__
+        try:
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                try:
+                    operation(rng)
+                except OperationalError as e:
+                    counter = f'{kind}_lock_errors' if 'locked' in str(e) else 'errors'
+                    with self.lock:
+                        self.stats[counter] += 1
+                else:
+                    with self.lock:
+                        self.stats[kind].append((time.perf_counter() - started) * 1000)
+                finally:
+                    # Fim de uma "requisição": fecha a conexão ou a mantém aberta, conforme CONN_MAX_AGE
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    def read(self, rng):
+        # Mesmas consultas de GET /api/ratings/?book_title=...&book_authors=... (versão da listagem e página)
+        _, title, authors = rng.choice(self.books)
+        ratings = Rating.objects.filter(book__book_title=title, book__book_authors=authors)
+        ratings.aggregate(count=Count('id'), total=Sum('score'), last_modified=Max('created_at'))
+        self.serializer.serialize(ratings.values(*self.serializer.value_fields)[:20])
+
+    def write(self, rng):
+        # Mesma transação de POST /api/ratings/: busca do livro, INSERT e atualização das estatísticas
+        _, title, authors = rng.choice(self.books)
+        with transaction.atomic():
+            book_id = Book.objects.filter(book_title=title, book_authors=authors).values_list('id', flat=True).first()
+            Rating.objects.create(book_id=book_id, score=rng.randint(0, 5), comment='Benchmark')
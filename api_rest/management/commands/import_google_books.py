@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from api_rest.services.google_books import (
+    MAX_RESULTS_PER_PAGE,
+    create_session,
+    fetch_books_bulk,
+    save_volumes_to_db,
+)
+
+class Command(BaseCommand):
+    help = "Importa livros da API do Google Books em massa, buscando várias páginas e termos em paralelo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help="Termos de busca")
+        parser.add_argument('--pages', type=int, default=1, help="Páginas buscadas por termo")
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=MAX_RESULTS_PER_PAGE,
+            help=f"Resultados por página (máximo de {MAX_RESULTS_PER_PAGE})",
+        )
+        parser.add_argument('--workers', type=int, default=8, help="Requisições simultâneas")
+        parser.add_argument('--retries', type=int, default=3, help="Tentativas em respostas 429/5xx")
+        parser.add_argument('--backoff', type=float, default=0.5, help="Fator de backoff exponencial, em segundos")
+
+    def handle(self, *args, **options):
+        session = create_session(
+            pool_size=options['workers'],
+            retries=options['retries'],
+            backoff_factor=options['backoff'],
+        )
+        items, stats = fetch_books_bulk(
+            options['queries'],
+            pages=options['pages'],
+            max_results=min(options['page_size'], MAX_RESULTS_PER_PAGE),
+            max_workers=options['workers'],
+            session=session,
+        )
+        created_books = save_volumes_to_db(items)
+
+        for error in stats['errors']:
+            self.stderr.write(f"Falha em q={error['q']} startIndex={error['startIndex']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['requests']} requisições, {stats['items']} itens em {stats['elapsed']:.2f}s "
+            f"({stats['items_per_second']:.1f} itens/s), {len(created_books)} livros criados."
+        ))
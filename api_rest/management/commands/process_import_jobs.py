@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api_rest.services.import_jobs import process_pending_jobs
+
+class Command(BaseCommand):
+    help = (
+        "Executa os jobs de importação do Google Books que estão pendentes e marca como falhos os jobs em execução "
+        "sem progresso há mais de IMPORT_JOB_STALE_MINUTES minutos"
+    )
+
+    def handle(self, *args, **options):
+        processed, failed = process_pending_jobs()
+        if failed:
+            self.stdout.write(f"{failed} jobs interrompidos marcados como falhos.")
+        self.stdout.write(self.style.SUCCESS(f"{processed} jobs processados."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api_rest.models import BOOKS_TABLE, Book, TableVersion
+from api_rest.response_cache import invalidate_books_cache
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula average_rating, rating_count e rating_sum de todos os livros e os contadores por nota e por dia "
+        "(RatingHistogram e RatingDay) a partir da tabela Rating"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help="Quantidade de livros recalculados por UPDATE (faixas de id)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Book.objects.order_by('-id').values_list('id', flat=True).first()
+        if last_id is None:
+            self.stdout.write("Nenhum livro encontrado.")
+            return
+
+        updated = 0
+        # Processa por faixas de id para não manter uma única transação longa em tabelas grandes
+        for start in range(0, last_id + 1, batch_size):
+            updated += Book.objects.filter(id__gte=start, id__lt=start + batch_size).rebuild_rating_stats()
+
+        TableVersion.objects.bump(BOOKS_TABLE)
+        invalidate_books_cache()
+        self.stdout.write(self.style.SUCCESS(f"Estatísticas recalculadas para {updated} livros."))
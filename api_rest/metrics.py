@@ -0,0 +1,187 @@
+"""
+Métricas por endpoint coletadas pelo MetricsMiddleware (api_rest/middleware.py): latência, quantidade e tempo
+das consultas SQL e tamanho da resposta, expostas em GET /api/_metrics no formato texto do Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Limites superiores (le) dos buckets dos histogramas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # segundos
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+class Histogram:
+    """
+    Histograma cumulativo no formato do Prometheus: contagem por bucket, soma e total de observações
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o bucket +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.response_size = Histogram(RESPONSE_SIZE_BUCKETS)
+        self.query_seconds = 0.0
+        self.over_budget = 0
+        self.responses = {}  # status HTTP -> quantidade
+
+class QueryRecorder:
+    """
+    Conta as consultas de uma requisição e soma o tempo gasto nelas. O wrapper record_query fica instalado
+    em todas as conexões (apps.py) e repassa cada consulta ao recorder ativo no contexto, então consultas
+    feitas em outra thread pelo ORM assíncrono (sync_to_async) também entram na conta
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+    @contextmanager
+    def capture(self):
+        # set/set em vez de reset(token): o streaming pode avançar o gerador em outro contexto (ASGI)
+        previous = _current_recorder.get()
+        _current_recorder.set(self)
+        try:
+            yield self
+        finally:
+            _current_recorder.set(previous)
+
+_current_recorder = ContextVar('query_recorder', default=None)
+
+def record_query(execute, sql, params, many, context):
+    """
+    Wrapper de connection.execute_wrapper instalado em cada conexão aberta (signal connection_created)
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+class MetricsRegistry:
+    """
+    Agregados por view (ex.: BookViewSet.list), compartilhados entre as threads do processo
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status_code, seconds, queries, query_seconds, size, over_budget=False):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(queries)
+            if size is not None:
+                metrics.response_size.observe(size)
+            metrics.query_seconds += query_seconds
+            metrics.over_budget += over_budget
+            metrics.responses[status_code] = metrics.responses.get(status_code, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {view: _copy_metrics(metrics) for view, metrics in sorted(self._views.items())}
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+def _copy_metrics(metrics):
+    copy = ViewMetrics()
+    for name in ('latency', 'queries', 'response_size'):
+        source, target = getattr(metrics, name), getattr(copy, name)
+        target.counts, target.sum, target.count = list(source.counts), source.sum, source.count
+    copy.query_seconds = metrics.query_seconds
+    copy.over_budget = metrics.over_budget
+    copy.responses = dict(metrics.responses)
+    return copy
+
+registry = MetricsRegistry()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+def _histogram(lines, name, help_text, views, attribute):
+    _header(lines, name, 'histogram', help_text)
+    for view, metrics in views.items():
+        histogram = getattr(metrics, attribute)
+        for bound, total in histogram.cumulative():
+            lines.append(f'{name}_bucket{_labels(view=view, le=bound)} {total}')
+        lines.append(f'{name}_sum{_labels(view=view)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(view=view)} {histogram.count}')
+
+def render_prometheus():
+    """
+    Texto no formato de exposição do Prometheus (versão 0.0.4) com as métricas por view e as estatísticas dos caches
+    """
+    from .authentication import token_cache
+    from .response_cache import response_cache
+    from .services.google_books import query_cache
+
+    views = registry.snapshot()
+    lines = []
+
+    _header(lines, 'api_requests_total', 'counter', 'Requisições atendidas por view e status HTTP.')
+    for view, metrics in views.items():
+        for status_code, count in sorted(metrics.responses.items()):
+            lines.append(f'api_requests_total{_labels(view=view, status=status_code)} {count}')
+
+    _histogram(lines, 'api_request_duration_seconds', 'Latência das requisições em segundos.', views, 'latency')
+    _histogram(lines, 'api_request_queries', 'Consultas SQL executadas por requisição.', views, 'queries')
+    _histogram(lines, 'api_response_size_bytes', 'Tamanho do corpo da resposta em bytes.', views, 'response_size')
+
+    _header(lines, 'api_request_query_seconds_total', 'counter', 'Tempo total gasto em consultas SQL em segundos.')
+    for view, metrics in views.items():
+        lines.append(f'api_request_query_seconds_total{_labels(view=view)} {metrics.query_seconds}')
+
+    _header(lines, 'api_requests_over_query_budget_total', 'counter', 'Requisições acima de METRICS_QUERY_BUDGET consultas.')
+    for view, metrics in views.items():
+        lines.append(f'api_requests_over_query_budget_total{_labels(view=view)} {metrics.over_budget}')
+
+    caches = {'google_books': query_cache.stats(), 'responses': response_cache.stats(), 'jwt': token_cache.stats()}
+    for stat in ('hits', 'misses'):
+        name = f'api_cache_{stat}_total'
+        _header(lines, name, 'counter', f'Consultas aos caches da aplicação ({stat}).')
+        for cache, stats in caches.items():
+            lines.append(f'{name}{_labels(cache=cache)} {stats[stat]}')
+    _header(lines, 'api_cache_hit_ratio', 'gauge', 'Proporção de acertos dos caches da aplicação.')
+    for cache, stats in caches.items():
+        lines.append(f'api_cache_hit_ratio{_labels(cache=cache)} {stats["hit_ratio"]}')
+
+    return '\n'.join(lines) + '\n'
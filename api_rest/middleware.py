@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .db import RoutingState, get_replicas, get_routing_state, set_routing_state, sticky_seconds
+from .metrics import QueryRecorder, registry
+
+logger = logging.getLogger(__name__)
+
+# Máximo de consultas SQL por requisição antes de registrar um aviso (sobrescrito por METRICS_QUERY_BUDGET)
+QUERY_BUDGET = 10
+METRICS_PATH = '/api/_metrics'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_PIN_COOKIE = 'use_primary_db'
+
+def view_name(request):
+    """
+    Nome da view que atendeu a requisição: Classe.ação para ViewSets (ex.: BookViewSet.list),
+    nome da classe ou da função nos demais casos
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view_class is None:
+        return getattr(func, '__name__', match.view_name)
+    actions = getattr(func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower())
+        if action:
+            return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+class MetricsMiddleware:
+    """
+    Mede cada requisição (latência, consultas SQL via connection.execute_wrapper e tamanho da resposta)
+    e acumula os valores por view em api_rest.metrics.registry.
+    Requisições acima do orçamento de consultas são registradas no log e contadas à parte.
+    Funciona nos modos síncrono (WSGI) e assíncrono (ASGI), sem trocar de thread nas views assíncronas
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path.rstrip('/') == METRICS_PATH:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if request.path.rstrip('/') == METRICS_PATH:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = await self.get_response(request)
+        return self._finish(request, response, recorder, started)
+
+    def _finish(self, request, response, recorder, started):
+        if response.streaming:
+            # Exportações CSV consultam o banco enquanto o corpo é enviado: mede até o fim do streaming
+            content = response.streaming_content
+            measure_stream = self._ameasure_stream if response.is_async else self._measure_stream
+            response.streaming_content = measure_stream(request, response, content, recorder, started)
+        else:
+            self._record(request, response, recorder, started, len(response.content))
+        return response
+
+    def _measure_stream(self, request, response, content, recorder, started):
+        size = 0
+        try:
+            with recorder.capture():
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self._record(request, response, recorder, started, size)
+
+    async def _ameasure_stream(self, request, response, content, recorder, started):
+        size = 0
+        try:
+            with recorder.capture():
+                async for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self._record(request, response, recorder, started, size)
+
+    def _record(self, request, response, recorder, started, size):
+        elapsed = time.perf_counter() - started
+        view = view_name(request)
+        budget = getattr(settings, 'METRICS_QUERY_BUDGET', QUERY_BUDGET)
+        over_budget = recorder.count > budget
+        if over_budget:
+            logger.warning(
+                "%s %s (%s) executou %d consultas SQL em %.1fms, acima do orçamento de %d",
+                request.method, request.get_full_path(), view, recorder.count, recorder.seconds * 1000, budget,
+            )
+        registry.record(
+            view, response.status_code, elapsed, recorder.count, recorder.seconds, size, over_budget=over_budget,
+        )
+
+class ReplicaRoutingMiddleware:
+    """
+    Escolhe o banco de leitura de cada requisição para o ReplicaRouter (api_rest/db.py): GET, HEAD e OPTIONS
+    leem de uma réplica de settings.DATABASE_REPLICAS, sorteada uma vez por requisição. Depois de uma requisição
+    que gravou, o cliente lê do primário por REPLICA_STICKY_SECONDS, para ver as próprias escritas enquanto as
+    réplicas se atualizam: pelo cookie REPLICA_PIN_COOKIE e, em requisições com token, por uma marca no cache
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        replicas = get_replicas()
+        if not replicas:
+            return self.get_response(request)
+        key = pin_key(request)
+        pinned = REPLICA_PIN_COOKIE in request.COOKIES or (key is not None and cache.get(key) is not None)
+        state = self._choose(request, replicas, pinned)
+        previous = get_routing_state()
+        set_routing_state(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            set_routing_state(previous)
+        if self._wrote(request, response, state) and key is not None:
+            cache.set(key, True, sticky_seconds())
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        replicas = get_replicas()
+        if not replicas:
+            return await self.get_response(request)
+        key = pin_key(request)
+        pinned = REPLICA_PIN_COOKIE in request.COOKIES or (key is not None and await cache.aget(key) is not None)
+        state = self._choose(request, replicas, pinned)
+        previous = get_routing_state()
+        set_routing_state(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            set_routing_state(previous)
+        if self._wrote(request, response, state) and key is not None:
+            await cache.aset(key, True, sticky_seconds())
+        return self._finish(request, response, state)
+
+    def _choose(self, request, replicas, pinned):
+        if request.method in SAFE_METHODS and not pinned:
+            return RoutingState(random.choice(replicas))
+        return RoutingState()
+
+    def _wrote(self, request, response, state):
+        return state.wrote or (request.method not in SAFE_METHODS and response.status_code < 400)
+
+    def _finish(self, request, response, state):
+        if self._wrote(request, response, state):
+            response.set_cookie(REPLICA_PIN_COOKIE, '1', max_age=sticky_seconds(), httponly=True, samesite='Lax')
+        if response.streaming and not response.is_async:
+            # As exportações CSV consultam o banco enquanto o corpo é enviado, depois do fim do middleware
+            response.streaming_content = self._stream(response.streaming_content, state)
+        return response
+
+    def _stream(self, content, state):
+        previous = get_routing_state()
+        set_routing_state(state)
+        try:
+            yield from content
+        finally:
+            set_routing_state(previous)
+
+def pin_key(request):
+    """
+    Chave de cache que prende ao primário os clientes autenticados por token (sem cookies) depois de gravarem
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return f'replica_pin:{hashlib.sha256(authorization.encode()).hexdigest()}'
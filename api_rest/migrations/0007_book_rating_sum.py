@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:09
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def rebuild_rating_stats(apps, schema_editor):
+    # Preenche as estatísticas dos livros que já possuem avaliações
+    Book = apps.get_model('api_rest', 'Book')
+    Rating = apps.get_model('api_rest', 'Rating')
+    ratings = Rating.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    Book.objects.update(
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total')), 0),
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0),
+    )
+    Book.objects.update(
+        average_rating=Coalesce(
+            Cast(F('rating_sum'), FloatField()) / Cast(NullIf(F('rating_count'), 0), FloatField()),
+            Value(0.0),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0006_rating_book_average_rating_book_rating_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='rating',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_rating_stats, migrations.RunPython.noop),
+    ]
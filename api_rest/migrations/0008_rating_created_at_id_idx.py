@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0007_book_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='rating',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['created_at', 'id'], name='rating_created_at_id_idx'),
+        ),
+    ]
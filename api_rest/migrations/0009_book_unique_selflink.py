@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def clear_duplicate_selflinks(apps, schema_editor):
+    """
+    Mantém o link apenas no livro mais antigo de cada grupo duplicado para a restrição poder ser criada.
+    Os livros repetidos não são mesclados: eles têm título ou autores diferentes (a restrição de título + autor
+    já existia) e avaliações próprias, e mesclá-los exigiria escolher os dados de um deles e mover as avaliações.
+    Apagar o link só tira o livro da deduplicação da importação do Google Books; título, descrição e avaliações
+    ficam intactos. Os ids alterados são impressos para uma eventual mescla manual
+    """
+    Book = apps.get_model('api_rest', 'Book')
+    # Só os links repetidos, agrupados no banco, em vez de carregar todos os livros
+    duplicated_links = list(
+        Book.objects.exclude(book_selfLink='').order_by().values('book_selfLink')
+        .annotate(n=models.Count('id')).filter(n__gt=1).values_list('book_selfLink', flat=True)
+    )
+    for link in duplicated_links:
+        kept, *cleared = Book.objects.filter(book_selfLink=link).order_by('id').values_list('id', flat=True)
+        Book.objects.filter(id__in=cleared).update(book_selfLink='')
+        print(f"\n  book_selfLink {link!r} mantido no livro {kept} e removido dos livros {cleared}", end='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0008_rating_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_selflinks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(condition=models.Q(('book_selfLink', ''), _negated=True), fields=('book_selfLink',), name='unique_book_selflink'),
+        ),
+    ]
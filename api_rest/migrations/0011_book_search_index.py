@@ -0,0 +1,81 @@
+from django.db import migrations
+
+from ._search_index import postgres_search_vector
+
+# Tabela FTS5 com conteúdo externo: guarda apenas o índice e lê os textos de api_rest_book pelo rowid (id)
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_rest_book_fts USING fts5(
+        book_title, book_authors, book_description,
+        content='api_rest_book', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Triggers mantêm o índice sincronizado com qualquer escrita em Book (save, bulk_create, update, delete)
+    """
+    CREATE TRIGGER api_rest_book_fts_insert AFTER INSERT ON api_rest_book BEGIN
+        INSERT INTO api_rest_book_fts(rowid, book_title, book_authors, book_description)
+        VALUES (new.id, new.book_title, new.book_authors, new.book_description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_rest_book_fts_delete AFTER DELETE ON api_rest_book BEGIN
+        INSERT INTO api_rest_book_fts(api_rest_book_fts, rowid, book_title, book_authors, book_description)
+        VALUES ('delete', old.id, old.book_title, old.book_authors, old.book_description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_rest_book_fts_update AFTER UPDATE OF book_title, book_authors, book_description ON api_rest_book BEGIN
+        INSERT INTO api_rest_book_fts(api_rest_book_fts, rowid, book_title, book_authors, book_description)
+        VALUES ('delete', old.id, old.book_title, old.book_authors, old.book_description);
+        INSERT INTO api_rest_book_fts(rowid, book_title, book_authors, book_description)
+        VALUES (new.id, new.book_title, new.book_authors, new.book_description);
+    END
+    """,
+    # Indexa os livros já existentes
+    "INSERT INTO api_rest_book_fts(api_rest_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_rest_book_fts_insert",
+    "DROP TRIGGER IF EXISTS api_rest_book_fts_delete",
+    "DROP TRIGGER IF EXISTS api_rest_book_fts_update",
+    "DROP TABLE IF EXISTS api_rest_book_fts",
+]
+
+POSTGRES_INDEX_NAME = 'book_search_vector_gin'
+
+
+def postgres_index():
+    from django.contrib.postgres.indexes import GinIndex
+
+    # Mesma expressão usada nas buscas (api_rest.search), para o PostgreSQL usar o índice
+    return GinIndex(postgres_search_vector(), name=POSTGRES_INDEX_NAME)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('api_rest', 'Book'), postgres_index())
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_BACKWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('api_rest', 'Book'), postgres_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0010_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0011_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['book', '-created_at', '-id'], name='rating_book_created_at_idx'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='api_rest.book'),
+        ),
+    ]
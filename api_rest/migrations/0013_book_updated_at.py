@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0012_rating_book_created_at_idx'),
+    ]
+
+    # No SQLite o AddField abaixo recria api_rest_book e descarta os triggers da busca (migração 0011);
+    # eles são recriados ao fim do migrate (post_migrate em api_rest.apps, search.ensure_sqlite_search_index)
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:34
+
+import api_rest.models
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+# Média a priori no momento desta migração (models.RATING_PRIOR_VOTES e RATING_PRIOR_MEAN); com outros valores
+# em settings, execute python manage.py rebuild_rating_stats
+PRIOR_VOTES = 10
+PRIOR_MEAN = 2.5
+
+
+def fill_bayesian_rating(apps, schema_editor):
+    # Calcula a média bayesiana dos livros existentes. Os triggers da busca, descartados pelo SQLite ao recriar
+    # api_rest_book no AddField abaixo, são recriados ao fim do migrate (post_migrate em api_rest.apps)
+    Book = apps.get_model('api_rest', 'Book')
+    votes, mean = PRIOR_VOTES, PRIOR_MEAN
+    Book.objects.update(
+        bayesian_rating=Coalesce(
+            (Value(float(votes * mean)) + Cast(F('rating_sum'), FloatField()))
+            / NullIf(Value(float(votes)) + Cast(F('rating_count'), FloatField()), Value(0.0)),
+            Value(0.0),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0013_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='bayesian_rating',
+            field=models.FloatField(default=api_rest.models.default_bayesian_rating),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['bayesian_rating', 'rating_count', 'id'], name='book_top_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating_count', 'average_rating', 'id'], name='book_most_rated_idx'),
+        ),
+        migrations.RunPython(fill_bayesian_rating, migrations.RunPython.noop),
+    ]
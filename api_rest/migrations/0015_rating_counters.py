@@ -0,0 +1,63 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rating_counters(apps, schema_editor):
+    # Contadores por nota e por dia das avaliações existentes (o mesmo cálculo de models.rebuild_rating_counters)
+    Rating = apps.get_model('api_rest', 'Rating')
+    RatingHistogram = apps.get_model('api_rest', 'RatingHistogram')
+    RatingDay = apps.get_model('api_rest', 'RatingDay')
+    ratings = Rating.objects.order_by()
+    histograms = ratings.values('book').annotate(
+        rating_sum=Sum('score'),
+        **{f'score_{score}': Count('id', filter=Q(score=score)) for score in range(0, 6)},
+    )
+    days = ratings.annotate(day=TruncDate('created_at')).values('book', 'day').annotate(
+        rating_count=Count('id'),
+        rating_sum=Sum('score'),
+    )
+    RatingHistogram.objects.bulk_create(
+        [RatingHistogram(book_id=row.pop('book'), **row) for row in histograms.iterator()], batch_size=1000
+    )
+    RatingDay.objects.bulk_create([RatingDay(book_id=row.pop('book'), **row) for row in days.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0014_book_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingHistogram',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_histogram', serialize=False, to='api_rest.book')),
+                ('score_0', models.PositiveIntegerField(default=0)),
+                ('score_1', models.PositiveIntegerField(default=0)),
+                ('score_2', models.PositiveIntegerField(default=0)),
+                ('score_3', models.PositiveIntegerField(default=0)),
+                ('score_4', models.PositiveIntegerField(default=0)),
+                ('score_5', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RatingDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rating_days', to='api_rest.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('book', 'day'), name='unique_rating_day_book_day')],
+            },
+        ),
+        migrations.RunPython(fill_rating_counters, migrations.RunPython.noop),
+    ]
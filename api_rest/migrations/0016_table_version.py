@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_table_versions(apps, schema_editor):
+    # Uma linha por tabela versionada (models.BOOKS_TABLE e models.RATINGS_TABLE)
+    TableVersion = apps.get_model('api_rest', 'TableVersion')
+    TableVersion.objects.bulk_create([TableVersion(name='books'), TableVersion(name='ratings')])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0015_rating_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_table_versions, migrations.RunPython.noop),
+    ]
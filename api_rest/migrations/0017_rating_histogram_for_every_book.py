@@ -0,0 +1,25 @@
+from itertools import islice
+
+from django.db import migrations
+
+
+def create_missing_histograms(apps, schema_editor):
+    # A partir desta migração todo livro tem a sua linha em RatingHistogram (criada junto com o livro);
+    # a migração 0015 criou apenas as dos livros com avaliações
+    Book = apps.get_model('api_rest', 'Book')
+    RatingHistogram = apps.get_model('api_rest', 'RatingHistogram')
+    book_ids = Book.objects.filter(rating_histogram__isnull=True).values_list('pk', flat=True).iterator()
+    rows = (RatingHistogram(book_id=book_id) for book_id in book_ids)
+    while batch := list(islice(rows, 1000)):
+        RatingHistogram.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0016_table_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_histograms, migrations.RunPython.noop),
+    ]
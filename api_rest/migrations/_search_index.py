@@ -0,0 +1,18 @@
+"""
+Cópia congelada do vetor de busca do PostgreSQL usado pela migração 0011.
+Não importe api_rest.search aqui: as migrações precisam continuar aplicando o mesmo schema mesmo que o código
+da busca mude. O prefixo "_" faz o Django ignorar este módulo ao carregar as migrações.
+"""
+
+
+def postgres_search_vector():
+    """
+    Vetor de busca do PostgreSQL no momento da migração 0011 (o mesmo de api_rest.search.book_search_vector)
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('book_title', weight='A', config='simple')
+        + SearchVector('book_authors', weight='B', config='simple')
+        + SearchVector('book_description', weight='C', config='simple')
+    )
@@ -1,5 +1,76 @@
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import connections, router, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf, TruncDate
+from django.utils import timezone
+
+def _average(total, count):
+    # Média em ponto flutuante; NullIf evita divisão por zero e Coalesce devolve 0.0 para livros sem avaliações
+    return Coalesce(Cast(total, FloatField()) / Cast(NullIf(count, 0), FloatField()), Value(0.0))
+
+# Média a priori da nota bayesiana: cada livro começa com RATING_PRIOR_VOTES votos fictícios de nota RATING_PRIOR_MEAN,
+# então livros com poucas avaliações não passam à frente dos que têm muitas. Após alterar os valores, execute rebuild_rating_stats
+RATING_PRIOR_VOTES = 10
+RATING_PRIOR_MEAN = 2.5
+
+def rating_prior():
+    return (
+        getattr(settings, 'RATING_PRIOR_VOTES', RATING_PRIOR_VOTES),
+        getattr(settings, 'RATING_PRIOR_MEAN', RATING_PRIOR_MEAN),
+    )
+
+def default_bayesian_rating():
+    # Livro sem avaliações: a nota bayesiana é a própria média a priori
+    votes, mean = rating_prior()
+    return float(mean) if votes else 0.0
+
+def _bayesian(total, count):
+    # (votos a priori * média a priori + soma das notas) / (votos a priori + total de avaliações)
+    votes, mean = rating_prior()
+    return Coalesce(
+        (Value(float(votes * mean)) + Cast(total, FloatField()))
+        / NullIf(Value(float(votes)) + Cast(count, FloatField()), Value(0.0)),
+        Value(0.0),
+    )
+
+class BookQuerySet(models.QuerySet):
+    def apply_rating_delta(self, count, total):
+        """
+        Soma count ao total de avaliações e total à soma das notas dos livros filtrados.
+        O UPDATE usa F() e é atômico no banco, então escritas concorrentes não se sobrescrevem
+        """
+        return self.update(
+            rating_count=F('rating_count') + count,
+            rating_sum=F('rating_sum') + total,
+            # No UPDATE, F() sempre enxerga os valores anteriores da linha
+            average_rating=_average(F('rating_sum') + total, F('rating_count') + count),
+            bayesian_rating=_bayesian(F('rating_sum') + total, F('rating_count') + count),
+            updated_at=Now(),
+        )
+
+    def rebuild_rating_stats(self):
+        """
+        Recalcula rating_count, rating_sum, average_rating e bayesian_rating a partir da tabela Rating
+        sem carregar os livros em memória, além dos contadores por nota e por dia (RatingHistogram e RatingDay)
+        """
+        ratings = Rating.objects.filter(book=OuterRef('pk')).order_by().values('book')
+        with transaction.atomic():
+            rebuild_rating_counters(self.values('pk'))
+            updated = self.update(
+                rating_count=Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total')), 0),
+                rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0),
+            )
+            self.update(
+                average_rating=_average(F('rating_sum'), F('rating_count')),
+                bayesian_rating=_bayesian(F('rating_sum'), F('rating_count')),
+                updated_at=Now(),
+            )
+        return updated
 
 # Create your models here.
 class Book(models.Model):
@@ -10,6 +81,11 @@ class Book(models.Model):
     book_selfLink = models.CharField(max_length=255, default='', help_text="Link do livro")
     average_rating = models.FloatField(default=0.0)  # Nota média dos livros
     rating_count = models.PositiveIntegerField(default=0)  # Total de avaliações
+    rating_sum = models.PositiveIntegerField(default=0)  # Soma das notas, usada para manter a média exata
+    bayesian_rating = models.FloatField(default=default_bayesian_rating)  # Média bayesiana, usada no ranking top_rated
+    updated_at = models.DateTimeField(auto_now=True)  # Última alteração do livro ou das suas estatísticas (ETag/Last-Modified)
+
+    objects = BookQuerySet.as_manager()
 
     """
     classe interna usada para definir metadados ou configurações do modelo
@@ -19,14 +95,26 @@ class Book(models.Model):
         ordering = ['id']  # para não causar resultados inconsistentes na paginação
         constraints = [
             # Garante unicidade de título + autor
-            models.UniqueConstraint(fields=['book_title', 'book_authors'], name='unique_book_title_author')
+            models.UniqueConstraint(fields=['book_title', 'book_authors'], name='unique_book_title_author'),
+            # Garante unicidade do link (livros criados sem link ficam de fora), usado na importação do Google Books
+            models.UniqueConstraint(
+                fields=['book_selfLink'],
+                condition=~models.Q(book_selfLink=''),
+                name='unique_book_selflink',
+            ),
+        ]
+        indexes = [
+            # Rankings top_rated e most_rated com paginação por cursor (pagination.KeysetPagination)
+            models.Index(fields=['bayesian_rating', 'rating_count', 'id'], name='book_top_rated_idx'),
+            models.Index(fields=['rating_count', 'average_rating', 'id'], name='book_most_rated_idx'),
         ]
 
     def __str__(self) -> str:   
         return f'Title: {self.book_title} | Authors: {self.book_authors}'
     
 class Rating(models.Model):
-    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='ratings')
+    # O índice composto (book, -created_at) de Meta.indexes já atende às buscas por livro
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='ratings', db_index=False)
     # Score deve ser um numero inteiro positivo entre  0 e 5
     score = models.IntegerField(
         validators=[MinValueValidator(0), MaxValueValidator(5)]
@@ -35,7 +123,262 @@ class Rating(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created_at']  # ordenar por data de criação, mais recente primeiro
+        ordering = ['-created_at', '-id']  # ordenar por data de criação, mais recente primeiro (id desempata)
+        indexes = [
+            # Apoia a ordenação e a paginação por cursor das avaliações
+            models.Index(fields=['created_at', 'id'], name='rating_created_at_id_idx'),
+            # Apoia filter(book=...).order_by('-created_at', '-id')
+            models.Index(fields=['book', '-created_at', '-id'], name='rating_book_created_at_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda os valores carregados para calcular a diferença nas estatísticas do livro ao atualizar
+        instance._loaded_book_id = instance.__dict__.get('book_id')
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Garante que a avaliação e as estatísticas do livro (signals.py) sejam gravadas na mesma transação
+        # savepoint=False evita SAVEPOINT/RELEASE extras quando já existe uma transação aberta
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        self._loaded_book_id = self.book_id
+        self._loaded_score = self.score
 
     def __str__(self) -> str:   
         return f'Book: {self.book} | Score: {self.score}'
+
+
+# Notas aceitas por Rating.score: um contador por nota em RatingHistogram
+RATING_SCORES = range(0, 6)
+RATING_COUNTER_BATCH_SIZE = 1000  # linhas de contadores inseridas por vez no recálculo
+
+def rating_day(created_at):
+    # Dia de uma avaliação no fuso de TIME_ZONE, o mesmo de TruncDate no recálculo
+    return timezone.localdate(created_at)
+
+class CounterQuerySet(models.QuerySet):
+    def increment(self, deltas):
+        """
+        Soma deltas ({chave: {campo: valor}}, com a chave nos campos de COUNTER_KEY do modelo) aos contadores.
+        Um UPDATE com F() por linha, atômico no banco. Em modelos com COUNTER_UPSERT, as linhas que só recebem
+        somas positivas vão todas em um único INSERT ... ON CONFLICT DO UPDATE (upsert). As linhas que o UPDATE não
+        encontra são criadas zeradas em um único INSERT que ignora conflitos (outra transação pode criá-las ao mesmo
+        tempo) e recebem o UPDATE em seguida
+        """
+        updates = {
+            key: {name: F(name) + value for name, value in fields.items() if value} for key, fields in deltas.items()
+        }
+        # Sempre na mesma ordem, para que transações concorrentes não travem uma à outra
+        keys = sorted(key for key, fields in updates.items() if fields)
+        db = router.db_for_write(self.model)
+        if self.model.COUNTER_UPSERT and connections[db].features.supports_update_conflicts_with_target:
+            # Deltas negativos (remoções) só ocorrem em linhas existentes e seguem pelo UPDATE:
+            # o INSERT do upsert recusaria o valor negativo (CHECK >= 0) antes de detectar o conflito
+            upserted = [key for key in keys if min(deltas[key].values()) >= 0]
+            self._upsert(db, upserted, deltas)
+            keys = [key for key in keys if min(deltas[key].values()) < 0]
+        missing = [key for key in keys if not self.filter(**self.key_lookup(key)).update(**updates[key])]
+        if missing:
+            self.bulk_create([self.model(**self.key_lookup(key)) for key in missing], ignore_conflicts=True)
+            for key in missing:
+                self.filter(**self.key_lookup(key)).update(**updates[key])
+
+    def key_lookup(self, key):
+        return dict(zip(self.model.COUNTER_KEY, key))
+
+    def _upsert(self, db, keys, deltas):
+        """
+        INSERT ... ON CONFLICT (COUNTER_KEY) DO UPDATE que soma os deltas às linhas existentes e cria as que faltam
+        """
+        if not keys:
+            return
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        key_fields = [meta.get_field(name) for name in self.model.COUNTER_KEY]
+        names = sorted({name for key in keys for name in deltas[key]})
+        columns = [field.column for field in key_fields] + names
+        table = quote(meta.db_table)
+        row = '(%s)' % ', '.join(['%s'] * len(columns))
+        increments = ', '.join(f'{quote(name)} = {table}.{quote(name)} + EXCLUDED.{quote(name)}' for name in names)
+        batch_size = max(1, (connection.features.max_query_params or len(keys) * len(columns)) // len(columns))
+        with connection.cursor() as cursor:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                params = []
+                for key in batch:
+                    params += [field.get_db_prep_value(value, connection) for field, value in zip(key_fields, key)]
+                    params += [deltas[key].get(name, 0) for name in names]
+                cursor.execute(
+                    f'INSERT INTO {table} ({", ".join(map(quote, columns))}) VALUES {", ".join([row] * len(batch))} '
+                    f'ON CONFLICT ({", ".join(quote(field.column) for field in key_fields)}) DO UPDATE SET {increments}',
+                    params,
+                )
+
+class RatingHistogram(models.Model):
+    """
+    Quantidade de avaliações de cada nota (0 a 5) e soma das notas de um livro, mantidas a cada escrita em Rating
+    (signals.py e services/ratings.py): as estatísticas do livro saem de uma única linha, sem percorrer Rating.
+    A linha é criada junto com o livro (create_rating_histograms), então as avaliações só precisam do UPDATE
+    """
+    book = models.OneToOneField('Book', on_delete=models.CASCADE, primary_key=True, related_name='rating_histogram')
+    score_0 = models.PositiveIntegerField(default=0)
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    objects = CounterQuerySet.as_manager()
+    COUNTER_KEY = ('book_id',)
+    COUNTER_UPSERT = False
+
+    def __str__(self) -> str:
+        return f'Book: {self.book_id} | Histogram: {[getattr(self, f"score_{score}") for score in RATING_SCORES]}'
+
+class RatingDay(models.Model):
+    """
+    Quantidade e soma das notas das avaliações de um livro criadas em um dia: a média dos últimos N dias
+    soma no máximo N linhas
+    """
+    # A restrição única (book, day) já atende às buscas por livro
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='rating_days', db_index=False)
+    day = models.DateField()
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    objects = CounterQuerySet.as_manager()
+    COUNTER_KEY = ('book_id', 'day')
+    COUNTER_UPSERT = True  # uma linha nova por livro a cada dia: o upsert evita o UPDATE que não encontra a linha
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='unique_rating_day_book_day'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Book: {self.book_id} | Day: {self.day} | Count: {self.rating_count}'
+
+def create_rating_histograms(book_ids):
+    """
+    Cria as linhas zeradas de RatingHistogram dos livros em book_ids, ignorando as que já existem
+    """
+    rows = (RatingHistogram(book_id=book_id) for book_id in book_ids)
+    while batch := list(islice(rows, RATING_COUNTER_BATCH_SIZE)):
+        RatingHistogram.objects.bulk_create(batch, ignore_conflicts=True)
+
+def apply_rating_counters(changes):
+    """
+    Atualiza RatingHistogram e RatingDay a partir de tuplas (book_id, score, created_at, quantidade), com
+    quantidade 1 para avaliações criadas e -1 para removidas. Cada livro e cada dia recebem um único UPDATE
+    """
+    histograms = defaultdict(Counter)  # (book_id,) -> {campo: delta}
+    days = defaultdict(Counter)  # (book_id, dia) -> {campo: delta}
+    for book_id, score, created_at, count in changes:
+        histogram = histograms[(book_id,)]
+        histogram[f'score_{score}'] += count
+        histogram['rating_sum'] += score * count
+        day = days[(book_id, rating_day(created_at))]
+        day['rating_count'] += count
+        day['rating_sum'] += score * count
+    RatingHistogram.objects.increment(histograms)
+    RatingDay.objects.increment(days)
+
+def rebuild_rating_counters(book_ids):
+    """
+    Recria RatingHistogram e RatingDay dos livros em book_ids (lista ou subconsulta) a partir da tabela Rating
+    """
+    RatingHistogram.objects.filter(book__in=book_ids).delete()
+    RatingDay.objects.filter(book__in=book_ids).delete()
+    ratings = Rating.objects.filter(book__in=book_ids).order_by()
+    histograms = ratings.values('book').annotate(
+        rating_sum=Sum('score'),
+        **{f'score_{score}': Count('id', filter=Q(score=score)) for score in RATING_SCORES},
+    )
+    days = ratings.annotate(day=TruncDate('created_at')).values('book', 'day').annotate(
+        rating_count=Count('id'),
+        rating_sum=Sum('score'),
+    )
+    for model, rows in ((RatingHistogram, histograms), (RatingDay, days)):
+        rows = (model(book_id=row.pop('book'), **row) for row in rows.iterator())
+        while batch := list(islice(rows, RATING_COUNTER_BATCH_SIZE)):
+            model.objects.bulk_create(batch)
+    # Livros sem avaliações também têm a linha do histograma, zerada
+    create_rating_histograms(
+        Book.objects.filter(pk__in=book_ids, rating_histogram__isnull=True).values_list('pk', flat=True).iterator()
+    )
+
+
+# Tabelas com versão própria (TableVersion), usada no ETag e no Last-Modified das listagens
+BOOKS_TABLE = 'books'
+RATINGS_TABLE = 'ratings'
+
+class TableVersionQuerySet(models.QuerySet):
+    def bump(self, *names):
+        """
+        Incrementa a versão das tabelas em names em um único UPDATE, na transação da escrita que a chamou.
+        As linhas são criadas pela migração; se faltarem (ex.: após um flush), são recriadas
+        """
+        names = sorted(set(names))
+        now = timezone.now()
+        if self.filter(name__in=names).update(version=F('version') + 1, updated_at=now) < len(names):
+            self.bulk_create([self.model(name=name, version=1, updated_at=now) for name in names], ignore_conflicts=True)
+
+    def current(self, name):
+        # (versão, data da última escrita) da tabela; (0, None) se a linha não existir
+        return self.filter(name=name).values_list('version', 'updated_at').first() or (0, None)
+
+    async def acurrent(self, name):
+        return await self.filter(name=name).values_list('version', 'updated_at').afirst() or (0, None)
+
+class TableVersion(models.Model):
+    """
+    Versão de uma tabela, incrementada a cada escrita (signals.py e escritas em massa): o ETag e o Last-Modified
+    das listagens leem uma única linha, sem agregar a tabela inteira
+    """
+    name = models.CharField(max_length=20, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = TableVersionQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f'Table: {self.name} | Version: {self.version}'
+
+
+class ImportJob(models.Model):
+    """
+    Importação do Google Books executada em segundo plano (services/import_jobs.py)
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        RUNNING = 'running', 'Em execução'
+        DONE = 'done', 'Concluída'
+        FAILED = 'failed', 'Falhou'
+
+    query = models.CharField(max_length=255, help_text="Termo de busca normalizado")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    total_items = models.PositiveIntegerField(default=0)  # Volumes retornados pelo Google Books
+    processed_items = models.PositiveIntegerField(default=0)  # Volumes já processados
+    created_count = models.PositiveIntegerField(default=0)  # Livros criados
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Apenas um job pendente ou em execução por termo de busca: pedidos repetidos reaproveitam o mesmo job
+            models.UniqueConstraint(
+                fields=['query'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_import_job_query',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Query: {self.query} | Status: {self.status}'
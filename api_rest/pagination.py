@@ -0,0 +1,195 @@
+import base64
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Maior page_size que o cliente pode pedir via query param
+MAX_PAGE_SIZE = 100
+
+class StandardPagination(PageNumberPagination):
+    """
+    Paginação por número de página (padrão), com page_size definido pelo cliente até MAX_PAGE_SIZE
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+class BookCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) dos livros: usa WHERE id > cursor em vez de COUNT(*) + OFFSET,
+    então páginas profundas custam o mesmo que a primeira
+    """
+    ordering = 'id'  # mesma ordenação de Book.Meta.ordering
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+class RatingCursorPagination(CursorPagination):
+    """
+    Paginação por cursor das avaliações, apoiada no índice (created_at, id) de Rating
+    """
+    ordering = ('-created_at', '-id')  # mesma ordenação de Rating.Meta.ordering
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor sobre uma ordenação de vários campos (o último deve ser único, ex.: id).
+    O CursorPagination do DRF posiciona o cursor só pelo primeiro campo e usa OFFSET nos empates; aqui
+    o cursor guarda todos os valores da última linha e a continuação é buscada em até len(ordering) faixas
+    do índice (mesmo prefixo e próximo valor do campo seguinte), cada uma em tempo constante
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    invalid_cursor_message = 'Cursor inválido'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+            or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse=False):
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, obj):
+        # Aceita instâncias e linhas de .values()
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, field) for field in self.fields]
+
+    def _segments(self, queryset, ordering, position):
+        # Linhas depois do cursor, já na ordem da paginação: mesmo prefixo com o último campo depois do cursor,
+        # depois o prefixo menor com o penúltimo campo depois do cursor, e assim por diante
+        fields = self.fields
+        for index in range(len(fields) - 1, -1, -1):
+            filters = dict(zip(fields[:index], position[:index]))
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            filters[f'{fields[index]}__{lookup}'] = position[index]
+            yield queryset.filter(**filters)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        # Página anterior: percorre a ordenação invertida a partir do cursor e devolve as linhas na ordem normal
+        ordering = list(self.ordering)
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        limit = self.page_size + 1  # uma linha a mais indica se existe outra página
+        if position is None:
+            rows = list(queryset[:limit])
+        else:
+            rows = []
+            for segment in self._segments(queryset, ordering, position):
+                rows.extend(segment[:limit - len(rows)])
+                if len(rows) >= limit:
+                    break
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor da página, obtido nos links next e previous',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Quantidade de itens por página (máximo de {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+class TopRatedPagination(KeysetPagination):
+    """
+    Ranking pela média bayesiana, apoiado no índice book_top_rated_idx
+    """
+    ordering = ('-bayesian_rating', '-rating_count', '-id')
+
+class MostRatedPagination(KeysetPagination):
+    """
+    Ranking pelo total de avaliações, apoiado no índice book_most_rated_idx
+    """
+    ordering = ('-rating_count', '-average_rating', '-id')
+
+def get_paginator(request, cursor_class):
+    """
+    Escolhe o paginador da requisição: a paginação por cursor é opcional e ativada com ?pagination=cursor
+    """
+    if request.query_params.get('pagination') == 'cursor':
+        return cursor_class()
+    return StandardPagination()
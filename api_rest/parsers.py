@@ -0,0 +1,55 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import orjson
+
+def loads(data):
+    """
+    Lê JSON com orjson quando disponível. NaN e Infinity são rejeitados, como no JSONParser do DRF
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data, parse_constant=_reject_constant)
+
+def _reject_constant(value):
+    raise ValueError(f'Valor JSON inválido: {value}')
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser que usa orjson para ler o corpo de uma vez, sem decodificar o texto antes (o orjson lê UTF-8)
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read() if stream is not None else b''
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return loads(data)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+class NDJSONParser(BaseParser):
+    """
+    Lê um corpo NDJSON (um objeto JSON por linha) como uma lista, linha a linha, sem carregar o texto inteiro de uma vez
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        utf8 = codecs.lookup(encoding).name == 'utf-8'
+        rows = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(loads(line if utf8 else line.decode(encoding)))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON inválido na linha {line_number}: {exc}')
+        return rows
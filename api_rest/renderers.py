@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # sem orjson, os renderers e parsers rápidos usam o módulo json da biblioteca padrão
+    orjson = None
+
+# Datetimes passam pelo mesmo encoder do DRF (ISO 8601 com 'Z' para UTC), assim como Decimal,
+# UUID e textos traduzíveis; chaves não textuais são convertidas como no json da biblioteca padrão
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_encoder = JSONEncoder()
+
+def dumps(data):
+    """
+    Serializa data em bytes UTF-8 com orjson, com a mesma saída do JSONRenderer do DRF para os tipos suportados
+    """
+    return orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer que usa orjson. Indentação (Accept: application/json; indent=4) e configurações
+    não padrão do DRF (UNICODE_JSON/COMPACT_JSON desativados) continuam com o renderer original
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or not (api_settings.UNICODE_JSON and api_settings.COMPACT_JSON)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = dumps(data)
+        # Assim como o DRF, escapa U+2028 e U+2029, válidos em JSON mas não em JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
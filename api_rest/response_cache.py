@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .conditional import not_modified_response, set_conditional_headers
+from .db import sticky_seconds, use_primary
+
+CACHE_ALIAS = 'responses'  # alias em settings.CACHES; sem ele, usa o cache 'default'
+CACHE_TIMEOUT = 300  # segundos; a invalidação normal é pela versão, o timeout só limita entradas antigas
+VERSION_KEY = 'books:version'  # versão global: trocada, invalida todas as respostas
+LIST_SCOPE = 'list'  # listagens e rankings; o detalhe e as estatísticas de cada livro usam book_scope(id)
+LOCK_TIMEOUT = 10  # segundos que a trava de recálculo de uma entrada pode ficar presa
+LOCK_WAIT = 2.0  # segundos que uma requisição espera outra recalcular a mesma entrada
+LOCK_POLL_INTERVAL = 0.02
+
+def book_scope(book_id):
+    # pk da URL como número: "05" e 5 são o mesmo livro e precisam da mesma versão
+    try:
+        book_id = int(book_id)
+    except (TypeError, ValueError):
+        pass
+    return f'book:{book_id}'
+
+def _parse_last_modified(value):
+    timestamp = parse_http_date_safe(value) if value else None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp is not None else None
+
+class BookResponseCache:
+    """
+    Cache das respostas de GET /api/books/ e /api/books/{id}/ para requisições anônimas, no cache do Django.
+    As chaves incluem a versão global e a do escopo da resposta (LIST_SCOPE ou book_scope(id)), trocadas a cada
+    escrita em livros ou avaliações (invalidate): avaliar um livro invalida as listagens e aquele livro, sem
+    descartar o detalhe dos demais. Quando uma entrada não existe, apenas uma requisição a recalcula
+    (trava com cache.add) e as demais esperam o resultado
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0  # requisições que esperaram outra recalcular a entrada
+
+    @property
+    def backend(self):
+        alias = CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else 'default'
+        return caches[alias]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'BOOKS_RESPONSE_CACHE_TIMEOUT', CACHE_TIMEOUT)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _version_keys(scope):
+        return [VERSION_KEY, f'{VERSION_KEY}:{scope}']
+
+    def versions(self, scope=LIST_SCOPE):
+        """
+        Versões global e do escopo; as que não existem (ou foram descartadas pelo backend) são criadas
+        """
+        keys = self._version_keys(scope)
+        found = self.backend.get_many(keys)
+        for key in keys:
+            if key not in found:
+                version = time.time_ns()
+                # add() não sobrescreve a versão criada por outra requisição ao mesmo tempo
+                if not self.backend.add(key, version, None):
+                    version = self.backend.get(key, version)
+                found[key] = version
+        return [found[key] for key in keys]
+
+    async def aversions(self, scope=LIST_SCOPE):
+        keys = self._version_keys(scope)
+        found = await self.backend.aget_many(keys)
+        for key in keys:
+            if key not in found:
+                version = time.time_ns()
+                if not await self.backend.aadd(key, version, None):
+                    version = await self.backend.aget(key, version)
+                found[key] = version
+        return [found[key] for key in keys]
+
+    def _bump(self, keys):
+        version = time.time_ns()
+        self.backend.set_many({key: version for key in keys}, None)
+
+    def invalidate(self, book_ids=None):
+        """
+        Troca as versões agora e de novo após o commit: respostas montadas por outras requisições
+        durante a transação, ainda com os dados antigos, não sobrevivem ao commit.
+        Sem book_ids troca a versão global; com book_ids, a das listagens e a de cada livro informado
+        """
+        if book_ids is None:
+            keys = [VERSION_KEY]
+        else:
+            keys = [f'{VERSION_KEY}:{scope}' for scope in (LIST_SCOPE, *map(book_scope, set(book_ids)))]
+        self._bump(keys)
+        transaction.on_commit(lambda: self._bump(keys))
+
+    @staticmethod
+    def _build_context(versions):
+        """
+        Logo depois de uma invalidação (versões são time.time_ns() da troca), a resposta que vai para o cache é
+        montada no primário: uma réplica atrasada guardaria os dados antigos sob a versão nova
+        """
+        if time.time_ns() - max(versions) < sticky_seconds() * 1_000_000_000:
+            return use_primary()
+        return nullcontext()
+
+    def make_key(self, request, scope=LIST_SCOPE, versions=None):
+        # URL absoluta (esquema e host): os links next e previous guardados na resposta são absolutos
+        uri = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+        versions = self.versions(scope) if versions is None else versions
+        return f'books:{scope}:{":".join(map(str, versions))}:{uri}'
+
+    def _wait_for(self, key):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = self.backend.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    async def _await_for(self, key):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            entry = await self.backend.aget(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def _from_entry(self, request, entry, response_class=Response):
+        etag, last_modified = entry['etag'], entry['last_modified']
+        if etag is not None:
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+        response = response_class(entry['data'], status=entry['status'])
+        if etag is not None:
+            set_conditional_headers(response, etag, last_modified)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def _to_entry(self, response):
+        return {
+            'status': response.status_code,
+            'data': response.data,
+            'etag': response.get('ETag'),
+            'last_modified': _parse_last_modified(response.get('Last-Modified')),
+        }
+
+    def get_or_build(self, request, build, scope=LIST_SCOPE):
+        versions = self.versions(scope)
+        key = self.make_key(request, scope, versions)
+        entry = self.backend.get(key)
+        if entry is not None:
+            self._count('hits')
+            return self._from_entry(request, entry)
+
+        lock_key = f'{key}:lock'
+        locked = self.backend.add(lock_key, 1, LOCK_TIMEOUT)
+        if not locked:
+            # Outra requisição já está montando a mesma resposta
+            entry = self._wait_for(key)
+            if entry is not None:
+                self._count('waits')
+                self._count('hits')
+                return self._from_entry(request, entry)
+
+        self._count('misses')
+        try:
+            with self._build_context(versions):
+                response = build()
+            # Apenas respostas completas são guardadas (304 e erros não)
+            if response.status_code == 200:
+                self.backend.set(key, self._to_entry(response), self.timeout)
+        finally:
+            # Só quem obteve a trava a remove: quem desistiu de esperar não apaga a trava de outra requisição
+            if locked:
+                self.backend.delete(lock_key)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def aget_or_build(self, request, build, response_class, scope=LIST_SCOPE):
+        """
+        Versão assíncrona de get_or_build para as views assíncronas: build é uma corrotina e response_class
+        monta a resposta a partir dos dados guardados (ex.: JSONResponse de async_views.py)
+        """
+        versions = await self.aversions(scope)
+        key = self.make_key(request, scope, versions)
+        entry = await self.backend.aget(key)
+        if entry is not None:
+            self._count('hits')
+            return self._from_entry(request, entry, response_class)
+
+        lock_key = f'{key}:lock'
+        locked = await self.backend.aadd(lock_key, 1, LOCK_TIMEOUT)
+        if not locked:
+            entry = await self._await_for(key)
+            if entry is not None:
+                self._count('waits')
+                self._count('hits')
+                return self._from_entry(request, entry, response_class)
+
+        self._count('misses')
+        try:
+            with self._build_context(versions):
+                response = await build()
+            if response.status_code == 200:
+                await self.backend.aset(key, self._to_entry(response), self.timeout)
+        finally:
+            if locked:
+                await self.backend.adelete(lock_key)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.waits = 0
+
+    def clear(self):
+        self.backend.clear()
+        self.reset_stats()
+
+response_cache = BookResponseCache()
+
+def invalidate_books_cache(book_ids=None):
+    """
+    Invalida as respostas de livros em cache: todas (book_ids=None) ou as listagens e os livros em book_ids
+    """
+    response_cache.invalidate(book_ids)
+
+def cache_book_response(view_method):
+    """
+    Decorador dos métodos de leitura do BookViewSet: requisições GET anônimas passam pelo cache.
+    Rotas de um livro (com pk) usam o escopo do livro; as demais, o das listagens
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        scope = book_scope(kwargs['pk']) if 'pk' in kwargs else LIST_SCOPE
+        return response_cache.get_or_build(request, lambda: view_method(self, request, *args, **kwargs), scope)
+    return wrapper
@@ -0,0 +1,148 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Book
+
+# Limites de resultados por busca
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# Pesos das colunas no ranking: título vale mais que autores, que valem mais que a descrição
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Triggers que mantêm a tabela FTS5 (migração 0011) sincronizada com api_rest_book. É a única definição usada
+# fora da migração 0011: o SQLite recria a tabela em algumas alterações de schema (ex.: 0013 e 0014) e descarta
+# os triggers junto com ela, por isso eles são recriados ao fim de cada migrate (ensure_sqlite_search_index)
+SQLITE_SEARCH_TRIGGERS = {
+    'api_rest_book_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS api_rest_book_fts_insert AFTER INSERT ON api_rest_book BEGIN
+            INSERT INTO api_rest_book_fts(rowid, book_title, book_authors, book_description)
+            VALUES (new.id, new.book_title, new.book_authors, new.book_description);
+        END
+    """,
+    'api_rest_book_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS api_rest_book_fts_delete AFTER DELETE ON api_rest_book BEGIN
+            INSERT INTO api_rest_book_fts(api_rest_book_fts, rowid, book_title, book_authors, book_description)
+            VALUES ('delete', old.id, old.book_title, old.book_authors, old.book_description);
+        END
+    """,
+    'api_rest_book_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS api_rest_book_fts_update
+        AFTER UPDATE OF book_title, book_authors, book_description ON api_rest_book BEGIN
+            INSERT INTO api_rest_book_fts(api_rest_book_fts, rowid, book_title, book_authors, book_description)
+            VALUES ('delete', old.id, old.book_title, old.book_authors, old.book_description);
+            INSERT INTO api_rest_book_fts(rowid, book_title, book_authors, book_description)
+            VALUES (new.id, new.book_title, new.book_authors, new.book_description);
+        END
+    """,
+}
+
+def ensure_sqlite_search_index(db_connection):
+    """
+    Recria os triggers da busca que estiverem faltando e reconstrói o índice FTS5, que pode ter ficado desatualizado
+    """
+    if db_connection.vendor != 'sqlite':
+        return
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'api_rest_book_fts'")
+        if cursor.fetchone() is None:
+            return  # migração 0011 ainda não aplicada
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            list(SQLITE_SEARCH_TRIGGERS),
+        )
+        missing = set(SQLITE_SEARCH_TRIGGERS) - {row[0] for row in cursor.fetchall()}
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_SEARCH_TRIGGERS[name])
+        cursor.execute("INSERT INTO api_rest_book_fts(api_rest_book_fts) VALUES ('rebuild')")
+
+def book_search_vector():
+    """
+    Vetor de busca do PostgreSQL; o índice GIN da migração 0011 usa uma cópia congelada (migrations/_search_index.py)
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('book_title', weight='A', config='simple')
+        + SearchVector('book_authors', weight='B', config='simple')
+        + SearchVector('book_description', weight='C', config='simple')
+    )
+
+def fts5_match_expression(query):
+    """
+    Converte o texto do cliente em uma expressão MATCH do FTS5: cada termo entre aspas (sem operadores),
+    todos obrigatórios e o último aceitando prefixo, para buscas enquanto o usuário digita
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def tsquery_expression(query):
+    """
+    Mesma busca de fts5_match_expression para o PostgreSQL: termos ligados por & e o último com :* (prefixo).
+    O websearch_to_tsquery não aceita prefixo, então o tsquery é montado aqui só com os termos (sem operadores)
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    return ' & '.join("'%s'" % term for term in terms) + ':*'
+
+def _search_sqlite(query, limit, queryset):
+    match = fts5_match_expression(query)
+    if match is None:
+        return []
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid FROM api_rest_book_fts WHERE api_rest_book_fts MATCH %s "
+            "ORDER BY bm25(api_rest_book_fts, %s, %s, %s) LIMIT %s",
+            [match, *SQLITE_BM25_WEIGHTS, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    # in_bulk devolve um dicionário; a ordem do ranking vem da lista de ids
+    books = queryset.in_bulk(ids)
+    return [books[book_id] for book_id in ids if book_id in books]
+
+def _search_postgresql(query, limit, queryset):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    expression = tsquery_expression(query)
+    if expression is None:
+        return []
+    vector = book_search_vector()
+    search_query = SearchQuery(expression, config='simple', search_type='raw')
+    return list(
+        queryset.annotate(search=vector, rank=SearchRank(vector, search_query))
+        .filter(search=search_query)
+        .order_by('-rank', 'id')[:limit]
+    )
+
+def _search_fallback(query, limit, queryset):
+    # Outros bancos: busca simples por termo, sem ranking
+    filters = Q()
+    for term in query.split():
+        filters &= Q(book_title__icontains=term) | Q(book_authors__icontains=term) | Q(book_description__icontains=term)
+    return list(queryset.filter(filters)[:limit])
+
+def search_books(query, limit=SEARCH_DEFAULT_LIMIT, queryset=None):
+    """
+    Busca textual em book_title, book_authors e book_description, com os resultados mais relevantes primeiro.
+    SQLite usa a tabela FTS5 api_rest_book_fts e PostgreSQL usa SearchVector com o índice GIN.
+    queryset permite restringir os campos carregados (ex.: Book.objects.only(...))
+    """
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    if queryset is None:
+        queryset = Book.objects.all()
+    # Mesmo banco do queryset (primário ou réplica, conforme o ReplicaRouter)
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        return _search_sqlite(query, limit, queryset)
+    if vendor == 'postgresql':
+        return _search_postgresql(query, limit, queryset)
+    return _search_fallback(query, limit, queryset)
@@ -1,30 +1,156 @@
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
 from rest_framework import serializers
-from django.db.models import Avg
 
 from .models import Book
 from .models import Rating
+from .models import ImportJob
 
-# Serializar o modelo Book para JSON
-class BookSerializer(serializers.ModelSerializer):
-    average_rating = serializers.SerializerMethodField()
-    rating_count = serializers.SerializerMethodField()
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer que aceita fields=[...] para devolver apenas parte dos campos (?fields= nas views)
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def columns(cls, fields):
+        """
+        Colunas lidas para serializar os campos pedidos: os próprios campos e as colunas de que dependem
+        (Meta.column_dependencies), usadas no SELECT de ?fields=. None quando todos os campos foram pedidos
+        """
+        if fields is None:
+            return None
+        dependencies = getattr(cls.Meta, 'column_dependencies', {})
+        return list(dict.fromkeys([*fields, *(column for name in fields for column in dependencies.get(name, ()))]))
+
+    def finish_representation(self, data, value):
+        # Etapa final comum a instâncias e a linhas .values() (ValuesSerializer); value(coluna) lê a linha
+        return data
+
+    def to_representation(self, instance):
+        return self.finish_representation(super().to_representation(instance), lambda column: getattr(instance, column))
 
+# Serializar o modelo Book para JSON
+class BookSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Book
-        fields = '__all__' # api vai devolver todos os campos
-        
-    """
-    aggregate() retorna um dicionário, o nome da chave no dicionário segue o padrão <field_name>__<aggregation_function>. Assim, o campo é score e a função é Avg, 
-    então a chave é score__avg
-    """
-    def get_average_rating(self, obj):
-        return obj.ratings.aggregate(Avg('score'))['score__avg']
+        # api vai devolver todos os campos, exceto a soma interna usada para calcular a média
+        exclude = ['rating_sum']
+        # Estatísticas mantidas pelas escritas em Rating (signals.py), nunca pelo cliente
+        read_only_fields = ['average_rating', 'rating_count', 'bayesian_rating']
+        extra_kwargs = {'average_rating': {'allow_null': True}}
+        column_dependencies = {'average_rating': ['rating_count']}
 
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+    def finish_representation(self, data, value):
+        # A coluna average_rating guarda 0.0 nos livros sem avaliações (ordenação e índice de most_rated),
+        # mas a API devolve null para eles, como fazia antes das estatísticas desnormalizadas
+        if 'average_rating' in data and not value('rating_count'):
+            data['average_rating'] = None
+        return data
     
+# Validação das linhas do upsert em massa: as checagens de unicidade (uma consulta por linha) ficam
+# a cargo do banco, pelo ON CONFLICT da restrição unique_book_title_author
+class BookUpsertSerializer(BookSerializer):
+    class Meta(BookSerializer.Meta):
+        validators = []
+        extra_kwargs = {**BookSerializer.Meta.extra_kwargs, 'book_selfLink': {'validators': []}}
+
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = ['id', 'book', 'score', 'comment', 'created_at']
-        
+
+# Usado na criação por título e autor: o livro é resolvido pela view e passado ao save()
+class RatingCreateSerializer(RatingSerializer):
+    class Meta(RatingSerializer.Meta):
+        read_only_fields = ['book']
+
+class StrictCharField(serializers.CharField):
+    # O CharField do DRF converte números em texto; aqui apenas strings são aceitas
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        return super().to_internal_value(data)
+
+# Linhas de POST /api/ratings/bulk/: título e autores são validados antes de as linhas serem agrupadas por livro
+class BulkRatingSerializer(RatingCreateSerializer):
+    book_title = StrictCharField(write_only=True)
+    book_authors = StrictCharField(write_only=True)
+
+    class Meta(RatingCreateSerializer.Meta):
+        fields = [*RatingCreateSerializer.Meta.fields, 'book_title', 'book_authors']
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'query', 'status', 'total_items', 'processed_items', 'created_count', 'error', 'created_at', 'updated_at']
+
+# Formato de GET /api/books/{id}/stats/ (services.ratings.book_rating_stats), usado na documentação OpenAPI
+class BookStatsSerializer(serializers.Serializer):
+    book = serializers.IntegerField()
+    rating_count = serializers.IntegerField()
+    average_rating = serializers.FloatField(allow_null=True, help_text="null para livros sem avaliações")
+    histogram = serializers.DictField(child=serializers.IntegerField(), help_text="Avaliações por nota ('0' a '5')")
+    window_days = serializers.IntegerField()
+    window_rating_count = serializers.IntegerField()
+    window_average_rating = serializers.FloatField(allow_null=True, help_text="null sem avaliações na janela")
+
+# Conversões equivalentes ao to_representation dos campos simples do DRF
+FAST_CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.CharField: str,
+    serializers.PrimaryKeyRelatedField: None,  # .values('book') já traz a chave primária
+}
+
+class ValuesSerializer:
+    """
+    Serialização somente leitura das listagens a partir de linhas de queryset.values(), sem instanciar modelos
+    nem percorrer os campos do ModelSerializer a cada linha. O mapa de campos (coluna e conversão) é montado
+    uma vez a partir do serializer original, então a saída é a mesma de serializer_class(instances, many=True).data
+    """
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        self.field_map = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source or isinstance(field, serializers.SerializerMethodField):
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} não é uma coluna do modelo.')
+            converter = FAST_CONVERTERS.get(type(field), field.to_representation)
+            self.field_map.append((name, field.source, converter))
+        self.value_fields = [source for _, source, _ in self.field_map]
+        # DynamicFieldsModelSerializer: colunas de que os campos dependem e a etapa final da serialização
+        if isinstance(serializer, DynamicFieldsModelSerializer):
+            self.value_fields = serializer_class.columns(self.value_fields)
+            self.finish_representation = serializer.finish_representation
+        else:
+            self.finish_representation = lambda data, value: data
+
+    def to_representation(self, row):
+        data = {}
+        for name, source, converter in self.field_map:
+            value = row[source]
+            # Como no Serializer do DRF, valores None não passam pelo to_representation do campo
+            data[name] = value if value is None or converter is None else converter(value)
+        return self.finish_representation(data, row.__getitem__)
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+@lru_cache(maxsize=128)
+def _values_serializer(serializer_class, fields):
+    return ValuesSerializer(serializer_class, list(fields) if fields is not None else None)
+
+def values_serializer(serializer_class, fields=None):
+    """
+    ValuesSerializer compilado uma única vez por serializer e seleção de campos (?fields=)
+    """
+    return _values_serializer(serializer_class, tuple(fields) if fields is not None else None)
@@ -0,0 +1,113 @@
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from api_rest.models import BOOKS_TABLE, Book, TableVersion, create_rating_histograms
+from api_rest.response_cache import invalidate_books_cache
+from api_rest.serializers import BookUpsertSerializer
+
+BULK_UPSERT_CHUNK_SIZE = 500  # livros gravados por transação
+UPSERT_UNIQUE_FIELDS = ['book_title', 'book_authors']  # restrição unique_book_title_author
+# Campos atualizados em livros já existentes, só quando presentes na linha (os ausentes mantêm o valor gravado)
+UPSERT_UPDATE_FIELDS = ['book_description', 'book_selfLink']
+
+def _upsert_chunk(chunk, errors):
+    """
+    Grava um lote de livros já validados ({(título, autores): dados}) e retorna (criados, ids dos atualizados)
+    """
+    titles = {title for title, _ in chunk}
+    links = {data.get('book_selfLink') for _, data in chunk.values()} - {None, ''}
+
+    # Uma consulta para saber quais livros já existem (contagem de criados/atualizados)
+    # e outra para os links já usados por outros livros (restrição unique_book_selflink)
+    existing = {
+        (title, authors): book_id
+        for book_id, title, authors in Book.objects.filter(book_title__in=titles).values_list(
+            'id', 'book_title', 'book_authors'
+        )
+    }
+    link_owners = {
+        link: (title, authors)
+        for link, title, authors in Book.objects.filter(book_selfLink__in=links).values_list(
+            'book_selfLink', 'book_title', 'book_authors'
+        )
+    }
+
+    # Livros agrupados pelos campos presentes: cada grupo atualiza apenas os seus campos no ON CONFLICT
+    groups = {}
+    updated = []
+    for pair, (index, data) in chunk.items():
+        link = data.get('book_selfLink')
+        owner = link_owners.get(link)
+        if owner is not None and owner != pair:
+            errors.append({'index': index, 'errors': {'book_selfLink': ['Link já usado por outro livro.']}})
+            continue
+        if link:
+            # Também impede que dois livros do mesmo lote usem o mesmo link
+            link_owners[link] = pair
+        present = tuple(field for field in UPSERT_UPDATE_FIELDS if field in data)
+        groups.setdefault(present, []).append(Book(**data))
+        if pair in existing:
+            updated.append(existing[pair])
+
+    with transaction.atomic():
+        for present, books in groups.items():
+            Book.objects.bulk_create(
+                books,
+                update_conflicts=True,
+                unique_fields=UPSERT_UNIQUE_FIELDS,
+                update_fields=[*present, 'updated_at'],
+            )
+        created = [
+            book for books in groups.values() for book in books if (book.book_title, book.book_authors) not in existing
+        ]
+        if created and created[0].pk is None:
+            # Banco sem RETURNING no INSERT em massa: os ids dos livros criados são buscados pelo título e autores
+            pairs = {(book.book_title, book.book_authors) for book in created}
+            created = [
+                Book(pk=book_id)
+                for book_id, title, authors in Book.objects.filter(
+                    book_title__in={title for title, _ in pairs}
+                ).values_list('id', 'book_title', 'book_authors')
+                if (title, authors) in pairs
+            ]
+        create_rating_histograms(book.pk for book in created)
+        TableVersion.objects.bump(BOOKS_TABLE)
+    total = sum(len(books) for books in groups.values())
+    return total - len(updated), updated
+
+def bulk_upsert_books(rows, chunk_size=BULK_UPSERT_CHUNK_SIZE):
+    """
+    Cria ou atualiza livros em massa pela chave (book_title, book_authors), em transações por lote.
+    Linhas inválidas são devolvidas em errors com o índice da linha; linhas repetidas no mesmo envio
+    valem pela última ocorrência
+    """
+    errors = []
+    validator = BookUpsertSerializer()
+    pending = {}  # (título, autores) -> (índice, dados validados), na ordem de envio
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Cada linha deve ser um objeto JSON.']}})
+            continue
+        try:
+            data = validator.run_validation(row)
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+            continue
+        pair = (data.get('book_title', ''), data.get('book_authors', ''))
+        pending.pop(pair, None)
+        pending[pair] = (index, data)
+
+    created = 0
+    updated = []
+    items = list(pending.items())
+    for start in range(0, len(items), chunk_size):
+        chunk_created, chunk_updated = _upsert_chunk(dict(items[start:start + chunk_size]), errors)
+        created += chunk_created
+        updated += chunk_updated
+
+    if created or updated:
+        # bulk_create não dispara signals: invalida as listagens e os livros atualizados explicitamente
+        invalidate_books_cache(updated)
+
+    errors.sort(key=lambda error: error['index'])
+    return created, len(updated), errors
@@ -1,50 +1,423 @@
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
 import requests
-from api_rest.models import Book
-from api_rest.serializers import BookSerializer
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api_rest.models import BOOKS_TABLE, Book, TableVersion, create_rating_histograms
+from api_rest.response_cache import invalidate_books_cache
+
+try:
+    import httpx
+except ImportError:  # sem httpx, as funções assíncronas fazem a requisição com requests em uma thread
+    httpx = None
+
+GOOGLE_BOOKS_API_URL = "https://www.googleapis.com/books/v1/volumes"
+REQUEST_TIMEOUT = 10  # segundos por requisição (conexão e leitura)
+MAX_RESULTS_PER_PAGE = 40  # limite de maxResults da API do Google Books
+RETRY_STATUS = (429, 500, 502, 503, 504)
+BULK_BATCH_SIZE = 500  # volumes por lote de verificação e inserção no banco
+
+CACHE_ALIAS = 'google_books'  # alias em settings.CACHES; sem ele, usa o cache 'default'
+CACHE_TTL = 300  # segundos que o resultado de uma busca fica em cache
+CACHE_MAX_ENTRIES = 1000  # buscas mantidas em cache antes de descartar a usada há mais tempo
+
+_session = None
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+_MISSING = object()
+
+class QueryResultCache:
+    """
+    Cache dos resultados das buscas no Google Books guardado no cache do Django (memória local ou arquivo).
+    O TTL é o timeout da entrada no cache e chamadas simultâneas à mesma busca esperam uma única requisição
+    (single-flight). O lock do processo protege apenas o índice e os contadores: leituras e gravações no backend
+    acontecem fora dele, para que um cache em arquivo ou em rede não enfileire as threads da importação.
+    O índice LRU (GOOGLE_BOOKS_CACHE_MAX_ENTRIES) é de cada processo: com um backend compartilhado, o limite total
+    é o MAX_ENTRIES do próprio backend (OPTIONS em settings.CACHES).
+    TTL e tamanho vêm de GOOGLE_BOOKS_CACHE_TTL e GOOGLE_BOOKS_CACHE_MAX_ENTRIES em settings.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()  # chaves em ordem de uso, a mais antiga primeiro
+        self._inflight = {}  # chave -> Future da requisição em andamento
+        self._async_inflight = {}  # chave -> asyncio.Future da requisição assíncrona em andamento
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    @property
+    def backend(self):
+        alias = CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else 'default'
+        return caches[alias]
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'GOOGLE_BOOKS_CACHE_TTL', CACHE_TTL)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'GOOGLE_BOOKS_CACHE_MAX_ENTRIES', CACHE_MAX_ENTRIES)
+
+    @staticmethod
+    def make_key(query, start_index, max_results):
+        # Buscas equivalentes ("Aventura ", "aventura") compartilham a mesma entrada
+        normalized = ' '.join(query.split()).lower()
+        digest = hashlib.sha256(f'{normalized}|{start_index}|{max_results}'.encode()).hexdigest()
+        return f'google_books:{digest}'
+
+    def _touch(self, key):
+        """
+        Marca a chave como usada agora e retira do índice as menos usadas além do limite; chamado com o lock.
+        Retorna as chaves retiradas, que são apagadas do backend depois, fora do lock
+        """
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        evicted = []
+        while len(self._keys) > self.max_entries:
+            oldest, _ = self._keys.popitem(last=False)
+            evicted.append(oldest)
+            self.evictions += 1
+        return evicted
+
+    def _hit(self, key):
+        with self._lock:
+            self.hits += 1
+            evicted = self._touch(key)
+        self.backend.delete_many(evicted)
+
+    def get_or_fetch(self, key, fetch):
+        value = self.backend.get(key, _MISSING)
+        if value is not _MISSING:
+            self._hit(key)
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Espera a requisição em andamento; erros também são repassados
+            return future.result()
+
+        try:
+            # Confere de novo: outra thread pode ter concluído a mesma busca desde a primeira leitura
+            value = self.backend.get(key, _MISSING)
+            if value is not _MISSING:
+                self._hit(key)
+            else:
+                with self._lock:
+                    self.misses += 1
+                value = fetch()
+                self.backend.set(key, value, self.ttl)
+                with self._lock:
+                    evicted = self._touch(key)
+                self.backend.delete_many(evicted)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    async def aget_or_fetch(self, key, fetch):
+        """
+        Versão assíncrona de get_or_fetch: fetch é uma corrotina e as buscas simultâneas no mesmo event loop
+        esperam uma única requisição sem ocupar threads
+        """
+        value = await self.backend.aget(key, _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+                evicted = self._touch(key)
+            await self.backend.adelete_many(evicted)
+            return value
+
+        future = self._async_inflight.get(key)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            # shield: o cancelamento de uma das requisições que esperam não cancela a busca das demais
+            return await asyncio.shield(future)
+
+        future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await fetch()
+            await self.backend.aset(key, value, self.ttl)
+            with self._lock:
+                evicted = self._touch(key)
+            await self.backend.adelete_many(evicted)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca a exceção como tratada quando ninguém está esperando
+            raise
+        finally:
+            del self._async_inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'entries': len(self._keys),
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._keys)
+            self._keys.clear()
+            self.hits = self.misses = self.evictions = self.coalesced = 0
+        self.backend.delete_many(keys)
+
+query_cache = QueryResultCache()
+
+# A URL pode ser trocada em settings (GOOGLE_BOOKS_API_URL), por exemplo para um servidor local nos testes
+def get_api_url():
+    return getattr(settings, 'GOOGLE_BOOKS_API_URL', GOOGLE_BOOKS_API_URL)
+
+# Cria uma sessão HTTP que reaproveita conexões e repete requisições com backoff exponencial em 429/5xx
+def create_session(pool_size=10, retries=3, backoff_factor=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=['GET'],
+        raise_on_status=False,  # devolve a última resposta para o erro ser tratado abaixo
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# Sessão compartilhada pelas chamadas simples, criada na primeira utilização
+def get_session():
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+# Cliente HTTP assíncrono que reaproveita conexões, um por event loop (o worker ASGI mantém o mesmo loop)
+def create_async_client(pool_size=10):
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT)
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = create_async_client()
+    return client
 
 # Busca livros na API do Google Books com base no termo de busca.
 # Livros só serão salvos se todos os atributos exigidos pelo modelo estiverem presentes e válidos.
-def fetch_books_from_google(query):
-    url = "https://www.googleapis.com/books/v1/volumes"
+def fetch_books_from_google(query, start_index=0, max_results=5, session=None):
+    # Buscas repetidas são atendidas pelo cache; apenas respostas com sucesso são guardadas
+    key = query_cache.make_key(query, start_index, max_results)
+    return query_cache.get_or_fetch(key, lambda: request_books_from_google(query, start_index, max_results, session))
+
+# Faz a requisição à API do Google Books, sem passar pelo cache
+def request_books_from_google(query, start_index=0, max_results=5, session=None):
+    session = session or get_session()
     params = {
         'q': query,  # Termo de busca
-        'maxResults': 5,  # Limitar os resultados
+        'startIndex': start_index,  # Posição do primeiro resultado (paginação)
+        'maxResults': max_results,  # Limitar os resultados
     }
-    response = requests.get(url, params=params)
+    response = session.get(get_api_url(), params=params, timeout=REQUEST_TIMEOUT)
 
     if response.status_code == 200:
         return response.json().get('items', [])
     else:
         raise Exception(f"Erro ao buscar dados: {response.status_code}")
 
-#  Busca livros na API do Google Books e salva no banco de dados.
-def save_books_to_db(query):
-    # Buscar livros na API do Google Books
-    books_data = fetch_books_from_google(query)
+# Versão assíncrona de fetch_books_from_google, com o mesmo cache de buscas
+async def afetch_books_from_google(query, start_index=0, max_results=5, client=None):
+    key = query_cache.make_key(query, start_index, max_results)
+    return await query_cache.aget_or_fetch(
+        key, lambda: arequest_books_from_google(query, start_index, max_results, client),
+    )
 
-    # Lista para armazenar os objetos criados
-    created_books = []
+# Versão assíncrona de request_books_from_google: repete em 429/5xx com o mesmo backoff exponencial
+# da sessão síncrona (sem espera na primeira repetição), sem bloquear o event loop
+async def arequest_books_from_google(query, start_index=0, max_results=5, client=None, retries=3, backoff_factor=0.5):
+    if httpx is None:
+        return await sync_to_async(request_books_from_google, thread_sensitive=False)(query, start_index, max_results)
+
+    client = client or get_async_client()
+    params = {'q': query, 'startIndex': start_index, 'maxResults': max_results}
+    for attempt in range(retries + 1):
+        response = await client.get(get_api_url(), params=params)
+        if response.status_code not in RETRY_STATUS or attempt == retries:
+            break
+        if attempt:
+            await asyncio.sleep(backoff_factor * 2 ** attempt)
+
+    if response.status_code == 200:
+        return response.json().get('items', [])
+    else:
+        raise Exception(f"Erro ao buscar dados: {response.status_code}")
+
+# Busca várias páginas de vários termos ao mesmo tempo, com concorrência limitada a max_workers.
+# Retorna os volumes encontrados e as métricas da importação (incluindo itens por segundo).
+def fetch_books_bulk(queries, pages=1, max_results=MAX_RESULTS_PER_PAGE, max_workers=8, session=None):
+    session = session or create_session(pool_size=max_workers)
+    jobs = [(query, page * max_results) for query in queries for page in range(pages)]
+
+    items = []
+    errors = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_books_from_google, query, start_index, max_results, session): (query, start_index)
+            for query, start_index in jobs
+        }
+        for future in as_completed(futures):
+            query, start_index = futures[future]
+            try:
+                items.extend(future.result())
+            except Exception as e:
+                # Uma página com erro não interrompe as demais
+                errors.append({'q': query, 'startIndex': start_index, 'error': str(e)})
+    elapsed = time.perf_counter() - started
+
+    return items, {
+        'requests': len(jobs),
+        'items': len(items),
+        'errors': errors,
+        'elapsed': elapsed,
+        'items_per_second': len(items) / elapsed if elapsed else 0.0,
+    }
 
+# Extrai os campos do modelo a partir de um volume da API do Google Books
+def volume_to_book_data(book):
+    volume_info = book.get('volumeInfo', {})
+    return {
+        'book_title': volume_info.get('title'),
+        'book_authors': ', '.join(volume_info.get('authors', [])),
+        'book_description': volume_info.get('description'),
+        'book_selfLink': book.get('selfLink'),
+    }
+
+# Verifica se todos os campos estão presentes e cabem no tamanho máximo das colunas, sem consultar o banco
+def is_valid_book_data(book_data):
+    for field_name, value in book_data.items():
+        if not value:
+            return False
+        max_length = Book._meta.get_field(field_name).max_length
+        if max_length is not None and len(value) > max_length:
+            return False
+    return True
+
+# Salva no banco os volumes da API do Google Books que ainda não existem.
+# Para cada lote: uma consulta pelos links e uma pelos títulos e autores já cadastrados (as chaves que existiam
+# antes da inserção) e um INSERT em massa dos demais, tudo em uma única transação. Retorna só os livros inseridos
+# por esta chamada, nunca os gravados por outra importação simultânea.
+def save_volumes_to_db(books_data, batch_size=BULK_BATCH_SIZE):
+    # Remove volumes sem 'selfLink', incompletos ou repetidos (o mesmo volume pode vir de termos diferentes)
+    new_books = {}
     for book in books_data:
-        # Verificar se 'selfLink' existe no objeto
         if 'selfLink' not in book:
             continue
+        new_book_data = volume_to_book_data(book)
+        if is_valid_book_data(new_book_data):
+            new_books.setdefault(new_book_data['book_selfLink'], new_book_data)
+
+    # Lista para armazenar os objetos criados
+    created_books = []
+    links = list(new_books)
+    with transaction.atomic():
+        for start in range(0, len(links), batch_size):
+            batch = [new_books[link] for link in links[start:start + batch_size]]
+            existing_links = set(
+                Book.objects.filter(book_selfLink__in=[data['book_selfLink'] for data in batch])
+                .values_list('book_selfLink', flat=True)
+            )
+            existing_keys = set(
+                Book.objects.filter(book_title__in={data['book_title'] for data in batch})
+                .values_list('book_title', 'book_authors')
+            )
+            to_create = []
+            for data in batch:
+                key = (data['book_title'], data['book_authors'])
+                if data['book_selfLink'] in existing_links or key in existing_keys:
+                    continue
+                existing_keys.add(key)  # título e autor repetidos no mesmo lote: fica o primeiro volume
+                to_create.append(Book(**data))
+            created_books.extend(_insert_new_books(to_create))
+        if created_books:
+            # bulk_create não dispara signals: cria os histogramas, atualiza a versão da tabela e invalida as
+            # respostas em cache explicitamente
+            create_rating_histograms(book.pk for book in created_books)
+            TableVersion.objects.bump(BOOKS_TABLE)
+            # Livros novos só aparecem nas listagens
+            invalidate_books_cache([])
 
-        volume_info = book.get('volumeInfo', {})
+    return created_books
 
-        # Extrair os dados necessários
-        new_book_data = {
-            'book_title': volume_info.get('title'),
-            'book_authors': ', '.join(volume_info.get('authors', [])),
-            'book_description': volume_info.get('description'),
-            'book_selfLink': book.get('selfLink'),
-        }
+def _insert_new_books(books):
+    """
+    Insere os livros sem ignorar conflitos: se o INSERT em massa passa, todos foram gravados por esta chamada
+    (com os ids preenchidos pelo RETURNING do SQLite e do PostgreSQL). Se outra importação gravou algum deles
+    desde a consulta das chaves, o lote é inserido livro a livro e os conflitos são descartados
+    """
+    if not books:
+        return []
+    try:
+        with transaction.atomic():
+            Book.objects.bulk_create(books)
+    except IntegrityError:
+        created = []
+        for book in books:
+            try:
+                with transaction.atomic():
+                    Book.objects.bulk_create([book])
+            except IntegrityError:
+                continue
+            created.append(book)
+        books = created
+    if books and books[0].pk is None:
+        # Banco sem RETURNING no INSERT em massa: os livros inseridos são buscados pelo link
+        return list(Book.objects.filter(book_selfLink__in=[book.book_selfLink for book in books]))
+    return books
 
-        # Verificar se todos os campos necessários estão presentes
-        if all(new_book_data.values()) and not Book.objects.filter(book_selfLink=new_book_data['book_selfLink']).exists():
-            serializer = BookSerializer(data=new_book_data)
-            if serializer.is_valid():
-                created_book = serializer.save()
-                created_books.append(created_book)
+#  Busca livros na API do Google Books e salva no banco de dados.
+def save_books_to_db(query):
+    # Buscar livros na API do Google Books
+    books_data = fetch_books_from_google(query)
+    return save_volumes_to_db(books_data)
 
-    return created_books
\ No newline at end of file
+# Versão assíncrona de save_books_to_db: a busca não ocupa uma thread enquanto espera o Google Books;
+# a gravação usa transaction.atomic, que não tem equivalente assíncrono, e roda em sync_to_async.
+# Com thread_sensitive=True (padrão), as gravações de todas as requisições rodam em uma única thread,
+# uma de cada vez, então o SQLite nunca vê dois escritores deste processo
+async def asave_books_to_db(query):
+    books_data = await afetch_books_from_google(query)
+    return await sync_to_async(save_volumes_to_db)(books_data)
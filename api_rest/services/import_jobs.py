@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api_rest.models import ImportJob
+from api_rest.services.google_books import BULK_BATCH_SIZE, fetch_books_from_google, save_volumes_to_db
+
+_executor = None
+# Minutos sem progresso (updated_at) depois dos quais um job em execução é considerado interrompido, por exemplo
+# porque o processo do worker terminou no meio da importação (sobrescrito por IMPORT_JOB_STALE_MINUTES)
+STALE_JOB_MINUTES = 10
+STALE_JOB_ERROR = "Importação interrompida: o job ficou sem progresso por mais de {minutes} minutos."
+
+# Normaliza o termo de busca para que pedidos equivalentes ("Aventura ", "aventura") usem o mesmo job
+def normalize_query(query):
+    return ' '.join(query.split()).lower()
+
+# Pool de threads local que executa os jobs, criado na primeira utilização (IMPORT_JOB_WORKERS em settings)
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMPORT_JOB_WORKERS', 2),
+            thread_name_prefix='import-job',
+        )
+    return _executor
+
+# Cria um job de importação ou devolve o job pendente/em execução do mesmo termo de busca
+def enqueue_import_job(query):
+    query = normalize_query(query)
+    try:
+        with transaction.atomic():
+            job = ImportJob.objects.create(query=query)
+    except IntegrityError:
+        # Outro pedido já criou um job ativo para o mesmo termo (restrição unique_active_import_job_query)
+        active = ImportJob.objects.filter(
+            query=query,
+            status__in=[ImportJob.Status.PENDING, ImportJob.Status.RUNNING],
+        ).first()
+        if active is not None and not is_stale(active):
+            return active, False
+        # O job ativo terminou entre o INSERT e a consulta, ou está parado e é marcado como falho: tenta novamente
+        fail_stale_jobs(query=query)
+        return enqueue_import_job(query)
+
+    # O job só é enviado ao pool depois do commit, para a thread enxergar a linha criada
+    transaction.on_commit(lambda: submit_job(job.id))
+    return job, True
+
+def submit_job(job_id):
+    get_executor().submit(_run_in_worker, job_id)
+
+def _run_in_worker(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        # Threads fora do ciclo de requisição precisam fechar a própria conexão com o banco
+        connection.close()
+
+# update() não preenche campos auto_now, por isso updated_at é atualizado manualmente
+def _update_job(job_id, **fields):
+    return ImportJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+# Conclui o job apenas se ainda estiver em execução: um job marcado como interrompido não volta a ser concluído
+def _finish_job(job_id, **fields):
+    return ImportJob.objects.filter(pk=job_id, status=ImportJob.Status.RUNNING).update(updated_at=timezone.now(), **fields)
+
+def stale_job_minutes():
+    return getattr(settings, 'IMPORT_JOB_STALE_MINUTES', STALE_JOB_MINUTES)
+
+def is_stale(job):
+    cutoff = timezone.now() - timedelta(minutes=stale_job_minutes())
+    return job.status == ImportJob.Status.RUNNING and job.updated_at < cutoff
+
+# Marca como falhos os jobs em execução sem progresso há mais de stale_job_minutes(): a cada lote salvo o
+# updated_at do job é atualizado, então só ficam parados os jobs cujo worker terminou no meio da importação
+def fail_stale_jobs(**filters):
+    minutes = stale_job_minutes()
+    return ImportJob.objects.filter(
+        status=ImportJob.Status.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(minutes=minutes),
+        **filters,
+    ).update(status=ImportJob.Status.FAILED, error=STALE_JOB_ERROR.format(minutes=minutes), updated_at=timezone.now())
+
+# Executa um job pendente: busca os volumes no Google Books e salva em lotes, atualizando o progresso
+def run_import_job(job_id):
+    # Marca o job como em execução apenas se ainda estiver pendente, evitando que dois workers o processem
+    claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.Status.PENDING).update(
+        status=ImportJob.Status.RUNNING,
+        updated_at=timezone.now(),
+    )
+    if not claimed:
+        return
+
+    job = ImportJob.objects.get(pk=job_id)
+    try:
+        books_data = fetch_books_from_google(job.query)
+        _update_job(job_id, total_items=len(books_data))
+        for start in range(0, len(books_data), BULK_BATCH_SIZE):
+            batch = books_data[start:start + BULK_BATCH_SIZE]
+            created_books = save_volumes_to_db(batch)
+            _update_job(
+                job_id,
+                processed_items=F('processed_items') + len(batch),
+                created_count=F('created_count') + len(created_books),
+            )
+    except Exception as e:
+        _finish_job(job_id, status=ImportJob.Status.FAILED, error=str(e))
+        return
+    _finish_job(job_id, status=ImportJob.Status.DONE)
+
+# Executa no processo atual os jobs pendentes, por exemplo os que ficaram na fila após reiniciar o servidor.
+# Antes, os jobs em execução parados (worker interrompido) são marcados como falhos e liberam o termo de busca
+def process_pending_jobs():
+    failed = fail_stale_jobs()
+    job_ids = list(ImportJob.objects.filter(status=ImportJob.Status.PENDING).values_list('id', flat=True))
+    for job_id in job_ids:
+        run_import_job(job_id)
+    return len(job_ids), failed
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api_rest.models import (
+    BOOKS_TABLE, RATING_SCORES, RATINGS_TABLE, Book, Rating, RatingDay, TableVersion, apply_rating_counters,
+)
+from api_rest.response_cache import invalidate_books_cache
+from api_rest.serializers import BulkRatingSerializer
+
+BULK_RATING_CHUNK_SIZE = 5000  # avaliações validadas e inseridas por vez
+BOOK_LOOKUP_CHUNK_SIZE = 500  # títulos por consulta IN
+RATING_STATS_WINDOW_DAYS = 30  # dias da média recente em book_rating_stats
+
+def resolve_books(pairs):
+    """
+    Mapeia pares (book_title, book_authors) para o id do livro com consultas book_title__in,
+    em vez de uma consulta por avaliação
+    """
+    titles = sorted({title for title, _ in pairs})
+    book_ids = {}
+    for start in range(0, len(titles), BOOK_LOOKUP_CHUNK_SIZE):
+        books = Book.objects.filter(book_title__in=titles[start:start + BOOK_LOOKUP_CHUNK_SIZE]).values_list(
+            'id', 'book_title', 'book_authors'
+        )
+        for book_id, title, authors in books:
+            book_ids[(title, authors)] = book_id
+    return book_ids
+
+def bulk_create_ratings(rows, chunk_size=BULK_RATING_CHUNK_SIZE):
+    """
+    Cria avaliações em massa a partir de dicionários {book_title, book_authors, score, comment}.
+    Linhas inválidas não interrompem a importação: são devolvidas em errors com o índice da linha.
+    Cada bloco de chunk_size linhas é gravado em uma transação própria, com as estatísticas dos seus livros
+    atualizadas uma única vez; assim o lock de escrita do SQLite é liberado entre os blocos
+    """
+    created = 0
+    errors = []
+    # Assim como o ListSerializer (many=True), um único serializer valida todas as linhas,
+    # mas as linhas válidas são mantidas mesmo quando outras falham
+    validator = BulkRatingSerializer()
+
+    for start in range(0, len(rows), chunk_size):
+        valid = []
+        for index, row in enumerate(rows[start:start + chunk_size], start=start):
+            if not isinstance(row, dict):
+                errors.append({'index': index, 'errors': {'non_field_errors': ['Cada linha deve ser um objeto JSON.']}})
+                continue
+            try:
+                data = validator.run_validation(row)
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+                continue
+            valid.append((index, (data.pop('book_title'), data.pop('book_authors')), data))
+        with transaction.atomic():
+            created += _create_ratings_chunk(valid, errors)
+
+    errors.sort(key=lambda error: error['index'])
+    return created, errors
+
+def _create_ratings_chunk(valid, errors):
+    # Grava as linhas validadas de um bloco e atualiza as estatísticas e os contadores dos livros afetados
+    deltas = defaultdict(lambda: [0, 0])  # book_id -> [quantidade, soma das notas]
+    book_ids = resolve_books([pair for _, pair, _ in valid])
+    ratings = []
+    for index, pair, data in valid:
+        book_id = book_ids.get(pair)
+        if book_id is None:
+            errors.append({'index': index, 'errors': {'error': ['O livro com o título e autor informados não existe.']}})
+            continue
+        ratings.append(Rating(book_id=book_id, **data))
+        deltas[book_id][0] += 1
+        deltas[book_id][1] += data['score']
+
+    # bulk_create não dispara os signals de Rating; as estatísticas são atualizadas abaixo
+    Rating.objects.bulk_create(ratings, batch_size=1000)
+    for book_id, (count, total) in deltas.items():
+        Book.objects.filter(pk=book_id).apply_rating_delta(count, total)
+    # created_at é preenchido pelo bulk_create (auto_now_add); (book_id, nota, criação, 1) para RatingHistogram e RatingDay
+    apply_rating_counters([(rating.book_id, rating.score, rating.created_at, 1) for rating in ratings])
+    if deltas:
+        TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+        invalidate_books_cache(deltas)
+    return len(ratings)
+
+def book_rating_stats(book_id):
+    """
+    Histograma das notas, total, média e média dos últimos RATING_STATS_WINDOW_DAYS dias (incluindo hoje) de um livro.
+    Lê a linha de RatingHistogram (com o livro, no mesmo SELECT) e no máximo uma linha de RatingDay por dia da
+    janela, sem percorrer Rating. Retorna None quando o livro não existe
+    """
+    fields = [f'score_{score}' for score in RATING_SCORES]
+    book = Book.objects.filter(pk=book_id).values('id', *(f'rating_histogram__{name}' for name in fields)).first()
+    if book is None:
+        return None
+    # Todo livro tem a linha em RatingHistogram, criada com ele; o LEFT JOIN só traria None para uma linha ausente
+    histogram = {str(score): book[f'rating_histogram__{name}'] or 0 for score, name in zip(RATING_SCORES, fields)}
+    count = sum(histogram.values())
+    total = sum(score * histogram[str(score)] for score in RATING_SCORES)
+
+    window_days = getattr(settings, 'RATING_STATS_WINDOW_DAYS', RATING_STATS_WINDOW_DAYS)
+    since = timezone.localdate() - timedelta(days=window_days - 1)
+    window = RatingDay.objects.filter(book_id=book['id'], day__gte=since).aggregate(
+        count=Sum('rating_count'), total=Sum('rating_sum')
+    )
+    window_count = window['count'] or 0
+    return {
+        'book': book['id'],
+        'rating_count': count,
+        'average_rating': total / count if count else None,
+        'histogram': histogram,
+        'window_days': window_days,
+        'window_rating_count': window_count,
+        'window_average_rating': window['total'] / window_count if window_count else None,
+    }
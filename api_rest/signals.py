@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .models import BOOKS_TABLE, RATINGS_TABLE, Book, Rating, RatingHistogram, TableVersion, apply_rating_counters
+from .response_cache import invalidate_books_cache
+
+# Mantém Book.average_rating, rating_count e rating_sum e os contadores por nota e por dia (RatingHistogram e
+# RatingDay) atualizados a cada escrita em Rating, assim a leitura dos livros não precisa de JOIN nem de agregação.
+# Também incrementa a versão das tabelas (TableVersion), usada no ETag das listagens
+@receiver(post_save, sender=Rating)
+def update_book_stats_on_save(sender, instance, created, **kwargs):
+    old_book_id = getattr(instance, '_loaded_book_id', None)
+    old_score = getattr(instance, '_loaded_score', None)
+    added = (instance.book_id, instance.score, instance.created_at, 1)
+
+    if created or old_book_id is None:
+        Book.objects.filter(pk=instance.book_id).apply_rating_delta(1, instance.score)
+        apply_rating_counters([added])
+    elif old_book_id != instance.book_id:
+        # A avaliação mudou de livro: remove do livro antigo e adiciona ao novo
+        Book.objects.filter(pk=old_book_id).apply_rating_delta(-1, -old_score)
+        Book.objects.filter(pk=instance.book_id).apply_rating_delta(1, instance.score)
+        apply_rating_counters([(old_book_id, old_score, instance.created_at, -1), added])
+    elif old_score != instance.score:
+        Book.objects.filter(pk=instance.book_id).apply_rating_delta(0, instance.score - old_score)
+        apply_rating_counters([(instance.book_id, old_score, instance.created_at, -1), added])
+    else:
+        # Só o comentário mudou: as estatísticas e as respostas de livros continuam valendo
+        TableVersion.objects.bump(RATINGS_TABLE)
+        return
+    TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+    invalidate_books_cache({old_book_id or instance.book_id, instance.book_id})
+
+@receiver(post_delete, sender=Rating)
+def update_book_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # Na exclusão em cascata de um livro não há estatísticas para atualizar
+    if isinstance(origin, Book):
+        return
+    # Usa os valores carregados do banco, caso a instância tenha sido alterada sem salvar
+    book_id = getattr(instance, '_loaded_book_id', None) or instance.book_id
+    score = getattr(instance, '_loaded_score', None)
+    if score is None:
+        score = instance.score
+    Book.objects.filter(pk=book_id).apply_rating_delta(-1, -score)
+    apply_rating_counters([(book_id, score, instance.created_at, -1)])
+    TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+    invalidate_books_cache([book_id])
+
+# Respostas de livros em cache (response_cache.py) deixam de valer a cada escrita em Book.
+# Alterar ou excluir um livro também muda a listagem de avaliações (filtros por título e autor, exclusão em cascata)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_books_cache_on_book_write(sender, instance, created=False, **kwargs):
+    if created:
+        # Linha zerada do histograma: as avaliações do livro só precisam do UPDATE
+        RatingHistogram.objects.create(book=instance)
+        TableVersion.objects.bump(BOOKS_TABLE)
+    else:
+        TableVersion.objects.bump(BOOKS_TABLE, RATINGS_TABLE)
+    invalidate_books_cache([instance.pk])
+
+# Usuário alterado (ex.: desativado) ou excluído: os tokens dele voltam a ser verificados no banco
+# e o is_active em cache é relido
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_token_cache_on_user_write(sender, instance, **kwargs):
+    forget_user(instance.pk)
@@ -1,9 +1,56 @@
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework import serializers, status
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import User
-from .models import Book, Rating
-from .serializers import BookSerializer, RatingSerializer
+from .models import RATINGS_TABLE, Book, ImportJob, Rating, RatingDay, RatingHistogram, TableVersion
+from .serializers import BookSerializer, RatingSerializer, ValuesSerializer, values_serializer
+from .services.google_books import (
+    _insert_new_books,
+    afetch_books_from_google,
+    create_session,
+    fetch_books_bulk,
+    fetch_books_from_google,
+    query_cache,
+    save_volumes_to_db,
+    volume_to_book_data,
+)
+from .benchmarks import BENCH_PREFIX, GoogleBooksStub
+from .db import configure_sqlite_connection, sticky_seconds
+from .middleware import REPLICA_PIN_COOKIE, ReplicaRoutingMiddleware
+from .authentication import ACTIVE_FLAG_KEY, CachedJWTAuthentication, CachedJWTTokenUserAuthentication, token_cache
+from .metrics import Histogram, registry
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .response_cache import LIST_SCOPE, book_scope, invalidate_books_cache, response_cache
+from .search import fts5_match_expression, tsquery_expression
+from .services.books import bulk_upsert_books
+from .services.import_jobs import enqueue_import_job, run_import_job
+from .services.ratings import bulk_create_ratings
 
 class BookViewSetTests(APITestCase):
     def setUp(self):
@@ -53,6 +100,33 @@ class BookViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_list_books_query_count(self):
+        """
+        Teste para garantir que a listagem não faz uma consulta por livro (N+1)
+        """
+        Rating.objects.create(book=self.book1, score=5)
+        Rating.objects.create(book=self.book1, score=3)
+        Rating.objects.create(book=self.book2, score=4)
+        url = reverse('book-list')
+        # Versão da listagem (ETag), COUNT da paginação e a página, com as estatísticas já nas colunas do livro
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['average_rating'], 4.0)
+        self.assertEqual(response.data['results'][0]['rating_count'], 2)
+        self.assertEqual(response.data['results'][1]['rating_count'], 1)
+
+    def test_retrieve_book_query_count(self):
+        """
+        Teste para garantir que o detalhe do livro não agrega as avaliações
+        """
+        Rating.objects.create(book=self.book1, score=2)
+        url = reverse('book-detail', kwargs={'pk': self.book1.pk})
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['average_rating'], 2.0)
+        self.assertEqual(response.data['rating_count'], 1)
+
     def test_create_book_authenticated(self):
         """
         Teste para criar um livro (requer autenticação)
@@ -180,6 +254,50 @@ class RatingViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Rating.objects.count(), 3)
 
+    def test_list_ratings_with_filter_query_count(self):
+        """
+        Teste para garantir que o filtro por livro é feito com JOIN, sem buscar o livro antes
+        """
+        url = reverse('rating-list')
+        params = {'book_title': self.book.book_title, 'book_authors': self.book.book_authors}
+        # Versão da listagem (ETag), COUNT da paginação e SELECT da página
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_list_ratings_with_filter_invalid_book(self):
+        """
+        Teste para filtrar avaliações de um livro inexistente
+        """
+        url = reverse('rating-list')
+        params = {'book_title': 'Livro Inexistente', 'book_authors': 'Autor Inexistente'}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # O livro inexistente é checado antes da página fora do intervalo
+        response = self.client.get(url, {**params, 'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'page': 99})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_rating_query_count(self):
+        """
+        Teste para garantir que a criação busca o livro e insere a avaliação em uma transação, com o mínimo de consultas
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse('rating-list')
+        data = {
+            'book_title': self.book.book_title,
+            'book_authors': self.book.book_authors,
+            'score': 3,
+            'comment': 'Bom'
+        }
+        # SAVEPOINT, SELECT do livro, INSERT da avaliação, UPDATE das estatísticas do livro e do histograma, upsert do dia,
+        # UPDATE das versões das tabelas e RELEASE SAVEPOINT
+        with self.assertNumQueries(8):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['book'], self.book.id)
+
     def test_create_rating_unauthenticated(self):
         """
         Teste para criar uma avaliação sem autenticação (deve falhar)
@@ -222,4 +340,2041 @@ class RatingViewSetTests(APITestCase):
             'comment': 'Teste'
         }
         response = self.client.post(url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class BookRatingStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+
+        self.book = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        self.other_book = Book.objects.create(
+            book_title='O Hobbit',
+            book_authors='J.R.R. Tolkien',
+            book_description='A jornada inicial',
+            book_selfLink='http://exemplo.com/livro2'
+        )
+
+    def assertStats(self, book, count, total, average):
+        book.refresh_from_db()
+        self.assertEqual(book.rating_count, count)
+        self.assertEqual(book.rating_sum, total)
+        self.assertAlmostEqual(book.average_rating, average)
+
+    def test_stats_on_create_update_delete(self):
+        """
+        Teste para garantir que as estatísticas acompanham criação, alteração e exclusão de avaliações
+        """
+        rating = Rating.objects.create(book=self.book, score=5)
+        Rating.objects.create(book=self.book, score=2)
+        self.assertStats(self.book, 2, 7, 3.5)
+
+        rating.score = 3
+        rating.save()
+        self.assertStats(self.book, 2, 5, 2.5)
+
+        rating.book = self.other_book
+        rating.save()
+        self.assertStats(self.book, 1, 2, 2.0)
+        self.assertStats(self.other_book, 1, 3, 3.0)
+
+        rating.delete()
+        self.assertStats(self.other_book, 0, 0, 0.0)
+
+        Rating.objects.filter(book=self.book).delete()
+        self.assertStats(self.book, 0, 0, 0.0)
+
+    def test_stats_on_api_create(self):
+        """
+        Teste para garantir que avaliações criadas pela API atualizam o livro
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse('rating-list')
+        data = {
+            'book_title': self.book.book_title,
+            'book_authors': self.book.book_authors,
+            'score': 4,
+            'comment': 'Muito bom!'
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertStats(self.book, 1, 4, 4.0)
+
+        response = self.client.get(reverse('book-detail', kwargs={'pk': self.book.pk}))
+        self.assertEqual(response.data['average_rating'], 4.0)
+        self.assertEqual(response.data['rating_count'], 1)
+
+    def test_unrated_book_average_is_null(self):
+        """
+        Teste para garantir que livros sem avaliações devolvem average_rating nulo, inclusive com ?fields=
+        """
+        Rating.objects.create(book=self.book, score=0)
+        detail = reverse('book-detail', kwargs={'pk': self.other_book.pk})
+        self.assertIsNone(self.client.get(detail).data['average_rating'])
+        self.assertEqual(self.client.get(detail, {'fields': 'average_rating'}).data, {'average_rating': None})
+
+        response = self.client.get(reverse('book-list'), {'fields': 'id,average_rating'})
+        averages = {row['id']: row['average_rating'] for row in response.data['results']}
+        # Média 0.0 de um livro avaliado com nota 0 continua 0.0
+        self.assertEqual(averages, {self.book.pk: 0.0, self.other_book.pk: None})
+
+    def test_rebuild_rating_stats_command(self):
+        """
+        Teste para o comando que recalcula as estatísticas em massa
+        """
+        Rating.objects.create(book=self.book, score=5)
+        Rating.objects.create(book=self.book, score=4)
+        Book.objects.update(rating_count=0, rating_sum=0, average_rating=0.0)
+
+        call_command('rebuild_rating_stats', batch_size=1, stdout=StringIO())
+        self.assertStats(self.book, 2, 9, 4.5)
+        self.assertStats(self.other_book, 0, 0, 0.0)
+
+class BookStatsEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = APIClient()
+        self.addCleanup(response_cache.backend.clear)
+        self.book = Book.objects.create(book_title='O Senhor dos Anéis', book_authors='J.R.R. Tolkien')
+        self.other_book = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+
+    def get_stats(self, book):
+        return self.client.get(reverse('book-stats', kwargs={'pk': book.pk}))
+
+    def assertHistogram(self, book, counts):
+        response = self.get_stats(book)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['histogram'], {str(score): count for score, count in enumerate(counts)})
+        self.assertEqual(response.data['rating_count'], sum(counts))
+        return response.data
+
+    def test_histogram_on_create_update_delete(self):
+        """
+        Teste para garantir que os contadores por nota acompanham criação, alteração e exclusão de avaliações
+        """
+        rating = Rating.objects.create(book=self.book, score=5)
+        Rating.objects.create(book=self.book, score=2)
+        data = self.assertHistogram(self.book, [0, 0, 1, 0, 0, 1])
+        self.assertAlmostEqual(data['average_rating'], 3.5)
+        self.assertAlmostEqual(data['window_average_rating'], 3.5)
+
+        rating.score = 3
+        rating.save()
+        self.assertHistogram(self.book, [0, 0, 1, 1, 0, 0])
+
+        rating.book = self.other_book
+        rating.save()
+        self.assertHistogram(self.book, [0, 0, 1, 0, 0, 0])
+        self.assertHistogram(self.other_book, [0, 0, 0, 1, 0, 0])
+
+        rating.delete()
+        data = self.assertHistogram(self.other_book, [0] * 6)
+        self.assertIsNone(data['average_rating'])
+        self.assertEqual(data['window_rating_count'], 0)
+        self.assertEqual(RatingDay.objects.get(book=self.book).rating_count, 1)
+
+    def test_stats_without_scanning_ratings(self):
+        """
+        Teste para a leitura das estatísticas: o livro com o histograma e a janela de dias, sem consultar Rating
+        """
+        Rating.objects.create(book=self.book, score=4)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_stats(self.book)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('api_rest_rating"' in query['sql'] for query in queries.captured_queries))
+
+    def test_window_average(self):
+        """
+        Teste para a média dos últimos 30 dias: avaliações antigas contam no total, mas não na janela
+        """
+        old = Rating.objects.create(book=self.book, score=1)
+        Rating.objects.create(book=self.book, score=5)
+        Rating.objects.create(book=self.book, score=4)
+        Rating.objects.filter(pk=old.pk).update(created_at=datetime.now(dt_timezone.utc) - timedelta(days=45))
+        Book.objects.rebuild_rating_stats()
+
+        data = self.assertHistogram(self.book, [0, 1, 0, 0, 1, 1])
+        self.assertAlmostEqual(data['average_rating'], 10 / 3)
+        self.assertEqual(data['window_days'], 30)
+        self.assertEqual(data['window_rating_count'], 2)
+        self.assertAlmostEqual(data['window_average_rating'], 4.5)
+        self.assertEqual(RatingDay.objects.filter(book=self.book).count(), 2)
+
+        # Exclusão da avaliação antiga: desconta do dia em que ela foi criada
+        Rating.objects.get(pk=old.pk).delete()
+        self.assertHistogram(self.book, [0, 0, 0, 0, 1, 1])
+        self.assertEqual(RatingDay.objects.filter(book=self.book, rating_count=0).count(), 1)
+
+    def test_bulk_ratings_update_histogram(self):
+        """
+        Teste para as avaliações em massa, que não disparam os signals de Rating
+        """
+        rows = [
+            {'book_title': self.book.book_title, 'book_authors': self.book.book_authors, 'score': score}
+            for score in (5, 5, 0)
+        ]
+        created, errors = bulk_create_ratings(rows)
+        self.assertEqual((created, errors), (3, []))
+        self.assertHistogram(self.book, [1, 0, 0, 0, 0, 2])
+        self.assertEqual(RatingHistogram.objects.get(book=self.book).rating_sum, 10)
+
+    def test_histogram_created_with_books(self):
+        """
+        Teste para a linha do histograma criada junto com o livro, pelo save e pelas gravações em massa
+        """
+        created, _, _ = bulk_upsert_books([{'book_title': 'Duna', 'book_authors': 'Frank Herbert'}])
+        self.assertEqual(created, 1)
+        book = Book.objects.get(book_title='Duna')
+        self.assertTrue(RatingHistogram.objects.filter(book=book).exists())
+        self.assertTrue(RatingHistogram.objects.filter(book=self.other_book).exists())
+        # Avaliação de um livro novo: o UPDATE do histograma encontra a linha e o upsert cria a do dia
+        with CaptureQueriesContext(connection) as queries:
+            Rating.objects.create(book=book, score=4)
+        self.assertFalse([query for query in queries if 'INSERT INTO "api_rest_ratinghistogram"' in query['sql']])
+        self.assertHistogram(book, [0, 0, 0, 0, 1, 0])
+        self.assertEqual(RatingDay.objects.get(book=book).rating_sum, 4)
+
+    def test_book_without_ratings_and_missing_book(self):
+        """
+        Teste para livro sem avaliações (linha do histograma zerada, criada com o livro) e para livro inexistente
+        """
+        data = self.assertHistogram(self.other_book, [0] * 6)
+        self.assertIsNone(data['window_average_rating'])
+        self.assertTrue(RatingHistogram.objects.filter(book=self.other_book).exists())
+
+        response = self.client.get(reverse('book-stats', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExportCsvTests(APITestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        Rating.objects.create(book=self.book, score=5, comment='Excelente livro!')
+
+    def read_csv(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_export_books_csv(self):
+        """
+        Teste para a exportação de livros em CSV via streaming
+        """
+        response = self.client.get(reverse('export_books_view'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="books.csv"')
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0][0], 'ID')
+        self.assertEqual(rows[1], [
+            str(self.book.id), 'O Senhor dos Anéis', 'J.R.R. Tolkien', 'Uma aventura épica',
+            'http://exemplo.com/livro1', '5.0', '1'
+        ])
+
+    def test_export_ratings_csv(self):
+        """
+        Teste para a exportação de avaliações em CSV via streaming
+        """
+        response = self.client.get(reverse('export_ratings_view'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = self.read_csv(response)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1:4], ['O Senhor dos Anéis', '5', 'Excelente livro!'])
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.books = [
+            Book.objects.create(
+                book_title=f'Livro {i}',
+                book_authors='Autor',
+                book_description='Descrição',
+                book_selfLink=f'http://exemplo.com/livro{i}'
+            )
+            for i in range(5)
+        ]
+        for score in range(5):
+            Rating.objects.create(book=self.books[0], score=score)
+
+    def collect_pages(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_list_books_cursor(self):
+        """
+        Teste para percorrer os livros com paginação por cursor
+        """
+        url = reverse('book-list')
+        # A paginação por cursor não executa COUNT(*), apenas a versão da listagem (ETag) e a consulta da página
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        ids = self.collect_pages(url, {'pagination': 'cursor'})
+        self.assertEqual(ids, [book.id for book in self.books])
+
+    def test_list_ratings_cursor(self):
+        """
+        Teste para percorrer as avaliações com paginação por cursor, mais recentes primeiro
+        """
+        ids = self.collect_pages(reverse('rating-list'), {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(ids, list(Rating.objects.values_list('id', flat=True)))
+
+    def test_page_size_limit(self):
+        """
+        Teste para o page_size definido pelo cliente, limitado pelo máximo do servidor
+        """
+        url = reverse('book-list')
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class GoogleBooksIngestionTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 10 volumes por termo
+        cls.stub = GoogleBooksStub(total_items=10).start()
+        cls.url = cls.stub.url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.stub.reset()
+        query_cache.clear()
+
+    def test_fetch_books_bulk_pages_and_retries(self):
+        """
+        Teste para a busca paginada e concorrente, com nova tentativa em respostas 429
+        """
+        self.stub.fail_first = {'aventura'}
+        with self.settings(GOOGLE_BOOKS_API_URL=self.url):
+            items, stats = fetch_books_bulk(
+                ['aventura', 'drama'],
+                pages=3,
+                max_results=4,
+                max_workers=4,
+                session=create_session(pool_size=4, backoff_factor=0),
+            )
+        # 10 volumes por termo divididos em páginas de 4 (startIndex 0, 4 e 8)
+        self.assertEqual(len(items), 20)
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['errors'], [])
+        self.assertGreater(stats['items_per_second'], 0)
+        # A primeira página de 'aventura' foi repetida após o 429
+        self.assertEqual(len(self.stub.requests_seen), 7)
+
+    def test_import_google_books_command(self):
+        """
+        Teste para o comando de importação em massa contra o servidor local
+        """
+        out = StringIO()
+        with self.settings(GOOGLE_BOOKS_API_URL=self.url):
+            call_command('import_google_books', 'aventura', pages=2, page_size=5, backoff=0, stdout=out)
+        self.assertEqual(Book.objects.count(), 10)
+        self.assertIn('itens/s', out.getvalue())
+
+
+class SaveVolumesBulkTests(APITestCase):
+    def volume(self, i, **volume_info):
+        info = {'title': f'Livro {i}', 'authors': ['Autor'], 'description': 'Descrição'}
+        info.update(volume_info)
+        return {'selfLink': f'http://exemplo.com/volume{i}', 'volumeInfo': info}
+
+    def test_save_volumes_query_count(self):
+        """
+        Teste para garantir que a importação usa poucas consultas, independente do número de volumes
+        """
+        Book.objects.create(
+            book_title='Livro 0',
+            book_authors='Autor',
+            book_description='Descrição',
+            book_selfLink='http://exemplo.com/volume0'
+        )
+        volumes = [self.volume(i) for i in range(50)]
+        # SAVEPOINT, SELECT dos links e dos títulos existentes, INSERT em massa (em um SAVEPOINT próprio),
+        # INSERT dos histogramas, UPDATE da versão da tabela e RELEASE SAVEPOINT
+        with self.assertNumQueries(9):
+            created_books = save_volumes_to_db(volumes)
+        self.assertEqual(len(created_books), 49)
+        self.assertEqual(Book.objects.count(), 50)
+
+    def test_save_volumes_skips_invalid_and_duplicates(self):
+        """
+        Teste para descartar volumes incompletos, longos demais ou repetidos
+        """
+        volumes = [
+            self.volume(1),
+            self.volume(1),
+            self.volume(2, description=None),
+            self.volume(3, title='x' * 101),
+            {'volumeInfo': {'title': 'Sem link', 'authors': ['Autor'], 'description': 'Descrição'}},
+        ]
+        created_books = save_volumes_to_db(volumes)
+        self.assertEqual([book.book_title for book in created_books], ['Livro 1'])
+        self.assertEqual(save_volumes_to_db(volumes), [])
+
+    def test_insert_returns_only_inserted_books(self):
+        """
+        Teste para uma importação simultânea que grava um dos livros depois da consulta das chaves existentes:
+        o INSERT em massa falha, o lote é gravado livro a livro e o livro da outra importação não é devolvido
+        """
+        concurrent = Book.objects.create(book_title='Livro 0', book_authors='Autor', book_selfLink='http://exemplo.com/volume0')
+        books = [Book(**volume_to_book_data(self.volume(i))) for i in range(3)]
+        created_books = _insert_new_books(books)
+        self.assertEqual([book.book_title for book in created_books], ['Livro 1', 'Livro 2'])
+        self.assertTrue(all(book.pk and book.pk != concurrent.pk for book in created_books))
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_save_volumes_skips_existing_title_and_authors(self):
+        """
+        Teste para volumes com título e autor já cadastrados (ou repetidos no mesmo lote) e links diferentes
+        """
+        Book.objects.create(book_title='Livro 1', book_authors='Autor', book_selfLink='http://exemplo.com/outro')
+        volumes = [self.volume(1), self.volume(2), {**self.volume(3, title='Livro 2'), 'selfLink': 'http://exemplo.com/x'}]
+        created_books = save_volumes_to_db(volumes)
+        self.assertEqual([book.book_selfLink for book in created_books], ['http://exemplo.com/volume2'])
+
+
+class ImportJobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.volumes = [
+            {
+                'selfLink': f'http://exemplo.com/volume{i}',
+                'volumeInfo': {'title': f'Livro {i}', 'authors': ['Autor'], 'description': 'Descrição'},
+            }
+            for i in range(3)
+        ]
+
+    def test_async_fetch_and_save_books(self):
+        """
+        Teste para enfileirar a importação, executar o job e consultar o status
+        """
+        url = reverse('book-fetch-and-save-books')
+        # O job é executado na própria thread do teste em vez do pool
+        with patch('api_rest.services.import_jobs.submit_job', run_import_job), \
+                patch('api_rest.services.import_jobs.fetch_books_from_google', return_value=self.volumes):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(url, {'q': 'Aventura', 'async': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ImportJob.Status.PENDING)
+
+        response = self.client.get(reverse('book-import-job-status', kwargs={'job_id': response.data['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], ImportJob.Status.DONE)
+        self.assertEqual(response.data['query'], 'aventura')
+        self.assertEqual(response.data['total_items'], 3)
+        self.assertEqual(response.data['processed_items'], 3)
+        self.assertEqual(response.data['created_count'], 3)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_duplicate_jobs_are_merged(self):
+        """
+        Teste para reaproveitar o job ativo de um mesmo termo de busca
+        """
+        url = reverse('book-fetch-and-save-books')
+        with patch('api_rest.services.import_jobs.submit_job'):
+            first = self.client.get(url, {'q': 'aventura', 'async': 'true'})
+            second = self.client.get(url, {'q': ' Aventura ', 'async': '1'})
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_failed_job(self):
+        """
+        Teste para registrar o erro de um job que falhou
+        """
+        job, created = enqueue_import_job('aventura')
+        self.assertTrue(created)
+        with patch('api_rest.services.import_jobs.fetch_books_from_google', side_effect=Exception('Erro ao buscar dados: 503')):
+            run_import_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertIn('503', job.error)
+
+    def test_import_job_not_found(self):
+        response = self.client.get(reverse('book-import-job-status', kwargs={'job_id': 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def make_stale(self, job, minutes=11):
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.RUNNING,
+            updated_at=datetime.now(dt_timezone.utc) - timedelta(minutes=minutes),
+        )
+
+    def test_stale_running_job_is_not_reused(self):
+        """
+        Teste para um job em execução cujo worker terminou: um novo pedido do mesmo termo cria outro job
+        """
+        with patch('api_rest.services.import_jobs.submit_job'):
+            stale, _ = enqueue_import_job('aventura')
+            self.make_stale(stale)
+            job, created = enqueue_import_job('Aventura')
+        self.assertTrue(created)
+        self.assertNotEqual(job.id, stale.id)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ImportJob.Status.FAILED)
+        self.assertIn('interrompida', stale.error)
+
+        # Um job em execução recente continua sendo reaproveitado
+        self.make_stale(job, minutes=1)
+        with patch('api_rest.services.import_jobs.submit_job'):
+            self.assertEqual(enqueue_import_job('aventura'), (job, False))
+
+    def test_process_import_jobs_fails_stale_jobs(self):
+        """
+        Teste para o comando process_import_jobs: marca os jobs parados como falhos e executa os pendentes
+        """
+        with patch('api_rest.services.import_jobs.submit_job'):
+            stale, _ = enqueue_import_job('drama')
+            pending, _ = enqueue_import_job('aventura')
+        self.make_stale(stale)
+        out = StringIO()
+        with patch('api_rest.services.import_jobs.fetch_books_from_google', return_value=self.volumes):
+            call_command('process_import_jobs', stdout=out)
+        self.assertIn('1 jobs interrompidos', out.getvalue())
+        self.assertIn('1 jobs processados', out.getvalue())
+        stale.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual((stale.status, pending.status), (ImportJob.Status.FAILED, ImportJob.Status.DONE))
+
+
+    def test_slow_worker_does_not_finish_failed_job(self):
+        """
+        Teste para um worker lento cujo job foi marcado como interrompido durante a importação: ele não volta a DONE
+        """
+        with patch('api_rest.services.import_jobs.submit_job'):
+            job, _ = enqueue_import_job('aventura')
+
+        def fetch(query):
+            self.make_stale(job)
+            call_command('process_import_jobs', stdout=StringIO())
+            return self.volumes
+
+        with patch('api_rest.services.import_jobs.fetch_books_from_google', side_effect=fetch):
+            run_import_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+
+
+
+class GoogleBooksCacheTests(APITestCase):
+    def setUp(self):
+        query_cache.clear()
+        self.addCleanup(query_cache.clear)
+        self.volumes = [{'selfLink': 'http://exemplo.com/volume1', 'volumeInfo': {'title': 'Livro 1'}}]
+
+    def test_cache_hit_for_normalized_query(self):
+        """
+        Teste para atender buscas equivalentes pelo cache
+        """
+        with patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes) as request:
+            self.assertEqual(fetch_books_from_google('aventura'), self.volumes)
+            self.assertEqual(fetch_books_from_google('  Aventura '), self.volumes)
+            fetch_books_from_google('aventura', start_index=5)
+        self.assertEqual(request.call_count, 2)
+        stats = query_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_cache_lru_eviction_and_ttl(self):
+        """
+        Teste para descartar a busca usada há mais tempo e respeitar o TTL
+        """
+        with self.settings(GOOGLE_BOOKS_CACHE_MAX_ENTRIES=2, GOOGLE_BOOKS_CACHE_TTL=60), \
+                patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes) as request:
+            fetch_books_from_google('a')
+            fetch_books_from_google('b')
+            fetch_books_from_google('a')  # 'a' passa a ser a mais recente
+            fetch_books_from_google('c')  # descarta 'b'
+            fetch_books_from_google('a')
+            fetch_books_from_google('b')
+        self.assertEqual(request.call_count, 4)
+        self.assertEqual(query_cache.stats()['evictions'], 2)
+
+        with self.settings(GOOGLE_BOOKS_CACHE_TTL=0), \
+                patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes) as request:
+            fetch_books_from_google('d')
+            fetch_books_from_google('d')
+        self.assertEqual(request.call_count, 2)
+
+    def test_backend_io_runs_outside_lock(self):
+        """
+        Teste para ler e gravar no backend do cache sem segurar o lock do processo
+        """
+        backend = query_cache.backend
+        held = []
+
+        def check_lock(method):
+            def wrapper(*args, **kwargs):
+                held.append(query_cache._lock.locked())
+                return method(*args, **kwargs)
+            return wrapper
+
+        with self.settings(GOOGLE_BOOKS_CACHE_MAX_ENTRIES=1), \
+                patch.object(backend, 'get', check_lock(backend.get)), \
+                patch.object(backend, 'set', check_lock(backend.set)), \
+                patch.object(backend, 'delete_many', check_lock(backend.delete_many)), \
+                patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes):
+            fetch_books_from_google('a')
+            fetch_books_from_google('b')  # descarta 'a'
+            fetch_books_from_google('b')
+        self.assertTrue(held)
+        self.assertNotIn(True, held)
+        self.assertEqual(query_cache.stats()['evictions'], 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        """
+        Teste para garantir uma única requisição para buscas idênticas simultâneas
+        """
+        threads_count = 8
+
+        def slow_request(*args):
+            # Segura a primeira requisição até as demais threads estarem esperando por ela
+            deadline = time.monotonic() + 5
+            while query_cache.stats()['coalesced'] < threads_count - 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return self.volumes
+
+        results = []
+        with patch('api_rest.services.google_books.request_books_from_google', side_effect=slow_request) as request:
+            threads = [
+                threading.Thread(target=lambda: results.append(fetch_books_from_google('aventura')))
+                for _ in range(threads_count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(results, [self.volumes] * threads_count)
+
+    def test_errors_are_not_cached(self):
+        """
+        Teste para não guardar em cache buscas que falharam
+        """
+        with patch('api_rest.services.google_books.request_books_from_google', side_effect=Exception('Erro')):
+            with self.assertRaises(Exception):
+                fetch_books_from_google('aventura')
+        with patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes):
+            self.assertEqual(fetch_books_from_google('aventura'), self.volumes)
+
+    def test_file_based_cache(self):
+        """
+        Teste para o cache em arquivo
+        """
+        with tempfile.TemporaryDirectory() as location:
+            caches_setting = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'google_books': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+            }
+            with self.settings(CACHES=caches_setting), \
+                    patch('api_rest.services.google_books.request_books_from_google', return_value=self.volumes) as request:
+                fetch_books_from_google('aventura')
+                self.assertEqual(fetch_books_from_google('aventura'), self.volumes)
+                self.assertTrue(os.listdir(location))
+                query_cache.clear()
+            self.assertEqual(request.call_count, 1)
+
+
+class BookSearchTests(APITestCase):
+    def setUp(self):
+        self.lotr = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica na Terra Média',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        self.hobbit = Book.objects.create(
+            book_title='O Hobbit',
+            book_authors='J.R.R. Tolkien',
+            book_description='A jornada inicial, uma aventura com anéis',
+            book_selfLink='http://exemplo.com/livro2'
+        )
+        self.dune = Book.objects.create(
+            book_title='Duna',
+            book_authors='Frank Herbert',
+            book_description='Ficção científica épica',
+            book_selfLink='http://exemplo.com/livro3'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('book-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['id'] for book in response.data['results']]
+
+    def test_search_ranked(self):
+        """
+        Teste para a busca textual, com o título pesando mais que a descrição
+        """
+        self.assertEqual(self.search(q='anéis'), [self.lotr.id, self.hobbit.id])
+        self.assertEqual(self.search(q='tolkien hobbit'), [self.hobbit.id])
+        # Sem acento e com prefixo no último termo
+        self.assertCountEqual(self.search(q='epic'), [self.lotr.id, self.dune.id])
+        self.assertEqual(self.search(q='aneis', limit=1), [self.lotr.id])
+
+    def test_search_follows_writes(self):
+        """
+        Teste para garantir que o índice acompanha alterações e exclusões de livros
+        """
+        self.dune.book_title = 'Duna Messias'
+        self.dune.save()
+        self.assertEqual(self.search(q='messias'), [self.dune.id])
+        Book.objects.bulk_create([Book(book_title='Messias de Duna', book_authors='Frank Herbert', book_selfLink='x')])
+        self.assertEqual(len(self.search(q='messias')), 2)
+        self.dune.delete()
+        self.assertEqual(len(self.search(q='messias')), 1)
+
+    def test_search_requires_query(self):
+        response = self.client.get(reverse('book-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Operadores do FTS5 são tratados como texto comum
+        self.assertEqual(self.search(q='"AND* -:'), [])
+
+    def test_match_expressions(self):
+        """
+        Teste para as expressões de busca do SQLite e do PostgreSQL: termos obrigatórios e prefixo no último
+        """
+        self.assertEqual(fts5_match_expression('Senhor dos an'), '"Senhor" "dos" "an"*')
+        self.assertEqual(tsquery_expression("Senhor dos an"), "'Senhor' & 'dos' & 'an':*")
+        self.assertEqual(tsquery_expression("'a' | !b <-> c:*"), "'a' & 'b' & 'c':*")
+        self.assertIsNone(fts5_match_expression('"*'))
+        self.assertIsNone(tsquery_expression('&|!'))
+
+
+class BulkRatingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('rating-bulk')
+        self.lotr = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        self.hobbit = Book.objects.create(
+            book_title='O Hobbit',
+            book_authors='J.R.R. Tolkien',
+            book_description='A jornada inicial',
+            book_selfLink='http://exemplo.com/livro2'
+        )
+
+    def rating(self, book, score, comment='Bom'):
+        return {'book_title': book.book_title, 'book_authors': book.book_authors, 'score': score, 'comment': comment}
+
+    def test_bulk_create_json(self):
+        """
+        Teste para criar avaliações em massa com erros por linha
+        """
+        rows = [
+            self.rating(self.lotr, 5),
+            self.rating(self.lotr, 3),
+            self.rating(self.hobbit, 4),
+            self.rating(self.hobbit, 9),
+            {'book_title': 'Livro Inexistente', 'book_authors': 'Autor', 'score': 1},
+            {'score': 2},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4, 5])
+        self.assertIn('score', response.data['errors'][0]['errors'])
+
+        self.lotr.refresh_from_db()
+        self.assertEqual((self.lotr.rating_count, self.lotr.rating_sum, self.lotr.average_rating), (2, 8, 4.0))
+        self.hobbit.refresh_from_db()
+        self.assertEqual((self.hobbit.rating_count, self.hobbit.average_rating), (1, 4.0))
+
+    def test_bulk_create_ndjson(self):
+        """
+        Teste para criar avaliações em massa a partir de NDJSON
+        """
+        body = '\n'.join(json.dumps(self.rating(self.lotr, score)) for score in range(6)) + '\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 6, 'errors': []})
+
+        response = self.client.post(self.url, '{"score": 1}\n{inválido', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_query_count(self):
+        """
+        Teste para garantir que o número de consultas não depende do número de avaliações
+        """
+        rows = [self.rating(self.lotr, i % 6) for i in range(200)] + [self.rating(self.hobbit, 5)]
+        # SAVEPOINT, SELECT dos livros, INSERT em massa, um UPDATE por livro afetado em Book e em RatingHistogram,
+        # um upsert dos contadores do dia, UPDATE das versões das tabelas e RELEASE SAVEPOINT
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['created'], 201)
+        self.assertEqual(RatingDay.objects.get(book=self.lotr).rating_count, 200)
+        # Linhas do dia já existentes: o mesmo upsert soma às contagens
+        with self.assertNumQueries(10):
+            self.client.post(self.url, rows, format='json')
+        self.assertEqual(RatingDay.objects.get(book=self.lotr).rating_count, 400)
+
+    def test_bulk_create_invalid_title_types(self):
+        """
+        Teste para garantir que títulos e autores que não são texto viram erros da linha, não um erro 500
+        """
+        rows = [
+            {'book_title': ['O Hobbit'], 'book_authors': 'J.R.R. Tolkien', 'score': 4},
+            self.rating(self.lotr, 5),
+            {'book_title': 42, 'book_authors': 'J.R.R. Tolkien', 'score': 3},
+            {'book_title': 'O Hobbit', 'book_authors': {'nome': 'Tolkien'}, 'score': 3},
+            {'book_title': '', 'book_authors': 'J.R.R. Tolkien', 'score': 3},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 2, 3, 4])
+        self.assertIn('book_title', response.data['errors'][0]['errors'])
+        self.assertIn('book_authors', response.data['errors'][2]['errors'])
+
+        # Títulos numéricos e textuais na mesma importação
+        rows = [{'book_title': 1, 'book_authors': 'Autor', 'score': 1}, self.rating(self.hobbit, 2)]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0])
+
+    def test_bulk_create_commits_each_chunk(self):
+        """
+        Teste para a importação em blocos: cada bloco é gravado em sua transação e as estatísticas somam todos
+        """
+        rows = [self.rating(self.lotr, score) for score in (5, 4, 3)] + [self.rating(self.hobbit, 1), {'score': 9}]
+        with CaptureQueriesContext(connection) as queries:
+            created, errors = bulk_create_ratings(rows, chunk_size=2)
+        self.assertEqual(created, 4)
+        self.assertEqual([error['index'] for error in errors], [4])
+        self.assertEqual(sum(query['sql'].startswith('SAVEPOINT') for query in queries), 3)
+        self.lotr.refresh_from_db()
+        self.assertEqual((self.lotr.rating_count, self.lotr.rating_sum), (3, 12))
+        self.assertEqual(RatingHistogram.objects.get(book=self.hobbit).score_1, 1)
+
+    def test_bulk_create_all_invalid(self):
+        response = self.client.post(self.url, [self.rating(self.lotr, 7)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'score': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkUpsertBookTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('book-bulk-upsert')
+        self.book = Book.objects.create(
+            book_title='O Hobbit',
+            book_authors='J.R.R. Tolkien',
+            book_description='A jornada inicial',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        Rating.objects.create(book=self.book, score=5)
+
+    def book_data(self, i, **extra):
+        data = {
+            'book_title': f'Livro {i}',
+            'book_authors': 'Autor',
+            'book_description': 'Descrição',
+            'book_selfLink': f'http://exemplo.com/volume{i}',
+        }
+        data.update(extra)
+        return data
+
+    def test_bulk_upsert(self):
+        """
+        Teste para criar e atualizar livros em massa pela chave título + autores
+        """
+        rows = [
+            self.book_data(1),
+            self.book_data(2),
+            {
+                'book_title': 'O Hobbit',
+                'book_authors': 'J.R.R. Tolkien',
+                'book_description': 'Descrição revisada',
+                'book_selfLink': 'http://exemplo.com/livro1',
+            },
+            self.book_data(3, book_title='x' * 101),
+            self.book_data(4, book_selfLink='http://exemplo.com/livro1'),
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4])
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.book_description, 'Descrição revisada')
+        # As estatísticas de avaliações não são alteradas pelo upsert
+        self.assertEqual(self.book.rating_count, 1)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_bulk_upsert_query_count(self):
+        """
+        Teste para garantir que o número de consultas não depende do número de livros
+        """
+        rows = [self.book_data(i) for i in range(100)]
+        # SELECT dos livros existentes, SELECT dos links, SAVEPOINT, INSERT ... ON CONFLICT, INSERT dos histogramas,
+        # UPDATE da versão da tabela e RELEASE SAVEPOINT (no SQLite o Django divide o INSERT a cada ~120 livros por
+        # causa do limite de parâmetros)
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['created'], 100)
+
+        rows = [self.book_data(i, book_description='Nova descrição') for i in range(300)]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (200, 100))
+        self.assertEqual(Book.objects.filter(book_description='Nova descrição').count(), 300)
+
+    def test_bulk_upsert_keeps_missing_fields(self):
+        """
+        Teste para manter a descrição e o link de livros existentes quando a linha não os envia
+        """
+        rows = [
+            {'book_title': 'O Hobbit', 'book_authors': 'J.R.R. Tolkien'},
+            self.book_data(1),
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.book_description, 'A jornada inicial')
+        self.assertEqual(self.book.book_selfLink, 'http://exemplo.com/livro1')
+
+        rows = [{'book_title': 'O Hobbit', 'book_authors': 'J.R.R. Tolkien', 'book_description': 'Nova'}]
+        self.client.post(self.url, rows, format='json')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.book_description, 'Nova')
+        self.assertEqual(self.book.book_selfLink, 'http://exemplo.com/livro1')
+
+    def test_bulk_upsert_unauthenticated(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url, [self.book_data(1)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.book = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        Rating.objects.create(book=self.book, score=5)
+
+    def assertConditional(self, url, params=None, queries=1):
+        """
+        Faz a requisição, repete com If-None-Match e retorna o ETag
+        """
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        # Versão atual: 304 sem corpo e sem executar a consulta da página
+        # (livros: a resposta vem do cache de respostas, sem nenhuma consulta)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_retrieve_book_conditional(self):
+        """
+        Teste para o ETag do detalhe do livro, que muda com as estatísticas de avaliações
+        """
+        url = reverse('book-detail', kwargs={'pk': self.book.pk})
+        etag = self.assertConditional(url, queries=0)
+        Rating.objects.create(book=self.book, score=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['rating_count'], 2)
+
+    def test_retrieve_book_conditional_fields(self):
+        """
+        Teste para o ETag do detalhe do livro, que varia com os campos pedidos em ?fields=
+        """
+        url = reverse('book-detail', kwargs={'pk': self.book.pk})
+        etag = self.client.get(url, {'fields': 'id,book_title'})['ETag']
+        self.assertEqual(self.client.get(url, {'fields': 'book_title, id'})['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('book_description', response.data)
+
+    def test_list_books_conditional(self):
+        """
+        Teste para o ETag da listagem de livros, que varia por página e muda com exclusões
+        """
+        url = reverse('book-list')
+        etag = self.assertConditional(url, queries=0)
+        self.assertNotEqual(self.assertConditional(url, {'page_size': 1}, queries=0), etag)
+        other = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_ratings_conditional(self):
+        """
+        Teste para o ETag da listagem de avaliações, baseado na versão da tabela
+        """
+        url = reverse('rating-list')
+        params = {'book_title': self.book.book_title, 'book_authors': self.book.book_authors}
+        etag = self.assertConditional(url, params)
+        Rating.objects.create(book=self.book, score=2)
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_list_ratings_conditional_edits(self):
+        """
+        Teste para mudar o ETag e o Last-Modified das avaliações ao editar só o comentário e ao excluir
+        """
+        url = reverse('rating-list')
+        rating = Rating.objects.get(book=self.book)
+        etag = self.assertConditional(url)
+        rating.comment = 'Revisado'
+        rating.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['comment'], 'Revisado')
+
+        etag, last_modified = response['ETag'], TableVersion.objects.current(RATINGS_TABLE)[1]
+        rating.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(TableVersion.objects.current(RATINGS_TABLE)[1], last_modified)
+
+class BookResponseCacheTests(APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.book = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+        self.list_url = reverse('book-list')
+        self.detail_url = reverse('book-detail', kwargs={'pk': self.book.pk})
+
+    def assertCached(self, url, params=None):
+        """
+        Primeira requisição monta a resposta (MISS); a segunda vem do cache (HIT) sem consultas
+        """
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, params)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        return cached
+
+    def test_list_and_detail_cached(self):
+        """
+        Teste para o cache da listagem (por query string) e do detalhe do livro
+        """
+        self.assertCached(self.list_url)
+        self.assertCached(self.list_url, {'page_size': 1})
+        self.assertCached(self.detail_url)
+        stats = response_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 3))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_missing_book_not_cached(self):
+        """
+        Teste para respostas de erro, que não são guardadas
+        """
+        url = reverse('book-detail', kwargs={'pk': self.book.pk + 100})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_book_writes_invalidate(self):
+        """
+        Teste para a invalidação ao criar, alterar e excluir livros
+        """
+        self.assertCached(self.list_url)
+        other = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        response = self.assertCached(self.list_url)
+        self.assertEqual(response.data['count'], 2)
+
+        self.assertCached(self.detail_url)
+        self.book.book_description = 'Nova descrição'
+        self.book.save()
+        response = self.assertCached(self.detail_url)
+        self.assertEqual(response.data['book_description'], 'Nova descrição')
+
+        other.delete()
+        response = self.assertCached(self.list_url)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_rating_writes_invalidate(self):
+        """
+        Teste para a invalidação quando avaliações alteram as estatísticas do livro
+        """
+        self.assertCached(self.detail_url)
+        rating = Rating.objects.create(book=self.book, score=4)
+        self.assertEqual(self.assertCached(self.detail_url).data['rating_count'], 1)
+        rating.delete()
+        self.assertEqual(self.assertCached(self.detail_url).data['rating_count'], 0)
+
+    def test_bulk_writes_invalidate(self):
+        """
+        Teste para a invalidação nas operações em massa, que não disparam signals
+        """
+        self.assertCached(self.detail_url)
+        bulk_create_ratings([
+            {'book_title': self.book.book_title, 'book_authors': self.book.book_authors, 'score': 5},
+        ])
+        self.assertEqual(self.assertCached(self.detail_url).data['rating_count'], 1)
+
+        self.assertCached(self.list_url)
+        created, updated, errors = bulk_upsert_books([
+            {'book_title': 'O Hobbit', 'book_authors': 'J.R.R. Tolkien', 'book_description': 'A jornada inicial'},
+        ])
+        self.assertEqual((created, updated, errors), (1, 0, []))
+        self.assertEqual(self.assertCached(self.list_url).data['count'], 2)
+
+    def test_authenticated_bypasses_cache(self):
+        """
+        Teste para requisições autenticadas, que não usam o cache
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response_cache.stats()['misses'], 0)
+
+    def test_waits_for_concurrent_build(self):
+        """
+        Teste para a proteção contra stampede: com a entrada sendo montada por outra requisição,
+        esta espera o resultado em vez de consultar o banco
+        """
+        key = response_cache.make_key(self.client.get(self.detail_url).wsgi_request, book_scope(self.book.pk))
+        entry = response_cache.backend.get(key)
+        response_cache.backend.delete(key)
+        response_cache.reset_stats()
+        response_cache.backend.add(f'{key}:lock', 1)
+        # Simula a outra requisição terminando de montar a resposta
+        timer = threading.Timer(0.1, response_cache.backend.set, args=(key, entry))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['book_title'], self.book.book_title)
+        self.assertEqual(response_cache.stats()['waits'], 1)
+
+    def test_wait_timeout_keeps_other_lock(self):
+        """
+        Teste para a requisição que desiste de esperar: monta a resposta sem apagar a trava da outra requisição
+        """
+        key = response_cache.make_key(self.client.get(self.detail_url).wsgi_request, book_scope(self.book.pk))
+        response_cache.backend.delete(key)
+        response_cache.backend.add(f'{key}:lock', 1)
+        with patch('api_rest.response_cache.LOCK_WAIT', 0.05):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIsNotNone(response_cache.backend.get(f'{key}:lock'))
+
+    def test_rating_invalidates_only_its_book(self):
+        """
+        Teste para a invalidação por livro: avaliar um livro não descarta o detalhe dos demais
+        """
+        other = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        other_url = reverse('book-detail', kwargs={'pk': other.pk})
+        self.assertCached(other_url)
+        self.assertCached(self.list_url)
+        Rating.objects.create(book=self.book, score=4)
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(self.list_url)['X-Cache'], 'MISS')
+
+    def test_key_includes_host(self):
+        """
+        Teste para separar as entradas por host, pois os links next e previous da resposta são absolutos
+        """
+        Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        with self.settings(ALLOWED_HOSTS=['api.exemplo.com', 'testserver']):
+            response = self.client.get(self.list_url, {'page_size': 1}, HTTP_HOST='api.exemplo.com')
+        self.assertTrue(response.data['next'].startswith('http://api.exemplo.com/'))
+        response = self.client.get(self.list_url, {'page_size': 1}, HTTP_HOST='testserver')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.data['next'].startswith('http://testserver/'))
+
+class MetricsMiddlewareTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        response_cache.clear()
+        self.addCleanup(registry.clear)
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.book = Book.objects.create(
+            book_title='O Senhor dos Anéis',
+            book_authors='J.R.R. Tolkien',
+            book_description='Uma aventura épica',
+            book_selfLink='http://exemplo.com/livro1'
+        )
+
+    def test_records_queries_and_size_per_view(self):
+        """
+        Teste para as métricas agregadas por Classe.ação do ViewSet
+        """
+        response = self.client.get(reverse('book-list'))
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('rating-list'), {
+            'book_title': self.book.book_title, 'book_authors': self.book.book_authors, 'score': 4,
+        }, format='json')
+
+        views = registry.snapshot()
+        self.assertEqual(set(views), {'BookViewSet.list', 'RatingViewSet.create'})
+        book_list = views['BookViewSet.list']
+        self.assertEqual(book_list.queries.sum, 3)  # agregado do ETag, COUNT e página
+        self.assertEqual(book_list.response_size.sum, len(response.content))
+        self.assertEqual(book_list.responses, {200: 1})
+        self.assertGreater(book_list.query_seconds, 0)
+        self.assertEqual(views['RatingViewSet.create'].responses, {201: 1})
+
+    def test_streaming_export_measured_until_end(self):
+        """
+        Teste para a exportação CSV, cujas consultas acontecem durante o streaming
+        """
+        response = self.client.get(reverse('export_books_view'))
+        self.assertNotIn('export_books_view', registry.snapshot())
+        content = b''.join(response.streaming_content)
+        metrics = registry.snapshot()['export_books_view']
+        self.assertEqual(metrics.response_size.sum, len(content))
+        self.assertGreaterEqual(metrics.queries.sum, 1)
+
+    @override_settings(METRICS_QUERY_BUDGET=0)
+    def test_query_budget(self):
+        """
+        Teste para requisições acima do orçamento de consultas
+        """
+        with self.assertLogs('api_rest.middleware', 'WARNING') as logs:
+            self.client.get(reverse('book-detail', kwargs={'pk': self.book.pk}))
+        self.assertIn('BookViewSet.retrieve', logs.output[0])
+        self.assertEqual(registry.snapshot()['BookViewSet.retrieve'].over_budget, 1)
+
+    def test_prometheus_endpoint(self):
+        """
+        Teste para o endpoint /api/_metrics no formato texto do Prometheus
+        """
+        self.client.get(reverse('book-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE api_request_duration_seconds histogram', text)
+        self.assertIn('api_request_duration_seconds_bucket{view="BookViewSet.list",le="+Inf"} 1', text)
+        self.assertIn('api_request_queries_sum{view="BookViewSet.list"} 3', text)
+        self.assertIn('api_requests_total{view="BookViewSet.list",status="200"} 1', text)
+        self.assertIn('api_cache_misses_total{cache="responses"} 1', text)
+        # O próprio endpoint de métricas não é medido
+        self.assertNotIn('metrics_view', text)
+
+    def test_prometheus_endpoint_local_only(self):
+        """
+        Teste para o acesso ao endpoint de métricas fora de METRICS_ALLOWED_IPS
+        """
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_histogram_buckets(self):
+        """
+        Teste para os buckets cumulativos do histograma
+        """
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual((histogram.sum, histogram.count), (14, 4))
+
+class BenchmarkCommandTests(APITestCase):
+    def test_benchmark_api_writes_json(self):
+        """
+        Teste do comando benchmark_api com volumes pequenos: todos os cenários executam e o resultado é gravado em JSON
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'resultado.json')
+            call_command(
+                'benchmark_api', books=30, ratings=200, repeat=2, export_repeat=1, warmup=0, page_size=5,
+                output=output, cleanup=True, stdout=StringIO(),
+            )
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+        self.assertEqual(set(report['results']), {
+            'book_list', 'book_list_cached', 'book_retrieve', 'rating_list_filtered', 'rating_create',
+            'export_books', 'export_ratings', 'save_books_to_db',
+        })
+        self.assertEqual(report['volumes']['books'], 30)
+        for result in report['results'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # --cleanup remove os livros gerados, inclusive os importados do Google Books simulado
+        self.assertFalse(Book.objects.exists())
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        # (título, notas): "Poucas" tem média 5 com uma única avaliação e não deve liderar o ranking bayesiano
+        scores = {
+            'Poucas': [5],
+            'Muitas': [5, 5, 5, 5, 4, 5, 5, 5, 5, 5, 4, 5],
+            'Medianas': [3, 3, 3, 2, 3, 3],
+            'Ruins': [0, 1, 0],
+        }
+        self.books = {}
+        for title, values in scores.items():
+            book = Book.objects.create(book_title=title, book_authors='Autor')
+            for score in values:
+                Rating.objects.create(book=book, score=score)
+            self.books[title] = book
+        for i in range(7):
+            Book.objects.create(book_title=f'Sem avaliações {i}', book_authors='Autor')
+
+    def titles(self, response):
+        return [book['book_title'] for book in response.data['results']]
+
+    def walk(self, url, params):
+        """
+        Percorre todas as páginas pelos links next e retorna os títulos na ordem
+        """
+        titles = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(self.titles(response))
+            if response.data['next'] is None:
+                return titles
+            response = self.client.get(response.data['next'])
+
+    def test_bayesian_rating_maintained(self):
+        """
+        Teste para a média bayesiana mantida nas escritas de avaliações e no recálculo
+        """
+        book = Book.objects.get(pk=self.books['Poucas'].pk)
+        self.assertAlmostEqual(book.bayesian_rating, (10 * 2.5 + 5) / 11)
+        Rating.objects.filter(book=book).first().delete()
+        book.refresh_from_db()
+        self.assertAlmostEqual(book.bayesian_rating, 2.5)
+        Book.objects.update(bayesian_rating=0)
+        Book.objects.rebuild_rating_stats()
+        muitas = Book.objects.get(pk=self.books['Muitas'].pk)
+        self.assertAlmostEqual(muitas.bayesian_rating, (10 * 2.5 + 58) / 22)
+        self.assertEqual(Book.objects.get(book_title='Sem avaliações 0').bayesian_rating, 2.5)
+
+    def test_top_rated(self):
+        """
+        Teste para o ranking pela média bayesiana e para o filtro min_votes
+        """
+        url = reverse('book-top-rated')
+        titles = self.walk(url, {'page_size': 3})
+        self.assertEqual(titles[:3], ['Muitas', 'Poucas', 'Medianas'])
+        # Livros sem avaliações ficam com a média a priori (2.5), acima de "Ruins"
+        self.assertEqual(titles[3:], [f'Sem avaliações {i}' for i in range(6, -1, -1)] + ['Ruins'])
+        response = self.client.get(url, {'min_votes': 3, 'page_size': 10})
+        self.assertEqual(self.titles(response), ['Muitas', 'Medianas', 'Ruins'])
+        response = self.client.get(url, {'min_votes': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_most_rated(self):
+        """
+        Teste para o ranking pelo total de avaliações
+        """
+        titles = self.walk(reverse('book-most-rated'), {'page_size': 2})
+        self.assertEqual(titles[:4], ['Muitas', 'Medianas', 'Ruins', 'Poucas'])
+        expected = list(Book.objects.order_by('-rating_count', '-average_rating', '-id').values_list('book_title', flat=True))
+        self.assertEqual(titles, expected)
+
+    def test_keyset_paging_through_ties(self):
+        """
+        Teste para a paginação dentro de empates (livros sem avaliações): cada página custa no máximo uma consulta
+        por campo da ordenação, sem OFFSET, e o link previous volta para a página anterior
+        """
+        url = reverse('book-top-rated')
+        first = self.client.get(url, {'page_size': 4})
+        second = self.client.get(first.data['next'])
+        with self.assertNumQueries(3):
+            third = self.client.get(second.data['next'])
+        self.assertEqual(len(third.data['results']), 3)
+        self.assertIsNone(third.data['next'])
+        previous = self.client.get(third.data['previous'])
+        self.assertEqual(self.titles(previous), self.titles(second))
+        self.assertEqual(self.titles(self.client.get(previous.data['previous'])), self.titles(first))
+
+    def test_invalid_cursor(self):
+        """
+        Teste para cursores inválidos
+        """
+        for cursor in ('invalido', 'eyJwIjogWzFdfQ=='):
+            response = self.client.get(reverse('book-top-rated'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        for i in range(3):
+            book = Book.objects.create(
+                book_title=f'Livro {i}',
+                book_authors='Autor',
+                book_description='Descrição longa ' * 50,
+                book_selfLink=f'http://exemplo.com/livro{i}'
+            )
+            Rating.objects.create(book=book, score=i)
+        self.book = book
+
+    def assertSelects(self, url, params, expected_keys):
+        """
+        Faz a requisição e confirma os campos da resposta e que book_description ficou fora do SELECT
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        book_selects = [query['sql'] for query in queries if 'FROM "api_rest_book"' in query['sql']]
+        self.assertTrue(book_selects)
+        for sql in book_selects:
+            self.assertNotIn('book_description', sql)
+        results = response.data.get('results', [response.data]) if isinstance(response.data, dict) else response.data
+        for book in results:
+            self.assertEqual(list(book), expected_keys)
+        return response
+
+    def test_list_fields(self):
+        """
+        Teste para ?fields= na listagem, com paginação por página e por cursor
+        """
+        url = reverse('book-list')
+        fields = ['id', 'book_title', 'average_rating']
+        response = self.assertSelects(url, {'fields': 'id,book_title,average_rating', 'page_size': 10}, fields)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertSelects(url, {'fields': 'book_title', 'pagination': 'cursor'}, ['book_title'])
+
+    def test_retrieve_fields(self):
+        """
+        Teste para ?fields= no detalhe do livro: o ETag continua disponível
+        """
+        url = reverse('book-detail', kwargs={'pk': self.book.pk})
+        response = self.assertSelects(url, {'fields': 'book_title,rating_count'}, ['book_title', 'rating_count'])
+        self.assertEqual(response.data, {'book_title': 'Livro 2', 'rating_count': 1})
+        self.assertIn('ETag', response)
+
+    def test_leaderboard_and_search_fields(self):
+        """
+        Teste para ?fields= nos rankings (sem consultas extras para montar o cursor) e na busca
+        """
+        with self.assertNumQueries(1):
+            self.assertSelects(reverse('book-top-rated'), {'fields': 'book_title'}, ['book_title'])
+        response = self.client.get(reverse('book-search'), {'q': 'livro', 'fields': 'id,book_title'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'book_title'])
+
+    def test_smaller_payload(self):
+        """
+        Teste para o tamanho da resposta com e sem seleção de campos
+        """
+        url = reverse('book-list')
+        full = self.client.get(url, {'page_size': 10})
+        sparse = self.client.get(url, {'page_size': 10, 'fields': 'id,book_title'})
+        self.assertLess(len(sparse.content) * 5, len(full.content))
+
+    def test_invalid_fields(self):
+        """
+        Teste para campos inexistentes ou parâmetro vazio
+        """
+        for value in ('book_title,senha', ''):
+            response = self.client.get(reverse('book-list'), {'fields': value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', response.data)
+
+class FastJSONTests(APITestCase):
+    def test_renderer_matches_drf(self):
+        """
+        Teste para a saída do FastJSONRenderer, idêntica à do JSONRenderer do DRF (datetimes, Decimal, UUID, chaves numéricas)
+        """
+        book = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien', book_description='Árvore\u2028linha')
+        rating = Rating.objects.create(book=book, score=5, comment='Ótimo')
+        created_at = datetime(2024, 5, 17, 13, 45, 30, 123456, tzinfo=dt_timezone.utc)
+        data = {
+            'book': BookSerializer(book).data,
+            'rating': RatingSerializer(rating).data,
+            'created_at': created_at,
+            'local': created_at.astimezone(dt_timezone(timedelta(hours=-3))),
+            'date': created_at.date(),
+            'price': Decimal('10.50'),
+            'id': uuid.UUID(int=1),
+            1: 'chave numérica',
+            'lista': [None, True, 1.5, 'texto'],
+        }
+        drf = JSONRenderer().render(data)
+        fast = FastJSONRenderer().render(data)
+        self.assertEqual(fast, drf)
+        self.assertIn(b'"created_at":"2024-05-17T13:45:30.123456Z"', fast)
+        self.assertIn(b'\\u2028', fast)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_renderer_indent_fallback(self):
+        """
+        Teste para Accept com indent, atendido pelo renderer do DRF
+        """
+        data = {'a': [1, 2]}
+        rendered = FastJSONRenderer().render(data, 'application/json; indent=2')
+        self.assertEqual(rendered, JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_api_uses_fast_renderer(self):
+        """
+        Teste para o renderer configurado em REST_FRAMEWORK
+        """
+        Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        response_cache.clear()
+        response = self.client.get(reverse('book-list'))
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(json.loads(response.content), json.loads(JSONRenderer().render(response.data)))
+
+    def test_parser(self):
+        """
+        Teste para o FastJSONParser: UTF-8, outras codificações e JSON inválido
+        """
+        parser = FastJSONParser()
+        body = json.dumps({'book_title': 'Árvore', 'score': 5}, ensure_ascii=False)
+        self.assertEqual(parser.parse(BytesIO(body.encode()), parser_context={}), {'book_title': 'Árvore', 'score': 5})
+        self.assertEqual(
+            parser.parse(BytesIO(body.encode('latin-1')), parser_context={'encoding': 'latin-1'}),
+            {'book_title': 'Árvore', 'score': 5},
+        )
+        for invalid in (b'{"score": NaN}', b'{"score": 5', b''):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(invalid), parser_context={})
+
+    def test_benchmark_json_command(self):
+        """
+        Teste do comando benchmark_json com poucas repetições
+        """
+        out = StringIO()
+        call_command('benchmark_json', items=5, bulk_rows=10, repeat=2, stdout=out)
+        self.assertIn('render_book_list', out.getvalue())
+
+class ValuesSerializerTests(APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.books = [
+            Book.objects.create(
+                book_title=f'Livro {i} – ação',
+                book_authors='Autor',
+                book_description='Descrição\ncom "aspas" e acentuação',
+                book_selfLink=f'http://exemplo.com/livro{i}'
+            )
+            for i in range(4)
+        ]
+        Rating.objects.create(book=self.books[0], score=5, comment='Ótimo')
+        Rating.objects.create(book=self.books[0], score=0, comment=None)
+        Rating.objects.create(book=self.books[1], score=3, comment='')
+
+    def assertSameOutput(self, serializer_class, queryset, fields=None):
+        """
+        Compara o ValuesSerializer com o ModelSerializer original: mesmos dados e mesmo JSON renderizado
+        """
+        fast = values_serializer(serializer_class, fields)
+        expected = serializer_class(queryset, many=True, **({'fields': fields} if fields else {})).data
+        actual = fast.serialize(queryset.values(*fast.value_fields))
+        self.assertEqual(actual, expected)
+        self.assertEqual(FastJSONRenderer().render(actual), FastJSONRenderer().render(expected))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_same_output_as_model_serializers(self):
+        """
+        Teste para a saída idêntica à do BookSerializer e do RatingSerializer, inclusive com ?fields= e comentários nulos
+        """
+        self.assertSameOutput(BookSerializer, Book.objects.all())
+        self.assertSameOutput(BookSerializer, Book.objects.all(), ['book_title', 'updated_at', 'average_rating'])
+        self.assertSameOutput(RatingSerializer, Rating.objects.all())
+
+    def test_list_endpoints_match_model_serializers(self):
+        """
+        Teste para as listagens, que usam o caminho rápido, contra os serializers originais
+        """
+        response = self.client.get(reverse('book-list'), {'page_size': 10})
+        self.assertEqual(response.data['results'], BookSerializer(Book.objects.all(), many=True).data)
+        response = self.client.get(reverse('book-list'), {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(response.data['results'], BookSerializer(Book.objects.all()[:2], many=True).data)
+        response = self.client.get(reverse('rating-list'), {'page_size': 10})
+        self.assertEqual(response.data['results'], RatingSerializer(Rating.objects.all(), many=True).data)
+        response = self.client.get(reverse('book-most-rated'), {'page_size': 10})
+        expected = Book.objects.order_by('-rating_count', '-average_rating', '-id')
+        self.assertEqual(response.data['results'], BookSerializer(expected, many=True).data)
+
+    def test_compiled_once(self):
+        """
+        Teste para o mapa de campos, compilado uma vez por serializer e seleção de campos
+        """
+        self.assertIs(values_serializer(BookSerializer), values_serializer(BookSerializer))
+        self.assertIsNot(values_serializer(BookSerializer, ['id']), values_serializer(BookSerializer))
+
+    def test_rejects_computed_fields(self):
+        """
+        Teste para serializers com campos que não são colunas do modelo
+        """
+        class ComputedSerializer(BookSerializer):
+            label = serializers.SerializerMethodField()
+
+            def get_label(self, obj):
+                return str(obj)
+
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(ComputedSerializer)
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self, authenticator, token=None):
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token or self.token}'))
+        return authenticator.authenticate(request)
+
+    def test_user_lookup_cached(self):
+        """
+        Teste para o cache: a segunda requisição com o mesmo token não consulta o banco e recebe uma cópia do usuário
+        """
+        authenticator = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            first, _ = self.authenticate(authenticator)
+        with self.assertNumQueries(0):
+            second, validated_token = self.authenticate(authenticator)
+        self.assertEqual(second, self.user)
+        self.assertIsNot(second, first)
+        self.assertEqual(validated_token['user_id'], self.user.pk)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_tampered_token_not_cached(self):
+        """
+        Teste para um token com a assinatura alterada, que não encontra a entrada do token original
+        """
+        authenticator = CachedJWTAuthentication()
+        self.authenticate(authenticator)
+        header, payload, signature = self.token.split('.')
+        tampered = '.'.join([header, payload, signature[:-2] + ('AA' if signature[-2:] != 'AA' else 'BB')])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(authenticator, tampered)
+
+    def test_user_write_invalidates(self):
+        """
+        Teste para a desativação do usuário: a entrada em cache é descartada e o token passa a ser recusado
+        """
+        authenticator = CachedJWTAuthentication()
+        self.authenticate(authenticator)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(authenticator)
+
+    @override_settings(JWT_AUTH_CACHE_MAX_ENTRIES=2)
+    def test_bounded(self):
+        """
+        Teste para o limite de entradas: o token usado há mais tempo é descartado
+        """
+        authenticator = CachedJWTAuthentication()
+        tokens = [str(AccessToken.for_user(self.user)) for _ in range(3)]
+        for token in tokens:
+            self.authenticate(authenticator, token)
+        stats = token_cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+
+    @override_settings(JWT_AUTH_CACHE_TTL=0)
+    def test_ttl(self):
+        """
+        Teste para a validade das entradas: com TTL zero, todo token volta a ser verificado no banco
+        """
+        authenticator = CachedJWTAuthentication()
+        self.authenticate(authenticator)
+        with self.assertNumQueries(1):
+            self.authenticate(authenticator)
+
+    def test_token_user_without_database(self):
+        """
+        Teste para a variante baseada só nas claims do token, usada no envio de avaliações em massa
+        """
+        authenticator = CachedJWTTokenUserAuthentication()
+        # Só a coluna is_active, guardada em cache para as próximas requisições
+        with self.assertNumQueries(1):
+            self.authenticate(authenticator)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(authenticator)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_authenticated)
+
+        book = Book.objects.create(book_title='O Hobbit', book_authors='J.R.R. Tolkien')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('rating-bulk'), [
+                {'book_title': book.book_title, 'book_authors': book.book_authors, 'score': 4},
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries if 'auth_user' in query['sql']])
+
+    def test_token_user_inactive_rejected(self):
+        """
+        Teste para a variante baseada nas claims: um usuário desativado deixa de ser aceito, mesmo com o token em cache
+        """
+        authenticator = CachedJWTTokenUserAuthentication()
+        self.authenticate(authenticator)
+        # Desativação feita por outro processo: o token continua no cache deste, só o is_active em cache é descartado
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.delete(ACTIVE_FLAG_KEY.format(self.user.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(authenticator)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_api_uses_cached_authentication(self):
+        """
+        Teste para a autenticação padrão da API com token no cabeçalho Authorization
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        url = reverse('book-list')
+        data = {'book_title': 'O Hobbit', 'book_authors': 'J.R.R. Tolkien', 'book_description': 'A jornada', 'book_selfLink': 'http://exemplo.com/1'}
+        self.assertEqual(self.client.post(url, data).status_code, status.HTTP_201_CREATED)
+        data.update(book_title='O Silmarillion', book_selfLink='http://exemplo.com/2')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(url, data).status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries if 'auth_user' in query['sql']])
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(self.client.post(url, data).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_benchmark_auth_command(self):
+        """
+        Teste do comando benchmark_auth com poucas repetições
+        """
+        out = StringIO()
+        call_command('benchmark_auth', repeat=3, stdout=out)
+        self.assertIn('cached_token_user', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+
+class AsyncViewTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 10 volumes por termo
+        cls.stub = GoogleBooksStub(total_items=10).start()
+        cls.url = cls.stub.url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.stub.reset()
+        query_cache.clear()
+        response_cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = str(AccessToken.for_user(self.user))
+        self.books = [
+            Book.objects.create(book_title=f'Livro {i}', book_authors='Autor', book_description='Descrição', book_selfLink=f'http://exemplo.com/{i}')
+            for i in range(3)
+        ]
+        for score in (5, 3):
+            Rating.objects.create(book=self.books[0], score=score, comment='Bom')
+
+    def test_book_list_matches_sync(self):
+        """
+        Teste para a listagem assíncrona de livros: mesmos itens, total e paginação da listagem do DRF
+        """
+        params = {'page': 2, 'page_size': 2, 'fields': 'id,book_title'}
+        expected = self.client.get(reverse('book-list'), params).json()
+        response = self.client.get(reverse('async-book-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['results'], expected['results'])
+        self.assertEqual(data['count'], 3)
+        self.assertIsNone(data['next'])
+        self.assertTrue(data['previous'].startswith('http://testserver/api/async/books/?'))
+        self.assertNotIn('page=', data['previous'])
+
+    def test_book_list_invalid_parameters(self):
+        """
+        Teste para página inexistente, campo desconhecido em ?fields= e paginação por cursor nas rotas assíncronas
+        """
+        url = reverse('async-book-list')
+        self.assertEqual(self.client.get(url, {'page': 10}).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {'fields': 'id,isbn'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.json())
+        self.assertEqual(self.client.get(url, {'pagination': 'cursor'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_book_detail(self):
+        """
+        Teste para a leitura assíncrona de um livro: cache de respostas, ETag e livro inexistente
+        """
+        url = reverse('async-book-detail', kwargs={'pk': self.books[0].pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get(reverse('book-detail', kwargs={'pk': self.books[0].pk})).json())
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        missing = reverse('async-book-detail', kwargs={'pk': self.books[-1].pk + 100})
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rating_list(self):
+        """
+        Teste para a listagem assíncrona de avaliações filtrada pelo livro
+        """
+        params = {'book_title': 'Livro 0', 'book_authors': 'Autor', 'page_size': 10}
+        response = self.client.get(reverse('async-rating-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], self.client.get(reverse('rating-list'), params).json()['results'])
+        self.assertEqual([rating['score'] for rating in response.json()['results']], [3, 5])
+
+        # ETag pela versão da tabela: o 304 lê uma linha de TableVersion e uma edição do comentário o invalida
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('async-rating-list'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        rating = Rating.objects.filter(book__book_title='Livro 0').first()
+        rating.comment = 'Revisado'
+        rating.save()
+        response = self.client.get(reverse('async-rating-list'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('async-rating-list'), {'book_title': 'Inexistente', 'book_authors': 'Autor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('async-rating-list'), {'book_title': 'Inexistente', 'book_authors': 'Autor', 'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fetch_and_save_books(self):
+        """
+        Teste para a importação assíncrona: exige autenticação, repete após 429 e salva os livros do Google Books
+        """
+        url = reverse('async-fetch-and-save-books')
+        response = self.client.get(url, {'q': 'aventura'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        self.stub.fail_first = {'aventura'}
+        with self.settings(GOOGLE_BOOKS_API_URL=self.url):
+            response = self.client.get(url, {'q': 'aventura'}, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(Book.objects.filter(book_title__startswith=f'{BENCH_PREFIX}google aventura').count(), 5)
+        self.assertEqual(len(self.stub.requests_seen), 2)
+
+        with self.settings(GOOGLE_BOOKS_API_URL=self.url):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_fetches_coalesced(self):
+        """
+        Teste para o cache de buscas assíncrono: buscas simultâneas do mesmo termo fazem uma única requisição
+        """
+        volumes = [{'selfLink': 'http://exemplo.com/x'}]
+
+        async def fetch_all():
+            return await asyncio.gather(*(afetch_books_from_google('Aventura') for _ in range(5)))
+
+        with patch('api_rest.services.google_books.arequest_books_from_google', AsyncMock(return_value=volumes)) as request:
+            results = async_to_sync(fetch_all)()
+        self.assertEqual(results, [volumes] * 5)
+        self.assertEqual(request.await_count, 1)
+        self.assertEqual(query_cache.stats()['coalesced'], 4)
+
+    def test_metrics_count_async_queries(self):
+        """
+        Teste para as métricas das views assíncronas: as consultas feitas pelo ORM assíncrono são contadas
+        """
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.client.get(reverse('async-rating-list'))
+        metrics = registry.snapshot()['async_rating_list']
+        self.assertEqual(metrics.queries.sum, 3)
+
+class SqliteProfileTests(APITestCase):
+    def open_connection(self):
+        db_connection = connections.create_connection('default')
+        self.addCleanup(db_connection.close)
+        db_connection.ensure_connection()
+        return db_connection
+
+    def pragma(self, db_connection, name):
+        with db_connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """
+        Teste para os PRAGMAs do perfil aplicados a cada conexão nova pelo signal connection_created
+        """
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -4321, 'busy_timeout': 1234, 'temp_store': 'MEMORY'}):
+            db_connection = self.open_connection()
+        self.assertEqual(self.pragma(db_connection, 'cache_size'), -4321)
+        self.assertEqual(self.pragma(db_connection, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(db_connection, 'temp_store'), 2)
+
+        with override_settings(SQLITE_PRAGMAS={}):
+            self.assertEqual(self.pragma(self.open_connection(), 'busy_timeout'), 5000)  # padrão do módulo sqlite3
+
+    def test_invalid_pragma(self):
+        """
+        Teste para um PRAGMA com valor inválido, recusado antes de chegar ao SQL
+        """
+        with override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL; DROP TABLE api_rest_book'}):
+            with self.assertRaises(ImproperlyConfigured):
+                configure_sqlite_connection(connection=connection)
+        self.assertTrue(Book._meta.db_table in connection.introspection.table_names())
+
+# TransactionTestCase: dentro da transação do APITestCase todas as leituras iriam para o primário
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)  # marcas dos tokens presos ao primário
+        self.factory = RequestFactory()
+        self.read_from = []
+
+    def handle(self, request, write=False, status_code=200):
+        def get_response(request):
+            self.read_from.append(router.db_for_read(Book))
+            if write:
+                router.db_for_write(Book)
+                self.read_from.append(router.db_for_read(Book))
+            return HttpResponse(status=status_code)
+        return ReplicaRoutingMiddleware(get_response)(request)
+
+    def test_safe_methods_read_from_replica(self):
+        """
+        Teste para o roteamento: GET lê da réplica, POST lê do primário e fora de requisições vale o primário
+        """
+        self.handle(self.factory.get('/api/books/'))
+        self.handle(self.factory.post('/api/books/'))
+        self.assertEqual(self.read_from, ['replica1', 'default'])
+        self.assertEqual(router.db_for_read(Book), 'default')
+        self.assertEqual(router.db_for_write(Book), 'default')
+
+    def test_read_your_writes(self):
+        """
+        Teste para um GET que grava: a requisição passa a ler do primário e o cliente fica preso a ele pelo cookie
+        """
+        response = self.handle(self.factory.get('/api/books/fetch_and_save_books/'), write=True)
+        self.assertEqual(self.read_from, ['replica1', 'default'])
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/api/books/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = '1'
+        self.handle(request)
+        self.assertEqual(self.read_from[-1], 'default')
+
+    def test_token_pinned_after_write(self):
+        """
+        Teste para clientes com token, sem cookies: a escrita prende ao primário apenas o mesmo token
+        """
+        self.handle(self.factory.post('/api/ratings/', HTTP_AUTHORIZATION='Bearer a'), status_code=201)
+        self.handle(self.factory.get('/api/ratings/', HTTP_AUTHORIZATION='Bearer a'))
+        self.handle(self.factory.get('/api/ratings/', HTTP_AUTHORIZATION='Bearer b'))
+        self.assertEqual(self.read_from, ['default', 'default', 'replica1'])
+
+    def test_failed_write_not_pinned(self):
+        """
+        Teste para uma escrita recusada (400), que não prende o cliente ao primário
+        """
+        response = self.handle(self.factory.post('/api/books/'), status_code=400)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_transaction_reads_primary(self):
+        """
+        Teste para leituras dentro de uma transação no primário, que não vão para a réplica
+        """
+        def get_response(request):
+            with transaction.atomic():
+                self.read_from.append(router.db_for_read(Book))
+            return HttpResponse()
+        ReplicaRoutingMiddleware(get_response)(self.factory.get('/api/books/'))
+        self.assertEqual(self.read_from, ['default'])
+
+    def test_response_cache_built_on_primary_after_invalidation(self):
+        """
+        Teste para o cache de respostas: logo após uma invalidação a entrada é montada no primário, para uma réplica
+        atrasada não guardar os dados antigos sob a versão nova; passado REPLICA_STICKY_SECONDS, volta à réplica
+        """
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+        def get_response(request):
+            def build():
+                self.read_from.append(router.db_for_read(Book))
+                return Response({})
+            return response_cache.get_or_build(request, build)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        invalidate_books_cache()
+        middleware(self.factory.get('/api/books/'))
+        old = time.time_ns() - (sticky_seconds() + 1) * 1_000_000_000
+        response_cache.backend.set_many({key: old for key in response_cache._version_keys(LIST_SCOPE)}, None)
+        response = middleware(self.factory.get('/api/books/'))
+        self.assertEqual(self.read_from, ['default', 'replica1'])
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_without_replicas(self):
+        """
+        Teste sem réplicas configuradas: tudo no primário e nenhum cookie
+        """
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.handle(self.factory.get('/api/books/'))
+            response = self.handle(self.factory.post('/api/books/'), status_code=201)
+        self.assertEqual(self.read_from, ['default', 'default'])
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertFalse(router.allow_migrate('replica1', 'api_rest'))
@@ -1,5 +1,6 @@
 from rest_framework.routers import DefaultRouter
-from .views import BookViewSet, RatingViewSet, export_books_view, export_ratings_view
+from .views import BookViewSet, RatingViewSet, export_books_view, export_ratings_view, metrics_view
+from .async_views import async_book_detail, async_book_list, async_fetch_and_save_books, async_rating_list
 from django.urls import path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -19,6 +20,13 @@ urlpatterns = [
     # Exportação de dados CSV
     path('export/books/', export_books_view, name='export_books_view'),
     path('export/ratings/', export_ratings_view, name='export_ratings_view'),
+    # Métricas de latência e consultas por endpoint (Prometheus)
+    path('_metrics', metrics_view, name='metrics'),
+    # Variantes assíncronas das leituras e da importação, para servidores ASGI (uvicorn)
+    path('async/books/', async_book_list, name='async-book-list'),
+    path('async/books/fetch_and_save_books/', async_fetch_and_save_books, name='async-fetch-and-save-books'),
+    path('async/books/<int:pk>/', async_book_detail, name='async-book-detail'),
+    path('async/ratings/', async_rating_list, name='async-rating-list'),
 ]
 
 urlpatterns += router.urls
\ No newline at end of file
@@ -2,21 +2,123 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from drf_spectacular.utils import extend_schema, OpenApiExample
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Book, Rating
-from .serializers import BookSerializer, RatingSerializer
+from .authentication import CachedJWTTokenUserAuthentication
+from .models import BOOKS_TABLE, RATINGS_TABLE, Book, ImportJob, Rating
+from .serializers import BookSerializer, BookStatsSerializer, BulkRatingSerializer, ImportJobSerializer, RatingCreateSerializer, RatingSerializer, values_serializer
 from .services.google_books import save_books_to_db
+from .services.import_jobs import enqueue_import_job
+from .services.books import bulk_upsert_books
+from .services.ratings import book_rating_stats, bulk_create_ratings
+from .parsers import FastJSONParser, NDJSONParser
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from .export_utils import export_books_csv, export_ratings_csv
+from .metrics import render_prometheus
+from .conditional import make_etag, not_modified_response, set_conditional_headers, table_etag
+from .response_cache import cache_book_response
+from .pagination import (
+    BookCursorPagination,
+    MostRatedPagination,
+    RatingCursorPagination,
+    TopRatedPagination,
+    get_paginator,
+)
+from .search import SEARCH_DEFAULT_LIMIT, search_books
+
+# Parâmetros de paginação aceitos pelas listagens
+PAGINATION_PARAMETERS = [
+    {
+        'name': 'pagination',
+        'description': "Modo de paginação: 'cursor' ativa a paginação por cursor (keyset); o padrão é por número de página.",
+        'required': False,
+        'type': 'string',
+        'in': 'query',
+    },
+    {
+        'name': 'page_size',
+        'description': 'Quantidade de itens por página (máximo de 100).',
+        'required': False,
+        'type': 'integer',
+        'in': 'query',
+    },
+]
+
+# Parâmetro de seleção de campos das leituras de livros
+FIELDS_PARAMETER = {
+    'name': 'fields',
+    'description': 'Campos devolvidos, separados por vírgula (ex.: id,book_title,average_rating). Padrão: todos.',
+    'required': False,
+    'type': 'string',
+    'in': 'query',
+}
+
+def get_requested_fields(request, serializer_class):
+    """
+    Lê ?fields=a,b,c e retorna a lista de campos pedidos, ou None quando o parâmetro não foi enviado
+    """
+    value = request.query_params.get('fields')
+    if value is None:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in serializer_class().fields]
+    if not fields or unknown:
+        raise ValidationError({'fields': [f"Campos inválidos: {', '.join(unknown) or value!r}."]})
+    return fields
+
+def fields_version(fields):
+    # Campos pedidos normalizados para o ETag: "a,b" e "b, a" são a mesma representação; '*' para todos
+    return '*' if fields is None else ','.join(sorted(set(fields)))
+
+def fast_values(queryset, serializer, *required):
+    """
+    Linhas .values() com as colunas do ValuesSerializer e as necessárias para a view (ex.: campos do cursor)
+    """
+    return queryset.values(*dict.fromkeys([*serializer.value_fields, *required]))
+
+def only_fields(queryset, fields, *required):
+    """
+    Limita o SELECT aos campos pedidos e aos necessários para a view (paginação, ETag)
+    """
+    if fields is None:
+        return queryset
+    return queryset.only(*dict.fromkeys([*fields, *required]))
+
+# Parâmetros dos rankings de livros
+LEADERBOARD_PARAMETERS = [
+    {
+        'name': 'min_votes',
+        'description': 'Considera apenas livros com pelo menos esse número de avaliações.',
+        'required': False,
+        'type': 'integer',
+        'in': 'query',
+    },
+    {
+        'name': 'cursor',
+        'description': 'Cursor da página, obtido nos links next e previous.',
+        'required': False,
+        'type': 'string',
+        'in': 'query',
+    },
+    {
+        'name': 'page_size',
+        'description': 'Quantidade de itens por página (máximo de 100).',
+        'required': False,
+        'type': 'integer',
+        'in': 'query',
+    },
+    FIELDS_PARAMETER,
+]
 
 # ViewSet para o modelo Book
 @extend_schema(tags=["books"])
 class BookViewSet(viewsets.ViewSet):
     # Sobreescrevendo método get_permissions de ViewSet
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'search', 'top_rated', 'most_rated', 'stats']:
             return [AllowAny()]
         return [IsAuthenticated()]
     """
@@ -25,16 +127,26 @@ class BookViewSet(viewsets.ViewSet):
     @extend_schema(
         summary="Lista todos os livros",
         description="Retorna uma lista de todos os livros cadastrados",
-        responses={200: BookSerializer(many=True)}
+        parameters=[*PAGINATION_PARAMETERS, FIELDS_PARAMETER],
+        responses={200: BookSerializer(many=True), 400: None}
     )
+    @cache_book_response
     def list(self, request):
+        fields = get_requested_fields(request, BookSerializer)
         books = Book.objects.all()
-        paginator = PageNumberPagination()
-        # Divide o conjunto de dados de acordo com o número de itens por página definido na classe BookPagination
-        paginated_books = paginator.paginate_queryset(books, request)
-        # Os registros da página solicitada são serializados
-        serializer = BookSerializer(paginated_books, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        etag, last_modified = table_etag(request, BOOKS_TABLE)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = get_paginator(request, BookCursorPagination)
+        # Divide o conjunto de dados de acordo com o número de itens por página definido no paginador
+        # Leitura rápida: linhas .values() só com os campos pedidos em ?fields= (e o id, usado pelo cursor),
+        # serializadas sem instanciar os livros
+        serializer = values_serializer(BookSerializer, fields)
+        paginated_books = paginator.paginate_queryset(fast_values(books, serializer, 'id'), request)
+        response = paginator.get_paginated_response(serializer.serialize(paginated_books))
+        return set_conditional_headers(response, etag, last_modified)
 
     @extend_schema(
         summary="Cria um novo livro",
@@ -63,15 +175,23 @@ class BookViewSet(viewsets.ViewSet):
     @extend_schema(
         summary="Obtém um livro específico",
         description="Retorna os detalhes de um livro específico",
-        responses={200: BookSerializer, 404: None}
+        parameters=[FIELDS_PARAMETER],
+        responses={200: BookSerializer, 400: None, 404: None}
     )
+    @cache_book_response
     def retrieve(self, request,pk=None):
+        fields = get_requested_fields(request, BookSerializer)
         try:
-            book = Book.objects.get(pk=pk)
+            book = only_fields(Book.objects, BookSerializer.columns(fields), 'id', 'updated_at').get(pk=pk)
         except Book.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        serializer = BookSerializer(book)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        etag = make_etag('book', book.pk, book.updated_at, fields_version(fields))
+        not_modified = not_modified_response(request, etag, book.updated_at)
+        if not_modified is not None:
+            return not_modified
+        serializer = BookSerializer(book, fields=fields)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_conditional_headers(response, etag, book.updated_at)
 
     @extend_schema(
         summary="Atualiza um livro",
@@ -103,9 +223,132 @@ class BookViewSet(viewsets.ViewSet):
         book.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+    @extend_schema(
+        summary="Cria ou atualiza livros em massa",
+        description=(
+            "Recebe uma lista de livros e cria ou atualiza cada um pela chave título + autores "
+            "(descrição e link são atualizados). Retorna quantos foram criados e atualizados e os erros por linha."
+        ),
+        request=BookSerializer(many=True),
+        responses={200: None, 400: None}
+    )
+    # http://127.0.0.1:8000/api/books/bulk_upsert/ - exemplo de uso
+    @action(detail=False, methods=['post'])
+    def bulk_upsert(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'error': 'O corpo deve ser uma lista de livros.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated, errors = bulk_upsert_books(rows)
+        response_status = status.HTTP_200_OK if created or updated or not rows else status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'updated': updated, 'errors': errors}, status=response_status)
+
+    @extend_schema(
+        summary="Busca livros no catálogo local",
+        description=(
+            "Busca textual em título, autores e descrição dos livros cadastrados, com os resultados mais relevantes primeiro. "
+            "O último termo também encontra palavras que começam com ele."
+        ),
+        parameters=[
+            {
+                'name': 'q',
+                'description': 'Termo de busca',
+                'required': True,
+                'type': 'string',
+                'in': 'query'
+            },
+            {
+                'name': 'limit',
+                'description': 'Quantidade máxima de resultados (máximo de 100)',
+                'required': False,
+                'type': 'integer',
+                'in': 'query'
+            },
+            FIELDS_PARAMETER,
+        ],
+        responses={200: BookSerializer(many=True), 400: None}
+    )
+
+    # http://127.0.0.1:8000/api/books/search/?q=tolkien - exemplo de uso
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'O parâmetro "q" é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': 'O parâmetro "limit" deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = get_requested_fields(request, BookSerializer)
+        books = search_books(query, limit, queryset=only_fields(Book.objects.all(), BookSerializer.columns(fields), 'id'))
+        serializer = BookSerializer(books, many=True, fields=fields)
+        return Response({'query': query, 'results': serializer.data}, status=status.HTTP_200_OK)
+
+    def leaderboard(self, request, pagination_class):
+        try:
+            min_votes = int(request.query_params.get('min_votes', 0))
+        except ValueError:
+            return Response({'error': 'O parâmetro "min_votes" deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        fields = get_requested_fields(request, BookSerializer)
+        paginator = pagination_class()
+        serializer = values_serializer(BookSerializer, fields)
+        books = Book.objects.all()
+        if min_votes > 0:
+            books = books.filter(rating_count__gte=min_votes)
+        page = paginator.paginate_queryset(fast_values(books, serializer, *paginator.fields), request, view=self)
+        return paginator.get_paginated_response(serializer.serialize(page))
+
+    @extend_schema(
+        summary="Livros mais bem avaliados",
+        description=(
+            "Ranking pela média bayesiana (bayesian_rating): cada livro começa com RATING_PRIOR_VOTES avaliações "
+            "fictícias de nota RATING_PRIOR_MEAN, então poucas notas altas não superam muitas avaliações. "
+            "Paginação por cursor (links next e previous)."
+        ),
+        parameters=LEADERBOARD_PARAMETERS,
+        responses={200: BookSerializer(many=True), 400: None}
+    )
+    # http://127.0.0.1:8000/api/books/top_rated/?min_votes=5 - exemplo de uso
+    @action(detail=False, methods=['get'])
+    @cache_book_response
+    def top_rated(self, request):
+        return self.leaderboard(request, TopRatedPagination)
+
+    @extend_schema(
+        summary="Livros mais avaliados",
+        description="Ranking pelo total de avaliações, com a nota média como desempate. Paginação por cursor (links next e previous).",
+        parameters=LEADERBOARD_PARAMETERS,
+        responses={200: BookSerializer(many=True), 400: None}
+    )
+    @action(detail=False, methods=['get'])
+    @cache_book_response
+    def most_rated(self, request):
+        return self.leaderboard(request, MostRatedPagination)
+
+    @extend_schema(
+        summary="Estatísticas das avaliações de um livro",
+        description=(
+            "Quantidade de avaliações por nota (0 a 5), total, média e média das avaliações dos últimos "
+            "RATING_STATS_WINDOW_DAYS dias, lidos dos contadores mantidos a cada escrita em avaliações."
+        ),
+        responses={200: BookStatsSerializer, 404: None}
+    )
+    # http://127.0.0.1:8000/api/books/1/stats/ - exemplo de uso
+    @action(detail=True, methods=['get'])
+    @cache_book_response
+    def stats(self, request, pk=None):
+        stats = book_rating_stats(pk)
+        if stats is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(stats, status=status.HTTP_200_OK)
+
     @extend_schema(
         summary="Busca livros na API do Google Books e preenche o banco de dados",
-        description="Busca livros com base no termo fornecido, salva os resultados no banco e retorna os livros salvos.",
+        description=(
+            "Busca livros com base no termo fornecido, salva os resultados no banco e retorna os livros salvos. "
+            "Com async=true, a importação é enfileirada e a resposta 202 traz o job para acompanhar em import_jobs/{id}/."
+        ),
         parameters=[
             {
                 'name': 'q',
@@ -113,9 +356,16 @@ class BookViewSet(viewsets.ViewSet):
                 'required': True,
                 'type': 'string',
                 'in': 'query'
+            },
+            {
+                'name': 'async',
+                'description': 'Executa a importação em segundo plano',
+                'required': False,
+                'type': 'boolean',
+                'in': 'query'
             }
         ],
-        responses={201: BookSerializer(many=True), 400: None}
+        responses={201: BookSerializer(many=True), 202: ImportJobSerializer, 400: None}
     )
 
     # http://127.0.0.1:8000/api/books/fetch_and_save_books/?q=aventura - exemplo de uso
@@ -125,6 +375,11 @@ class BookViewSet(viewsets.ViewSet):
         if not query:
             return Response({'error': 'O parâmetro "q" é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if request.query_params.get('async') in ('true', '1'):
+            # Jobs repetidos para o mesmo termo, ainda pendentes ou em execução, são reaproveitados
+            job, _ = enqueue_import_job(query)
+            return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
         try:
             # Chamar o serviço para buscar e salvar os livros
             created_books = save_books_to_db(query)
@@ -136,6 +391,20 @@ class BookViewSet(viewsets.ViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @extend_schema(
+        summary="Consulta um job de importação",
+        description="Retorna o status, o progresso e o total de livros criados por uma importação em segundo plano.",
+        responses={200: ImportJobSerializer, 404: None}
+    )
+    # http://127.0.0.1:8000/api/books/import_jobs/1/ - exemplo de uso
+    @action(detail=False, methods=['get'], url_path=r'import_jobs/(?P<job_id>\d+)')
+    def import_job_status(self, request, job_id=None):
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+        except ImportJob.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
 
 # ViewSet para o modelo Rating
 @extend_schema(tags=["ratings"])
@@ -149,6 +418,13 @@ class RatingViewSet(viewsets.ModelViewSet):
             return [AllowAny()] # Permite acesso público para listar ou visualizar avaliações
         return [IsAuthenticated()] # Requer autenticação para as demais ações
 
+    @property
+    def paginator(self):
+        # Sobrescreve o paginador de GenericAPIView para permitir a paginação por cursor
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_paginator(self.request, RatingCursorPagination)
+        return self._paginator
+
     @extend_schema(
         summary="Cria uma nova avaliação",
         description="Cria uma avaliação associada a um livro com base no título e autor fornecidos.",
@@ -176,19 +452,44 @@ class RatingViewSet(viewsets.ModelViewSet):
         if not book_title or not book_authors:
             raise ValidationError({"error": "Os campos 'book_title' e 'book_authors' são obrigatórios."})
 
-        try:
-            book = Book.objects.get(book_title=book_title, book_authors=book_authors)
-        except Book.DoesNotExist:
-            raise ValidationError({"error": "O livro com o título e autor informados não existe."})
-
-        data = request.data.copy()
-        data['book'] = book.id
-
-        serializer = self.get_serializer(data=data)
+        # O livro já resolvido é passado ao save(), sem a consulta extra do campo 'book' do serializer
+        serializer = RatingCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+
+        # Busca do livro, INSERT da avaliação e atualização das estatísticas na mesma transação
+        with transaction.atomic():
+            book_id = (
+                Book.objects.filter(book_title=book_title, book_authors=book_authors)
+                .values_list('id', flat=True)
+                .first()
+            )
+            if book_id is None:
+                raise ValidationError({"error": "O livro com o título e autor informados não existe."})
+            serializer.save(book_id=book_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        summary="Cria avaliações em massa",
+        description=(
+            "Recebe uma lista JSON ou um corpo NDJSON (application/x-ndjson) de avaliações no formato "
+            "{book_title, book_authors, score, comment}. Linhas válidas são gravadas e as inválidas são "
+            "devolvidas em 'errors' com o índice da linha."
+        ),
+        request=BulkRatingSerializer(many=True),
+        responses={201: None, 400: None}
+    )
+    # http://127.0.0.1:8000/api/ratings/bulk/ - exemplo de uso
+    @action(detail=False, methods=['post'], parser_classes=[FastJSONParser, NDJSONParser],
+            authentication_classes=[CachedJWTTokenUserAuthentication])
+    def bulk(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({"error": "O corpo deve ser uma lista de avaliações."})
+
+        created, errors = bulk_create_ratings(rows)
+        response_status = status.HTTP_201_CREATED if created or not rows else status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
     def get_queryset(self):
         """
         Filtra as avaliações com base no título e autor do livro fornecidos nos query_params.
@@ -202,16 +503,20 @@ class RatingViewSet(viewsets.ModelViewSet):
 
         # Verifica se os parâmetros obrigatórios estão presentes
         if book_title and book_authors:
-            try:
-                # Busca o livro pelo título e autor
-                book = Book.objects.get(book_title=book_title, book_authors=book_authors)
-                # Filtra as avaliações relacionadas ao livro encontrado
-                queryset = queryset.filter(book=book.id)
-            except Book.DoesNotExist:
-                # Lança um erro se o livro não for encontrado
-                raise ValidationError({"error": "Nenhum livro encontrado com o título e autor fornecidos."})
+            # Filtra pelo JOIN com o livro na mesma consulta, usando o índice (book, -created_at) de Rating
+            queryset = queryset.filter(book__book_title=book_title, book__book_authors=book_authors)
 
         return queryset
+
+    def ensure_book_exists(self):
+        """
+        Lança um erro se o livro dos filtros não existir. Só é chamado quando a página vem vazia ou é inválida,
+        para não custar uma consulta extra no caso comum
+        """
+        book_title = self.request.query_params.get('book_title')
+        book_authors = self.request.query_params.get('book_authors')
+        if book_title and book_authors and not Book.objects.filter(book_title=book_title, book_authors=book_authors).exists():
+            raise ValidationError({"error": "Nenhum livro encontrado com o título e autor fornecidos."})
     
     @extend_schema(
         summary="Lista avaliações",
@@ -234,6 +539,7 @@ class RatingViewSet(viewsets.ModelViewSet):
                 'type': 'string',
                 'in': 'query',
             },
+            *PAGINATION_PARAMETERS,
         ],
         responses={200: RatingSerializer(many=True), 400: None}
     )
@@ -242,15 +548,29 @@ class RatingViewSet(viewsets.ModelViewSet):
         Lista as avaliações com paginação, permitindo filtrar pelo título e autor do livro.
         """
         queryset = self.get_queryset()
+        etag, last_modified = table_etag(request, RATINGS_TABLE)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
         # Paginador padrão do DRF
-        page = self.paginate_queryset(queryset) # dividi o queryset em páginas
+        # Leitura rápida: linhas .values() serializadas sem instanciar as avaliações
+        serializer = values_serializer(RatingSerializer)
+        rows = fast_values(queryset, serializer, 'created_at', 'id')
+        try:
+            page = self.paginate_queryset(rows) # dividi o queryset em páginas
+        except NotFound:
+            # Página fora do intervalo: um livro inexistente nos filtros responde 400, não "Página inválida"
+            self.ensure_book_exists()
+            raise
+        if not page:
+            self.ensure_book_exists()
         if page is not None:
-            serializer = RatingSerializer(page, many=True) # serializa apenas os itens daquela página
-            return self.get_paginated_response(serializer.data) # resposta paginada
-
-        # Caso não exista paginação, retorne todos os itens
-        serializer = RatingSerializer(queryset, many=True)
-        return Response(serializer.data)
+            response = self.get_paginated_response(serializer.serialize(page)) # resposta paginada
+        else:
+            # Caso não exista paginação, retorne todos os itens
+            response = Response(serializer.serialize(rows))
+        return set_conditional_headers(response, etag, last_modified)
 
     @extend_schema(
         summary="Exclui uma avaliação",
@@ -267,4 +587,11 @@ def export_books_view(request):
     return export_books_csv()
 
 def export_ratings_view(request):
-    return export_ratings_csv()
\ No newline at end of file
+    return export_ratings_csv()
+
+# Métricas no formato do Prometheus, acessíveis apenas a partir de METRICS_ALLOWED_IPS (localhost por padrão)
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
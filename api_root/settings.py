@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,6 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir também o tempo dos demais middlewares
+    'api_rest.middleware.MetricsMiddleware',
+    # Leituras de GET/HEAD/OPTIONS nas réplicas de DATABASE_REPLICAS
+    'api_rest.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +91,82 @@ DATABASES = {
     }
 }
 
+# Perfis do SQLite, escolhidos pela variável de ambiente SQLITE_PROFILE (padrão: 'default').
+# DATABASE é mesclado em DATABASES['default'] e PRAGMAS é aplicado a cada conexão aberta (api_rest/db.py)
+SQLITE_PROFILES = {
+    # Configuração padrão do Django: journal de rollback e uma conexão nova por requisição
+    'default': {
+        'DATABASE': {},
+        'PRAGMAS': {},
+    },
+    # Produção: leituras não esperam as gravações (WAL), conexões reaproveitadas entre requisições e
+    # transações que já começam com o lock de escrita, esperando até busy_timeout em vez de falhar com
+    # "database is locked". Com synchronous=NORMAL em WAL, uma queda de energia pode perder as últimas
+    # transações confirmadas, mas não corrompe o banco
+    'production': {
+        'DATABASE': {
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        },
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,  # milissegundos
+            'cache_size': -65536,  # negativo = KiB (64 MiB por conexão)
+            'mmap_size': 268435456,  # 256 MiB
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+DATABASES['default'].update(SQLITE_PROFILES[SQLITE_PROFILE]['DATABASE'])
+SQLITE_PRAGMAS = SQLITE_PROFILES[SQLITE_PROFILE]['PRAGMAS']
+
+# Réplicas de leitura: aliases de DATABASES lidos pelas requisições GET, HEAD e OPTIONS (api_rest/db.py).
+# Para testar localmente, DATABASE_REPLICAS=/tmp/replica1.sqlite3,/tmp/replica2.sqlite3 cria um alias por cópia
+# do arquivo SQLite; para um PostgreSQL em container, adicione o alias em DATABASES e nesta lista
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['api_rest.db.ReplicaRouter']
+# Segundos em que um cliente que gravou continua lendo do primário (atraso máximo esperado das réplicas).
+# No mesmo intervalo após uma invalidação, o cache de respostas monta as entradas a partir do primário
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Resultados das buscas no Google Books (api_rest/services/google_books.py).
+    # Também funciona com 'django.core.cache.backends.filebased.FileBasedCache' e LOCATION apontando para uma pasta;
+    # nesse caso, compartilhado entre processos, o limite de entradas é o MAX_ENTRIES abaixo
+    'google_books': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'google-books',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Respostas de GET /api/books/ e /api/books/{id}/ para requisições anônimas (api_rest/response_cache.py).
+    # Em produção com vários processos, use FileBasedCache para compartilhar as entradas e a versão
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# TTL (segundos) e número máximo de buscas do Google Books mantidas em cache (o limite vale por processo)
+GOOGLE_BOOKS_CACHE_TTL = 300
+GOOGLE_BOOKS_CACHE_MAX_ENTRIES = 1000
+
+# Tempo máximo (segundos) de uma resposta de livros em cache; a invalidação acontece a cada escrita
+BOOKS_RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -143,12 +224,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 2,
     # Autentificação e Autorização JWTAuthentication
+    # JWTAuthentication com cache dos tokens já verificados (api_rest/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api_rest.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON com orjson (api_rest/renderers.py e parsers.py); sem o pacote, usam o módulo json da biblioteca padrão
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_rest.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_rest.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
@@ -175,4 +267,27 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
-}
\ No newline at end of file
+}
+# Threads que executam os jobs de importação do Google Books em segundo plano
+IMPORT_JOB_WORKERS = 2
+# Minutos sem progresso depois dos quais um job em execução é considerado interrompido (worker encerrado):
+# novos pedidos do mesmo termo criam outro job e process_import_jobs o marca como falho
+IMPORT_JOB_STALE_MINUTES = 10
+
+# Cache em memória dos tokens JWT verificados: máximo de entradas por processo e validade (segundos) de cada uma.
+# O descarte ao alterar ou desativar um usuário vale só para o processo que fez a alteração: nos demais workers,
+# o usuário continua autenticado por até JWT_AUTH_CACHE_TTL segundos. O envio de avaliações em massa confere o
+# is_active guardado no cache 'default' pelo mesmo tempo; com um backend compartilhado, a desativação vale
+# imediatamente para todos os processos
+JWT_AUTH_CACHE_MAX_ENTRIES = 1024
+JWT_AUTH_CACHE_TTL = 300
+
+# Média bayesiana dos livros (ranking /api/books/top_rated/): cada livro começa com RATING_PRIOR_VOTES
+# avaliações fictícias de nota RATING_PRIOR_MEAN. Após alterar, execute python manage.py rebuild_rating_stats
+RATING_PRIOR_VOTES = 10
+RATING_PRIOR_MEAN = 2.5
+
+# Métricas por endpoint (api_rest/middleware.py), expostas em /api/_metrics.
+# Requisições com mais consultas SQL que o orçamento são registradas no log api_rest.middleware
+METRICS_QUERY_BUDGET = 10
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']